@@ -0,0 +1,70 @@
+'''Measure dictify throughput as the number of threads grows.
+
+Usage: python benchmarks/thread_scaling.py [max_threads]
+
+Runs a fixed number of dictify calls split across 1, 2, 4, ... threads, first
+with the stock dispatchers and then after freezing them, and prints calls per
+second for each. On a regular build the GIL keeps throughput flat no matter how
+many threads there are; on a free-threaded build (python3.13t and later) it
+should grow with the thread count, up to the number of cores.
+'''
+from __future__ import print_function
+import sys
+import threading
+import time
+
+import travesty as tv
+
+
+class Point(tv.SchemaObj):
+    field_types = dict(x=tv.Int(), y=tv.Number(), label=tv.String())
+
+Record = tv.SchemaMapping().of(
+    name=tv.String(),
+    tags=tv.List().of(tv.String()),
+    points=tv.List().of(Point),
+)
+
+VALUE = dict(
+    name=u'record',
+    tags=[u'a', u'b', u'c'],
+    points=[Point(x=i, y=i / 2.0, label=u'p') for i in range(20)],
+)
+
+CALLS = 2000
+
+
+def run(n_threads):
+    per_thread = CALLS // n_threads
+    def work():
+        for _ in range(per_thread):
+            tv.dictify(Record, VALUE)
+    threads = [threading.Thread(target=work) for _ in range(n_threads)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return per_thread * n_threads / (time.time() - start)
+
+
+def report(label, max_threads):
+    n = 1
+    while n <= max_threads:
+        print('{:8} {:2d} threads: {:8.0f} calls/s'.format(label, n, run(n)))
+        n *= 2
+
+
+def main(argv):
+    max_threads = int(argv[1]) if len(argv) > 1 else 8
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('Python {} ({})'.format(sys.version.split()[0],
+        'GIL enabled' if gil else 'free-threaded'))
+    run(1)  # warm up
+    report('unfrozen', max_threads)
+    tv.dictify.freeze()
+    report('frozen', max_threads)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
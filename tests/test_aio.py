@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+from travesty import Int, List, String, SchemaMapping, Date, Validated
+from travesty import Invalid, CHECK, dictify, validate
+from travesty import aio
+
+from helpers import expecting, expecting_invalid
+
+def test_aio():
+    schema = List().of(SchemaMapping().of(n=Int(), s=List().of(String())))
+    value = [dict(n=i, s=[u'a', u'b']) for i in range(2000)]
+    data = dictify(schema, value)
+    loop = asyncio.new_event_loop()
+    try:
+        run = loop.run_until_complete
+        # Each slice only runs a few nested calls
+        ticks = [0]
+        async def tick():
+            while True:
+                ticks[0] += 1
+                await asyncio.sleep(0)
+        async def with_ticker(coro):
+            task = asyncio.ensure_future(tick())
+            try:
+                return await coro
+            finally:
+                task.cancel()
+        assert run(with_ticker(aio.dictify_async(schema, value, steps=10))) == data
+        assert ticks[0] > 500
+        assert run(aio.undictify_async(schema, data)) == value
+        assert run(aio.clone_async(schema, value)) == value
+        # Non-stepwise handlers just return
+        assert run(aio.dictify_async(Int(), 4)) == 4
+        data[3]['s'] = 7
+        with expecting(Invalid):
+            run(aio.undictify_async(schema, data, error_mode=CHECK))
+        value[3]['n'] = u'three'
+        with expecting(Invalid):
+            run(aio.validate_async(schema, value))
+    finally:
+        loop.close()
+
+def test_async_validators():
+    running = [0, 0]
+    class IsEven(aio.AsyncValidator):
+        async def validate_async(self, value, **kwargs):
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.001)
+            running[0] -= 1
+            if value % 2:
+                raise Invalid('odd')
+    schema = List().of(IsEven().of(Int()))
+    loop = asyncio.new_event_loop()
+    try:
+        run = loop.run_until_complete
+        assert run(aio.validate_async(schema, list(range(0, 100, 2)),
+            max_concurrency=7)) is None
+        assert running[1] == 7
+        with expecting_invalid('1: [odd], 2: [type_error], 3: [odd]'):
+            run(aio.validate_async(schema, [2, 3, 'x', 5]))
+        with expecting_invalid('1: [odd]'):
+            run(aio.validate_async(schema, [2, 3, 'x', 5], error_mode=CHECK))
+        # With dfy_fail_early, a failing check stops later ones in the same
+        # Validated, without confusing the results for other items
+        class IsSmall(aio.AsyncValidator):
+            async def validate_async(self, value, **kwargs):
+                if value > 10:
+                    raise Invalid('too_big')
+        both = List().of(Validated(Int(), [IsEven(), IsSmall()]))
+        with expecting_invalid('0: [odd], 2: [too_big]'):
+            run(aio.validate_async(both, [13, 4, 12], dfy_fail_early=True))
+        with expecting_invalid('0: [odd, too_big], 2: [too_big]'):
+            run(aio.validate_async(both, [13, 4, 12]))
+    finally:
+        loop.close()
+    # Synchronous validation works too, but not inside an event loop
+    validate(schema, [2, 4])
+    with expecting_invalid('1: [odd]'):
+        validate(schema, [2, 5])
+    async def nested():
+        validate(schema, [2, 4])
+    loop = asyncio.new_event_loop()
+    try:
+        with expecting(RuntimeError):
+            loop.run_until_complete(nested())
+    finally:
+        loop.close()
+
+def test_aio_iter_undictify():
+    schema = SchemaMapping().of(n=Int(), day=Date())
+    async def main():
+        reader = asyncio.StreamReader()
+        seen = []
+        async def produce():
+            for i in range(1, 4):
+                line = dict(n=i, day='2020-01-0{}'.format(i))
+                reader.feed_data(json.dumps(line).encode('utf-8') + b'\n')
+                await asyncio.sleep(0)
+                # Each value is delivered as soon as its line arrives
+                assert len(seen) == i
+            reader.feed_data(b'{"n": 4, "day": "never"}\n')
+            reader.feed_eof()
+        task = asyncio.ensure_future(produce())
+        with expecting(Invalid) as e:
+            async for obj in aio.iter_undictify(schema, reader):
+                seen.append(obj['n'])
+        await task
+        assert seen == [1, 2, 3]
+        assert list(e.error.sub_errors) == ['4']
+    # Lines over the reader's limit are reported, and reading carries on
+    async def read_long(data):
+        reader = asyncio.StreamReader(limit=64)
+        reader.feed_data(data)
+        reader.feed_eof()
+        errors = []
+        objs = [obj async for obj in aio.iter_undictify(schema, reader,
+            on_invalid=lambda lineno, e: errors.append((lineno, e.id_string())))]
+        return [obj['n'] for obj in objs], errors
+    short = b'{"n": 1, "day": "2020-01-01"}\n'
+    long = b'{"n": 2, "day": "2020-01-01", "pad": "' + b'x' * 300 + b'"}'
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+        assert loop.run_until_complete(read_long(
+            short + long + b'\n' + short + long)) == (
+            [1, 1], [(2, 'line_too_long'), (4, 'line_too_long')])
+    finally:
+        loop.close()
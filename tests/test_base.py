@@ -1,7 +1,16 @@
+import datetime
+
 import travesty as tv
 
 import pytest
 
+from travesty import Int, List, String, SchemaMapping, UniMapping, StrMapping
+from travesty import Optional, SchemaObj, Date, CHECK
+from travesty import clone, dictify, undictify, mutate, traverse, stepwise
+from travesty.cantrips.trampoline import Return
+
+from helpers import expecting_invalid
+
 def test_agg_loop():
     # Test for previous bug where an aggregator would get caught in a loop if it
     # raised its own exception while it was watching for exceptions
@@ -16,3 +25,146 @@ def test_agg_loop():
             with agg.checking():
                 raise tv.Invalid("ok")
     e.match('ok')
+
+def test_pruning():
+    day = datetime.date(2020, 1, 1)
+    one_day_more = mutate.sub()
+    @one_day_more.when(Date)
+    def tomorrow(dispgraph, value, **kw):
+        return value + datetime.timedelta(days=1)
+    event = SchemaMapping().of(
+        day=Date(),
+        tags=List().of(String()),
+        counts=StrMapping().of(Int()),
+        by_day=UniMapping().of(Date(), List().of(Int())),
+    )
+    schema = List().of(Optional.wrap(event))
+    tags, counts, nums = [u'a'], dict(a=1), [1, 2]
+    value = [dict(day=day, tags=tags, counts=counts, by_day={day: nums}), None]
+    assert one_day_more(schema, value) is value
+    tomorrow_ = day + datetime.timedelta(days=1)
+    assert value[0] == dict(day=tomorrow_, tags=[u'a'], counts=dict(a=1),
+        by_day={tomorrow_: [1, 2]})
+    # The untouched parts are passed through without being walked
+    assert value[0]['tags'] is tags and value[0]['counts'] is counts
+    assert value[0]['by_day'][tomorrow_] is nums
+    bad = dict(day=day, tags=None, counts={}, by_day={})
+    assert one_day_more(event, bad)['tags'] is None
+    # ...unless the value is being checked
+    with expecting_invalid('tags: [type_error]'):
+        one_day_more(event, bad, error_mode=CHECK)
+    # New handlers are picked up
+    @one_day_more.when(String)
+    def shout(dispgraph, value, **kw):
+        return value.upper()
+    one_day_more(schema, value)
+    assert value[0]['tags'] == [u'A']
+    assert value[0]['by_day'] == {day + datetime.timedelta(days=2): [1, 2]}
+    # Missing fields are still filled in, but complete schemas are skipped
+    plain = List().of(SchemaMapping().of(n=Int(), tags=List().of(Int())))
+    assert one_day_more(plain, [dict(n=1)]) == [dict(n=1, tags=None)]
+    assert one_day_more(plain, [dict(n=1, tags=5)]) == [dict(n=1, tags=5)]
+    class Point(SchemaObj):
+        field_types = dict(x=Int(), tags=List().of(Int()))
+    assert one_day_more(Point, Point(x=1, tags=5)).tags == 5
+    # traverse prunes too
+    seen = []
+    count_days = traverse.sub()
+    @count_days.when(Date)
+    def count_day(dispgraph, value, **kw):
+        seen.append(value)
+    count_days(schema, [dict(day=day, tags=5, counts=None, by_day={})])
+    assert seen == [day]
+
+def test_share_unchanged():
+    record = SchemaMapping('save').of(
+        name=String(),
+        tags=List().of(String()),
+        scores=StrMapping().of(Optional.wrap(List().of(Int()))),
+    )
+    schema = List().of(record)
+    value = [dict(name=u'a', tags=[u'x'], scores=dict(s=[1, 2], t=None),
+                  extra=5)]
+    for disp in [dictify, clone]:
+        assert disp(schema, value, share_unchanged=True) is value
+        result = disp(schema, value)
+        assert result == value and result is not value
+    with expecting_invalid('0: [tags: [type_error]]'):
+        dictify(schema, [dict(value[0], tags=u'x')], share_unchanged=True,
+            error_mode=CHECK)
+    # Parts whose shape changes are copied; the rest is still shared
+    missing_name = dict(value[0])
+    del missing_name['name']
+    for item in [dict(value[0], tags=(u'x',)), missing_name,
+                 dict(value[0], scores=dict(s=(1, 2)))]:
+        result = dictify(schema, [item], share_unchanged=True)
+        assert result == dictify(schema, [item])
+        assert result[0] is not item
+        if isinstance(item['tags'], list):
+            assert result[0]['tags'] is item['tags']
+    discard = List().of(SchemaMapping().of(name=String()))
+    assert dictify(discard, [dict(name=u'a')], share_unchanged=True)[0] == \
+        dict(name=u'a')
+    assert dictify(discard, [dict(name=u'a', extra=1)],
+        share_unchanged=True) == [dict(name=u'a')]
+    # Custom handlers aren't assumed to leave values unchanged
+    double = dictify.sub()
+    @double.when(Int)
+    def double_int(dispgraph, value, **kw):
+        return value * 2
+    result = double(schema, value, share_unchanged=True)
+    assert result[0]['tags'] is value[0]['tags']
+    assert result[0]['scores'] == dict(s=[2, 4], t=None)
+    # Each part of the value is only checked once
+    checked = []
+    counted = dictify.sub()
+    @counted.when(Optional)
+    @stepwise
+    def dictify_opt(dispgraph, value, **kw):
+        inner = dispgraph.for_marker(dispgraph.marker.marker)
+        raise Return((yield inner.defer(value, **kw)))
+    def check(node, marker, value, keys):
+        checked.append(value)
+        return [(None, value)]
+    dictify_opt.unchanged = check
+    nested = List().of(List().of(Optional.wrap(Int())))
+    value = [(10,), [20, 30]]
+    result = counted(nested, value, share_unchanged=True)
+    assert result == [[10], [20, 30]] and result[1] is value[1]
+    assert sorted(checked) == [10, 20, 30]
+
+def test_memoize():
+    seen = []
+    class Tag(SchemaObj):
+        field_types = dict(name=String(), weight=Int())
+    counting = dictify.sub()
+    @counting.when(String)
+    def count_string(dispgraph, value, **kw):
+        seen.append(value)
+        return value
+    schema = SchemaMapping().of(
+        tags=List().of(Tag),
+        best=Optional.wrap(Tag),
+        groups=List().of(List().of(Tag)),
+    )
+    tag, other = Tag(name=u'a', weight=1), Tag(name=u'b', weight=2)
+    group = [tag, other]
+    value = dict(tags=[tag, other, tag], best=tag, groups=[group, group])
+    expected = counting(schema, value)
+    assert len(seen) == 8
+    del seen[:]
+    result = counting(schema, value, memoize=True)
+    # best is reached through an Optional, so it's a different typegraph node
+    assert result == expected and seen == [u'a', u'b', u'a']
+    assert result['tags'][0] is result['tags'][2] is result['groups'][0][0]
+    assert result['groups'][0] is result['groups'][1]
+    assert result['best'] is not result['tags'][0]
+    copy = clone(schema, value, memoize=True)
+    assert copy['tags'][0] is copy['tags'][2] and copy['tags'][0] is not tag
+    assert dictify(copy['tags'][0].typegraph, copy['tags'][0]) == dict(
+        name=u'a', weight=1)
+    # Errors aren't remembered
+    shared = dict(day=u'someday')
+    with expecting_invalid('0: [day: [bad_format]], 1: [day: [bad_format]]'):
+        undictify(List().of(SchemaMapping().of(day=Date())), [shared, shared],
+            memoize=True)
@@ -0,0 +1,46 @@
+import datetime
+
+from travesty import Int, List, String, SchemaMapping, StrMapping, Optional
+from travesty import Boolean, Number, DateTime, Date, TimeDelta
+from travesty import to_columns, from_columns
+
+from helpers import expecting
+
+def test_columns():
+    inner = SchemaMapping().of(n=Int(), when=Optional.wrap(Date()))
+    rows = SchemaMapping().of(
+        flag=Boolean(), big=Int(), mixed=Number(), name=String(),
+        at=DateTime(), span=TimeDelta(), inner=inner,
+        maybe=Optional.wrap(inner), ids=StrMapping().of(Int()),
+    )
+    day = datetime.date(2000, 1, 1)
+    values = [dict(
+        flag=i % 2 == 0, big=2**70 if i == 3 else i, mixed=i if i % 2 else 0.5,
+        name=u'n{}'.format(i), at=datetime.datetime(2000, 1, 1, i),
+        span=datetime.timedelta(seconds=-i),
+        inner=dict(n=i, when=None if i % 3 else day),
+        maybe=None if i % 2 else dict(n=-i, when=day), ids={u'a': i},
+    ) for i in range(5)]
+    table = to_columns(List().of(rows), values)
+    columns = table['columns']
+    assert sorted(columns) == ['at', 'big', 'flag', 'ids', 'inner/n',
+        'inner/when', 'maybe', 'mixed', 'name', 'span']
+    assert columns['flag'].data.typecode == 'B'
+    assert columns['big'].kind == columns['mixed'].kind == 'list'
+    assert columns['name'].kind == 'list'
+    assert columns['at'].data.typecode == 'q'
+    assert columns['inner/when'].nulls == bytearray([0b10110])
+    assert list(columns['inner/when'].data) == [day.toordinal()] * 2
+    assert from_columns(List().of(rows), table) == values
+    assert from_columns(List().of(rows), to_columns(List().of(rows), [])) == []
+    with expecting(ValueError):
+        to_columns(rows, values)
+
+def test_columns_overflow():
+    rows = SchemaMapping().of(span=TimeDelta(), at=DateTime())
+    values = [dict(span=span, at=datetime.datetime.max)
+              for span in [datetime.timedelta.max, datetime.timedelta(0)]]
+    table = to_columns(List().of(rows), values)
+    # Out-of-range values fall back to a list column, and still round-trip
+    assert table['columns']['span'].kind == 'list'
+    assert from_columns(List().of(rows), table) == values
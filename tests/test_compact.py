@@ -0,0 +1,42 @@
+import datetime
+import json
+
+from travesty import Int, List, String, SchemaMapping, StrMapping, Optional
+from travesty import DateTime, compact_dictify, compact_undictify
+
+from helpers import expecting_invalid
+
+def test_compact():
+    point = SchemaMapping().of(x=Int(), y=Int())
+    schema = SchemaMapping().of(
+        name=String(),
+        at=DateTime(),
+        points=List().of(point),
+        extra=Optional.wrap(point),
+        tags=StrMapping().of(Int()),
+    )
+    value = dict(name=u'a', at=datetime.datetime(2000, 1, 2, 3, 4),
+                 points=[dict(x=1, y=2), dict(x=3, y=4)], extra=None,
+                 tags={u'n': 1})
+    data = compact_dictify(schema, value)
+    # Everything but the schemas is encoded as with dictify
+    assert data == ['2000-01-02T03:04:00', None, 'a', [[1, 2], [3, 4]], {'n': 1}]
+    assert compact_undictify(schema, json.loads(json.dumps(data))) == value
+    with expecting_invalid('extra: [type_error], points: [0: [bad_len]]'):
+        compact_undictify(schema, [data[0], {}, u'a', [[1]], {}])
+    with expecting_invalid('bad_len'):
+        compact_undictify(schema, data[:-1])
+    with expecting_invalid('type_error'):
+        compact_undictify(schema, dict(name=u'a'))
+
+def test_compact_extras():
+    schema = SchemaMapping(extra_field_policy='save').of(x=Int())
+    value = dict(x=1, note=u'n', nested=[1, 2])
+    data = compact_dictify(schema, value)
+    assert data == [1, dict(note=u'n', nested=[1, 2])]
+    assert compact_undictify(schema, json.loads(json.dumps(data))) == value
+    assert compact_undictify(schema, [1, {}]) == dict(x=1)
+    with expecting_invalid('bad_len'):
+        compact_undictify(schema, [1])
+    with expecting_invalid('type_error'):
+        compact_undictify(schema, [1, [u'note']])
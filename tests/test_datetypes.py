@@ -0,0 +1,55 @@
+import datetime
+
+from travesty import List, String, SchemaMapping, Optional
+from travesty import DateTime, Date, Time, TimeDelta, undictify
+from travesty import epoch_dictify, epoch_undictify
+
+from helpers import expecting_invalid
+
+def test_date_list_batch():
+    dates = List().of(DateTime())
+    raw = [u'2001-01-01T05:10:15', u'2001-01-01T5:10:15.25',
+           datetime.datetime(2001, 1, 2)]
+    expected = [datetime.datetime(2001, 1, 1, 5, 10, 15),
+                datetime.datetime(2001, 1, 1, 5, 10, 15, 250000),
+                datetime.datetime(2001, 1, 2)]
+    assert undictify(dates, raw) == expected
+    assert undictify(dates, raw, error_mode=0) == expected
+    with expecting_invalid('1: [bad_format], 3: [type_error]'):
+        undictify(dates, raw[:1] + [u'2001-13-01'] + raw[1:2] + [12])
+    with expecting_invalid('bad_format'):
+        undictify(dates, [u'nope'], error_mode=0)
+    # Only the strict isoformat shape is parsed natively, so newer Pythons'
+    # extra formats are rejected like they are everywhere else
+    with expecting_invalid('0: [bad_format], 1: [bad_format]'):
+        undictify(dates, [u'2001-01-01T05:10:15.1234567',
+                          u'2001-01-01 05:10:15'])
+    with expecting_invalid('bad_format'):
+        undictify(Date(), u'2001-W01-1')
+    assert undictify(Date(), u'2001-1-2') == datetime.date(2001, 1, 2)
+    # Items that aren't plain dates don't get batched
+    opt_dates = List().of(Optional.wrap(Date()))
+    assert undictify(opt_dates, [None, u'2001-01-01']) == [
+        None, datetime.date(2001, 1, 1)]
+
+def test_epoch_codecs():
+    schema = SchemaMapping().of(
+        name=String(),
+        at=DateTime(),
+        days=List().of(Date()),
+        spans=Optional.wrap(List().of(TimeDelta())),
+        time=Time(),
+    )
+    value = dict(
+        name=u'x',
+        at=datetime.datetime(1970, 1, 1, 0, 0, 1, 5),
+        days=[datetime.date(1, 1, 1), datetime.date(1970, 1, 1)],
+        spans=[datetime.timedelta(seconds=1), datetime.timedelta(days=-2)],
+        time=datetime.time(1, 2),
+    )
+    data = epoch_dictify(schema, value)
+    assert data == dict(name=u'x', at=1000005, days=[1, 719163],
+        spans=[1000000, -172800000000], time=u'01:02:00')
+    assert epoch_undictify(schema, data) == value
+    with expecting_invalid('at: [type_error], days: [1: [type_error]]'):
+        epoch_undictify(schema, dict(data, at=u'1970', days=[1, True]))
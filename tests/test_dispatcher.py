@@ -1,6 +1,8 @@
+import threading
+
 import pytest
 
-from travesty.cantrips.dispatcher import Dispatcher
+from travesty.cantrips.dispatcher import Dispatcher, FrozenDispatcherError
 
 def test_default_inheritance():
     add = Dispatcher()
@@ -21,3 +23,70 @@ def test_default_inheritance():
     assert mul(2) == 2
     mul.default_factory('x', lambda:2)
     assert mul(2) == 4
+
+
+def test_freeze():
+    base = Dispatcher()
+    @base.when(object)
+    def base_obj(d, v, x):
+        return ('obj', v, x)
+    base.default_value('x', 1)
+    sub = base.sub()
+    @sub.when(int)
+    def sub_int(d, v, x):
+        return ('int', v, x)
+    assert sub.freeze() is sub
+    assert sub.frozen and not base.frozen
+    for modify in [
+            lambda: sub.register([str], base_obj),
+            lambda: sub.set_default(None),
+            lambda: sub.default_value('x', 2),
+            lambda: sub.default_factory('x', list)]:
+        with pytest.raises(FrozenDispatcherError):
+            modify()
+    assert sub(2) == ('int', 2, 1)
+    assert sub('a') == ('obj', 'a', 1)
+    # Memoized results are the same on later calls
+    assert sub(3, x=5) == ('int', 3, 5)
+    assert sub('a') == ('obj', 'a', 1)
+    # Ancestors can still change, and the frozen dispatcher sees it
+    @base.when(str)
+    def base_str(d, v, x):
+        return ('base str', v, x)
+    base.default_value('x', 7)
+    assert sub('a') == ('base str', 'a', 7)
+    # Sub-dispatchers of frozen dispatchers can still be modified
+    subsub = sub.sub()
+    @subsub.when(str)
+    def subsub_str(d, v, x):
+        return ('str', v, x)
+    assert subsub('a') == ('str', 'a', 7)
+    assert not subsub.frozen
+
+
+def test_concurrent_dispatch():
+    total = Dispatcher()
+    @total.when(list)
+    def total_list(d, v, scale):
+        return sum(d(x) for x in v)
+    @total.when(int)
+    def total_int(d, v, scale):
+        return v * scale
+    total.default_value('scale', 2)
+    value = [1, [2, 3], [[4]] * 10] * 20
+    expected = total(value)
+    total.freeze()
+    results, errors = [], []
+    def work():
+        try:
+            for _ in range(50):
+                results.append(total(value) == expected)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert results == [True] * 400
@@ -1,3 +1,7 @@
+import os
+import pickle
+import uuid
+
 import pytest
 
 import travesty as tv
@@ -5,6 +9,8 @@ import vertigo as vg
 
 from travesty.document import Document, DocSet, UnloadedDocumentException
 from travesty.document import DoubleLoadException
+from travesty.document import IntUuids, SnowflakeUids
+from travesty.document.document import make_uid
 
 from helpers import match_asc, expecting_invalid
 
@@ -327,3 +333,279 @@ def test_graphize_recursive():
           +--value: 1
     ''')
 
+
+def test_index_maintenance():
+    docset = DocSet(indexes=[(FooHolder, 'name'), (FooHolder, 'foos/sub/bar')])
+    data = tv.dictify(FooHolder, mkfoos('h1', 'a', 'b'))
+    h1 = docset.load(FooHolder, data)
+    assert docset.find(FooHolder, 'name', 'h1') == {h1}
+    assert docset.find(FooHolder, 'foos/sub/bar', 'b') == {h1}
+    # Clone into the docset
+    h2 = tv.clone(FooHolder, mkfoos('h2', 'b', 'c'), in_docset=docset)
+    assert docset.find(FooHolder, 'foos/sub/bar', 'b') == {h1, h2}
+    assert docset.find_range(FooHolder, 'name', 'h', 'h2') == [h1]
+    # Mutate with the docset
+    rename = tv.mutate.sub()
+    @rename.when(tv.String)
+    def upper(dispgraph, value, **kw):
+        return value.upper()
+    rename(FooHolder, h1, in_docset=docset)
+    assert docset.find(FooHolder, 'name', 'h1') == set()
+    assert docset.find(FooHolder, 'name', 'H1') == {h1}
+    assert docset.find_range(FooHolder, 'name') == [h1, h2]
+    # Unloaded documents aren't indexed
+    docset.create(FooHolder, 'h3_uid')
+    assert docset.find_range(FooHolder, 'name') == [h1, h2]
+    # Mutating a doc from elsewhere doesn't add it to the docset's indexes
+    rename(FooHolder, mkfoos('h4', 'b'), in_docset=docset)
+    assert docset.find(FooHolder, 'name', 'H4') == set()
+
+def test_bad_index_path():
+    with pytest.raises(KeyError):
+        DocSet(indexes=[(FooHolder, 'foos/bar')])
+    # Lists aren't hashable; their items have to be indexed instead
+    with pytest.raises(ValueError):
+        DocSet(indexes=[(FooHolder, 'foos')])
+    DocSet(indexes=[(FooHolder, 'foos/sub')])
+    # Wrapped containers can't be indexed either, but can be looked into
+    class Wrapped(Document):
+        field_types = dict(
+            tags = tv.Optional.wrap(tv.Validated.wrap(tv.List().of(
+                tv.String()), [tv.validators.HasLengthInRange(1)])),
+            pair = tv.Tuple.mkgraph((tv.Int(), tv.Int())),
+            either = tv.Polymorph.mkgraph(dict(num=(int, tv.Int()))),
+        )
+    for path in ['tags', 'pair/0', 'either', 'either/num']:
+        with pytest.raises(ValueError):
+            DocSet(indexes=[(Wrapped, path)])
+    docset = DocSet(indexes=[(Wrapped, 'tags/sub'), (Wrapped, 'pair')])
+    doc = Wrapped(tags=[u'a', u'b'], pair=(1, 2))
+    docset.add(doc)
+    docset.add(Wrapped(tags=None))
+    assert docset.find(Wrapped, 'tags/sub', u'b') == {doc}
+    assert docset.find(Wrapped, 'pair', (1, 2)) == {doc}
+
+class IntFoo(Document):
+    uid_strategy = IntUuids()
+    field_types = dict(
+        bar = tv.String(),
+    )
+
+class SnowflakeHolder(Document):
+    uid_strategy = SnowflakeUids(worker=3)
+    field_types = dict(
+        foos = tv.List().of(IntFoo),
+    )
+
+def test_uid_strategies():
+    foos = [IntFoo(bar=str(i)) for i in range(3)]
+    assert all(isinstance(f.uid, int) for f in foos)
+    assert len(set(f.uid for f in foos)) == 3
+    # make_uid still gives Document's default string uids
+    assert isinstance(make_uid(), type(u'')) and make_uid() != make_uid()
+    holder = SnowflakeHolder(foos=foos + foos[:1])
+    tv.validate(SnowflakeHolder, holder)
+    # Snowflake uids are time-ordered
+    uids = SnowflakeUids().bulk(5000)
+    assert uids == sorted(set(uids))
+    # dictify emits strings; undictify converts back
+    data = tv.dictify(SnowflakeHolder, holder)
+    assert data['uid'] == str(holder.uid)
+    assert data['foos'][0]['uid'] == str(uuid.UUID(int=foos[0].uid))
+    assert data['foos'][3] == {'uid': data['foos'][0]['uid']}
+    docset = DocSet()
+    loaded = docset.load(SnowflakeHolder, data)
+    assert loaded.uid == holder.uid
+    assert [f.uid for f in loaded.foos] == [f.uid for f in holder.foos]
+    assert loaded.foos[0] is loaded.foos[3]
+    assert docset[IntFoo, foos[1].uid] is loaded.foos[1]
+    assert set(docset.of_type(IntFoo)) == set(f.uid for f in foos)
+    assert len(docset.document_map) == 4
+    with expecting_invalid('foos: [0: [bad_uid]]'):
+        tv.undictify(SnowflakeHolder, dict(uid='1', foos=[dict(uid='x')]))
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_uids_after_fork():
+    Foo()  # make sure the pool is filled
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0: # pragma: no cover
+        os.close(read_fd)
+        os.write(write_fd, Foo().uid.encode('ascii'))
+        os._exit(0)
+    os.close(write_fd)
+    child_uid = os.read(read_fd, 100).decode('ascii')
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    assert child_uid
+    assert child_uid != Foo().uid
+
+def test_deep_chain():
+    head = mklist(range(2000))
+    data = tv.dictify(LinkedList, head)
+    tv.validate(LinkedList, head)
+    copy = tv.clone(LinkedList, head)
+    loaded = tv.undictify(LinkedList, data)
+    for l in [copy, loaded]:
+        for i in range(2000):
+            assert l.value == i
+            l = l.next
+        assert l is None
+
+
+def test_walk_docs():
+    holder = mkfoos("h", "a", "b", "a")
+    paths = [path for path, _, _ in tv.walk(FooHolder, holder)]
+    # The second reference to foo 'a' isn't expanded
+    assert sorted(paths) == [(), ('foos',),
+        ('foos', '0'), ('foos', '0', 'bar'), ('foos', '0', 'uid'),
+        ('foos', '1'), ('foos', '1', 'bar'), ('foos', '1', 'uid'),
+        ('foos', '2'), ('name',), ('uid',)], paths
+    # Parents come before their children
+    for i, path in enumerate(paths[1:], 1):
+        assert path[:-1] in paths[:i]
+    # Pruning the first reference expands the second one instead
+    w = tv.walk(FooHolder, holder)
+    paths = []
+    for path, marker, value in w:
+        paths.append(path)
+        if path == ('foos', '0'):
+            w.send(tv.PRUNE)
+    assert ('foos', '0', 'bar') not in paths
+    assert ('foos', '2', 'bar') in paths
+    # Unloaded docs only have their uids walked
+    holder.foos[1] = Foo._create_unloaded(u'unloaded')
+    events = list(tv.walk(FooHolder, holder))
+    assert [e[0] for e in events if e[0][:2] == ('foos', '1')] == [
+        ('foos', '1'), ('foos', '1', 'uid')]
+    # Walking is not recursive
+    head = mklist(range(2000))
+    values = [v for path, _, v in tv.walk(LinkedList, head) if path[-1:] == ('value',)]
+    assert values == list(range(2000))
+
+
+def test_lazy_graphize_recursive():
+    x = mklist([1,2,3], closed=True)
+    g = tv.lazy_graphize(LinkedList, x)
+    assert g['next', 'next', 'next'] is g
+    match_asc(g, '''
+        root: <LinkedList: node0>
+          +--next: <LinkedList: node1>
+          |  +--next: <LinkedList: node2>
+          |  |  +--next - recursive copy of root
+          |  |  +--uid: 'node2'
+          |  |  +--value: 3
+          |  +--uid: 'node1'
+          |  +--value: 2
+          +--uid: 'node0'
+          +--value: 1
+    ''')
+    x = FooHolder._create_unloaded('foo')
+    assert list(tv.lazy_graphize(FooHolder, x).key_iter()) == ['uid']
+
+
+def test_pack_docs():
+    holder = mkfoos("h", "a", "b", "a")
+    docset = DocSet()
+    copy = tv.unpack(FooHolder, tv.pack(FooHolder, holder), in_docset=docset)
+    assert copy is not holder
+    assert [f.bar for f in copy.foos] == ['a', 'b', 'a']
+    assert copy.foos[0] is copy.foos[2]
+    assert docset[Foo, 'a_uid'] is copy.foos[0]
+    # Cycles are fine
+    x = mklist([1, 2, 3], closed=True)
+    y = tv.unpack(LinkedList, tv.pack(LinkedList, x))
+    assert y.next.next.next is y
+    assert y.next.next.value == 3
+    # Unloaded documents are packed as references
+    holder.foos[1] = Foo._create_unloaded(u'unloaded')
+    copy = tv.unpack(FooHolder, tv.pack(FooHolder, holder))
+    assert not copy.foos[1].loaded
+    assert copy.foos[1].uid == u'unloaded'
+    # Integer uids
+    holder = SnowflakeHolder(foos=[IntFoo(bar=u'x')])
+    copy = tv.unpack(SnowflakeHolder, tv.pack(SnowflakeHolder, holder))
+    assert copy.uid == holder.uid
+    assert copy.foos[0].uid == holder.foos[0].uid
+    # Deep values don't hit the recursion limit
+    head = mklist(range(2000))
+    l = tv.unpack(LinkedList, tv.pack(LinkedList, head))
+    for i in range(2000):
+        assert l.value == i
+        l = l.next
+    assert l is None
+
+
+def test_compact_docs():
+    holder = mkfoos("h", "a", "b", "a")
+    data = tv.compact_dictify(FooHolder, holder)
+    assert data == [[['a', 'a_uid'], ['b', 'b_uid'], 'a_uid'], 'h', 'h_uid']
+    docset = DocSet()
+    copy = tv.compact_undictify(FooHolder, data, in_docset=docset)
+    assert [f.bar for f in copy.foos] == ['a', 'b', 'a']
+    assert copy.foos[0] is copy.foos[2]
+    assert docset[Foo, 'a_uid'] is copy.foos[0]
+    # Cycles are fine
+    x = mklist([1, 2, 3], closed=True)
+    data = tv.compact_dictify(LinkedList, x)
+    assert data == [[[u'node0', u'node2', 3], u'node1', 2], u'node0', 1]
+    y = tv.compact_undictify(LinkedList, data)
+    assert y.next.next.next is y
+    # Bare uids become unloaded documents
+    copy = tv.compact_undictify(FooHolder, [['x_uid'], 'h', 'h_uid'])
+    assert not copy.foos[0].loaded
+    assert copy.foos[0].uid == 'x_uid'
+    with expecting_invalid('foos: [0: [bad_len]]'):
+        tv.compact_undictify(FooHolder, [[['a']], 'h', 'h_uid'])
+
+
+def test_columns_docs():
+    holder = mkfoos('holder', 'a', 'b', 'a')
+    Foos = tv.List().of(Foo)
+    table = tv.to_columns(Foos, iter(holder.foos))
+    assert table['length'] == 3
+    assert table['columns'][''].data[2] == {'uid': 'a_uid'}
+    out = tv.from_columns(Foos, table)
+    assert out[0] is out[2] and out[0] is not out[1]
+    assert [f.bar for f in out] == ['a', 'b', 'a']
+    # Documents in different columns are shared too
+    class Pair(tv.SchemaObj):
+        field_types = dict(left=Foo, right=Foo)
+    pairs = [Pair(left=f, right=holder.foos[0]) for f in holder.foos]
+    out = tv.from_columns(tv.List().of(Pair), tv.to_columns(
+        tv.List().of(Pair), pairs))
+    assert out[0].left is out[1].right is out[2].left
+    assert out[1].left.bar == 'b'
+
+def test_pickle_docs():
+    holder = mkfoos("h", "a", "b", "a")
+    assert holder.__getstate__() == (holder.foos, 'h', 'h_uid')
+    copy = pickle.loads(pickle.dumps(holder))
+    assert copy.loaded
+    assert [f.bar for f in copy.foos] == ['a', 'b', 'a']
+    assert copy.foos[0] is copy.foos[2]
+    # Cycles are fine
+    x = mklist([1, 2, 3], closed=True)
+    y = pickle.loads(pickle.dumps(x))
+    assert y.next.next.next is y
+    assert y.next.next.value == 3
+    # Unloaded documents stay unloaded
+    holder.foos[1] = Foo._create_unloaded(u'unloaded')
+    copy = pickle.loads(pickle.dumps(holder, 2))
+    assert not copy.foos[1].loaded
+    assert copy.foos[1].uid == u'unloaded'
+    with pytest.raises(UnloadedDocumentException):
+        copy.foos[1].bar
+
+def test_memoize():
+    holder = mkfoos("holder", "a", "b", "a")
+    schema = tv.List().of(tv.SchemaMapping().of(h=FooHolder, foos=tv.List().of(Foo)))
+    shared = dict(h=holder, foos=holder.foos)
+    value = [shared, shared]
+    expected = tv.dictify(schema, value)
+    # Documents are dictified in full only the first time they're seen
+    assert expected[1]['h'] == dict(uid='holder_uid')
+    assert tv.dictify(schema, value, memoize=True) == expected
+    result = tv.clone(schema, value, memoize=True)
+    assert result[0]['h'] is result[1]['h']
+    assert result[0]['foos'][0] is result[0]['foos'][2]
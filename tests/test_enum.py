@@ -0,0 +1,38 @@
+from travesty import List, SchemaMapping, Optional, Enum
+from travesty import dictify, undictify, validate
+from travesty import to_columns, from_columns, pack, unpack
+
+from helpers import expecting, expecting_invalid
+
+def test_enum():
+    with expecting(ValueError):
+        Enum(['a', 'b', 'a'])
+    codes = [u'c{}'.format(i) for i in range(300)]
+    schema = SchemaMapping().of(
+        plain=Enum(codes),
+        coded=Enum(codes, as_index=True),
+        maybe=Optional.wrap(Enum(codes)),
+    )
+    values = [dict(plain=codes[i], coded=codes[-i], maybe=None if i % 2 else codes[i])
+              for i in range(50)]
+    validate(List().of(schema), values)
+    data = dictify(List().of(schema), values)
+    assert data[1] == dict(plain=u'c1', coded=299, maybe=None)
+    assert undictify(List().of(schema), data) == values
+    with expecting_invalid('0: [coded: [invalid_choice]]'):
+        undictify(List().of(schema), [dict(data[0], coded=300)])
+    with expecting_invalid('coded: [invalid_choice], plain: [invalid_choice]'):
+        validate(schema, dict(plain=u'x', coded=[u'c1'], maybe=None))
+    # Bulk encodings use the indices
+    table = to_columns(List().of(schema), values)
+    for key in ['plain', 'coded', 'maybe']:
+        column = table['columns'][key]
+        assert column.kind == 'dict' and column.data.typecode == 'H'
+        assert column.values == codes
+    assert from_columns(List().of(schema), table) == values
+    assert unpack(List().of(schema), pack(List().of(schema), values)) == values
+    # Reordering the options changes the packed format
+    other = SchemaMapping().of(plain=Enum(codes[::-1]), coded=Enum(codes),
+        maybe=Optional.wrap(Enum(codes)))
+    with expecting_invalid('schema_mismatch'):
+        unpack(other, pack(schema, values[0]))
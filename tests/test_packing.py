@@ -0,0 +1,76 @@
+import binascii
+import datetime
+from collections import namedtuple
+
+from travesty import Int, List, String, SchemaMapping, UniMapping, StrMapping
+from travesty import Optional, Tuple, NamedTuple, Polymorph, Passthrough, Enum
+from travesty import Boolean, Bytes, Number, Complex
+from travesty import DateTime, Date, Time, TimeDelta
+from travesty import pack, unpack
+from travesty.packing import fingerprint, _fingerprints
+
+from helpers import expecting_invalid
+
+def test_pack_roundtrip():
+    P = namedtuple('P', ['x', 'y'])
+    Shape = Polymorph.mkgraph(dict(
+        num=(int, Int()),
+        name=(type(u''), String()),
+    ))
+    schema = SchemaMapping().of(**{
+        'bool': Boolean(), 'int': Int(), 'num': List().of(Number()),
+        'complex': Complex(), 'str': String(), 'bytes': Bytes(),
+        'dt': DateTime(), 'date': Date(), 'time': Time(), 'td': TimeDelta(),
+        'opt1': Optional.wrap(Int()), 'opt2': Optional.wrap(Int()),
+        'opts': List().of(Optional.wrap(String())),
+        'strmap': StrMapping().of(Int()),
+        'unimap': UniMapping().of(key=Int(), val=String()),
+        'tuple': Tuple.mkgraph((Int(), String())),
+        'point': NamedTuple(P).of(x=Int(), y=Int()),
+        'shapes': List().of(Shape),
+        'any': Passthrough(),
+    })
+    value = {
+        'bool': True, 'int': -2**70, 'num': [1, 2.5, -3], 'complex': 1+2j,
+        'str': u'☃', 'bytes': b'\x00\xff',
+        'dt': datetime.datetime(1900, 1, 1, 0, 0, 0, 1),
+        'date': datetime.date(2000, 2, 29), 'time': datetime.time(1, 2, 3),
+        'td': datetime.timedelta(days=-3), 'opt1': None, 'opt2': 0,
+        'opts': [None, u'a'], 'strmap': {u'a': 1}, 'unimap': {5: u'five'},
+        'tuple': (1, u'x'), 'point': P(3, 4), 'shapes': [1, u'one'],
+        'any': {u'k': [None, 1.5, b'b', u's', False]},
+    }
+    data = pack(schema, value)
+    result = unpack(schema, data)
+    assert result == value
+    assert type(result['point']) is P
+    assert unpack(schema, bytearray(data)) == value
+    with expecting_invalid('bad_data'):
+        unpack(schema, data + b'\x00')
+    with expecting_invalid('bad_data'):
+        unpack(schema, b'nope' + data[4:])
+    with expecting_invalid('schema_mismatch'):
+        unpack(SchemaMapping().of(x=Int()), data)
+    # Values that can't be encoded are Invalid, not arbitrary exceptions
+    for bad in [dict(value, str=None), dict(value, date=u'2000-01-01'),
+                dict(value, num=[u'x'])]:
+        with expecting_invalid('type_error'):
+            pack(schema, bad)
+    for bad in [(1,), (1, u'x', 2)]:
+        with expecting_invalid('bad_len'):
+            pack(schema, dict(value, tuple=bad))
+    # Extra fields are kept when the schema saves them
+    saving = SchemaMapping('save').of(n=Int())
+    extra = {'n': 1, 'color': u'blue', 'tags': [u'a', 2]}
+    assert unpack(saving, pack(saving, extra)) == extra
+    assert unpack(SchemaMapping().of(n=Int()),
+        pack(SchemaMapping().of(n=Int()), extra)) == {'n': 1}
+    with expecting_invalid('schema_mismatch'):
+        unpack(SchemaMapping().of(n=Int()), pack(saving, extra))
+
+def test_fingerprint():
+    schema = SchemaMapping().of(n=Int())
+    assert fingerprint(schema) == _fingerprints[schema]
+    # Enum options are described the same way on every python version
+    options = [u'a', 1, b'x', (2, u'b'), None, 1.5]
+    assert binascii.hexlify(fingerprint(Enum(options))) == b'48217657312e2377'
@@ -0,0 +1,79 @@
+import datetime
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from travesty import Int, List, String, SchemaMapping, Optional
+from travesty import DateTime, Number, CHECK, dictify
+from travesty.parallel import imap, iter_chunks, parallel_dictify
+from travesty.parallel import parallel_undictify, parallel_validate
+
+from helpers import expecting, expecting_invalid
+
+def test_parallel():
+    schema = SchemaMapping().of(
+        n=Int(), at=Optional.wrap(DateTime()), tags=List().of(String()))
+    # Typegraphs are picklable, so they can be sent to the workers
+    value = dict(n=1, at=None, tags=[u'a'])
+    assert dictify(pickle.loads(pickle.dumps(schema)), value) == value
+    values = [dict(n=i, at=datetime.datetime(2000, 1, 1, i % 24), tags=[u'x'])
+              for i in range(100)]
+    data = parallel_dictify(schema, values, chunksize=7, max_workers=2)
+    assert data == dictify(List().of(schema), values)
+    assert parallel_undictify(schema, data, chunksize=7, max_workers=2) == values
+    # Typegraphs can also be given by name
+    docs = parallel_undictify('travesty.document:Document', [dict(uid=u'a')],
+        max_workers=1)
+    assert docs[0].uid == u'a'
+    unordered = imap('travesty:dictify', Int(), range(20), chunksize=3, ordered=False,
+        max_workers=2)
+    assert sorted(unordered) == [(i, i) for i in range(20)]
+    # Chunks of different jobs can share a thread pool
+    with ThreadPoolExecutor(4) as pool:
+        ints = imap('travesty:dictify', Int(), range(200), chunksize=1,
+            executor=pool)
+        strs = imap('travesty:dictify', String(), [u'a'] * 200, chunksize=1,
+            executor=pool)
+        assert list(zip(ints, strs)) == [(i, u'a') for i in range(200)]
+    # Dispatchers can't be pickled, so they have to be given by name
+    with expecting(pickle.PicklingError):
+        list(imap(dictify, Int(), range(20), max_workers=1))
+    values[3]['n'] = 'x'
+    values[50]['tags'] = [1]
+    values[99]['at'] = 12
+    with expecting_invalid('3: [n: [type_error]], 50: [tags: [0: [type_error]]], '
+            '99: [at: [type_error]]'):
+        parallel_validate(schema, values, chunksize=7, max_workers=2)
+    with expecting_invalid('3: [n: [type_error]]'):
+        parallel_validate(schema, values, chunksize=7, max_workers=2,
+            error_mode=CHECK)
+
+def test_parallel_shared_memory():
+    pytest.importorskip('multiprocessing.shared_memory')
+    schema = SchemaMapping().of(
+        n=Int(), x=Number(), at=DateTime(), name=String(), label=String(),
+        maybe=Optional.wrap(Int()), tags=List().of(String()))
+    values = [dict(n=i, x=i / 4.0, at=datetime.datetime(2000, 1, 1, i % 24),
+                   name=u'n{}'.format(i % 3), label=u'\xe9{}'.format(i),
+                   maybe=None if i % 2 else i, tags=[u'a'] * (i % 3))
+              for i in range(100)]
+    data = dictify(List().of(schema), values)
+    before = set(os.listdir('/dev/shm'))
+    result = parallel_undictify(schema, data, chunksize=30, max_workers=2,
+        transport='shared_memory')
+    assert result == values
+    for start, table in iter_chunks('travesty:undictify', schema, data,
+            chunksize=30, max_workers=2, transport='shared_memory'):
+        with table:
+            assert isinstance(table.columns['n'].data, memoryview)
+            assert table.columns['label'].data[0] == values[start]['label']
+            assert table.records(List().of(schema)) == values[start:start+30]
+    # All the shared memory has been released
+    assert set(os.listdir('/dev/shm')) == before
+    with expecting(ValueError):
+        parallel_undictify(schema, data, transport='carrier_pigeon')
+    for fn in ['travesty:dictify', 'travesty:epoch_dictify']:
+        with expecting(ValueError):
+            next(iter_chunks(fn, schema, values, transport='shared_memory'))
@@ -1,3 +1,5 @@
+import pickle
+
 import travesty as tv
 
 import pytest
@@ -30,6 +32,18 @@ class Line(tv.SchemaObj):
     def __eq__(self, other):
         return self.start == other.start and self.end == other.end
 
+class Interned(tv.SchemaObj):
+    field_types = dict(name = tv.String())
+    instances = {}
+
+    def __reduce__(self):
+        return (intern, (self.name,))
+
+def intern(name):
+    if name not in Interned.instances:
+        Interned.instances[name] = Interned(name=name)
+    return Interned.instances[name]
+
 def mkline(x1, y1, x2, y2, label1='start', label2='end'):
     return Line(
         start = Point(x1, y1, label1),
@@ -125,3 +139,56 @@ class TestMisc(object):
             field_types = Point.subfields('x', 'y', z=tv.Int())
         a = tv.undictify(UnlabeledPoint, dict(x=1, y=2, z=3))
         tv.validate(UnlabeledPoint, a)
+
+    def test_pickle(self):
+        line = mkline(1, 2, 3, 4)
+        assert line.start.__getstate__() == ('start', 1, 2)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            assert pickle.loads(pickle.dumps(line, protocol)) == line
+        # Extra attributes fall back to pickling the __dict__
+        line.note = 'extra'
+        copy = pickle.loads(pickle.dumps(line))
+        assert copy == line
+        assert copy.note == 'extra'
+        # State from a version of the class with other fields is rejected
+        with pytest.raises(ValueError):
+            object.__new__(Point).__setstate__((1, 2))
+        # Subclasses can still customise pickling
+        a = intern('a')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            assert pickle.loads(pickle.dumps(a, protocol)) is a
+
+
+class Tree(tv.SchemaObj):
+    field_types = lambda cls: dict(
+        label = tv.String(),
+        children = tv.List().of(cls),
+    )
+Tree._finalize_typegraph()
+
+class TestDeep(object):
+    def mktree(self, depth):
+        tree = Tree(label='leaf', children=[])
+        for i in range(depth):
+            tree = Tree(label=str(i), children=[tree])
+        return tree
+
+    def test_deep_roundtrip(self):
+        data = tv.dictify(Tree, self.mktree(2000))
+        tree = tv.undictify(Tree, data)
+        tv.validate(Tree, tree)
+        tv.traverse(Tree, tree)
+        tree = tv.clone(Tree, tree)
+        for i in reversed(range(2000)):
+            assert tree.label == str(i)
+            tree, = tree.children
+        assert tree.label == 'leaf'
+
+    def test_deep_invalid(self):
+        tree = self.mktree(2000)
+        leaf = tree
+        while leaf.children:
+            leaf = leaf.children[0]
+        leaf.label = 12
+        with pytest.raises(tv.Invalid):
+            tv.validate(Tree, tree)
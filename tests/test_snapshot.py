@@ -0,0 +1,100 @@
+import pickle
+
+import pytest
+
+import travesty as tv
+from travesty.document import DocSet, UnloadedDocumentException
+
+from test_document import Foo, FooHolder, LinkedList, IntFoo, SnowflakeHolder
+from test_document import mkfoos, mklist
+
+def test_snapshot_roundtrip(tmpdir):
+    path = str(tmpdir.join('docs.snap'))
+    holder = mkfoos('holder', 'a', 'b', 'a')
+    docset = DocSet([holder] + holder.foos[:2])
+    docset.create(Foo, 'unloaded_uid')
+    docset.save_snapshot(path)
+    loaded = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    new_holder = loaded[FooHolder, 'holder_uid']
+    a = loaded[Foo, 'a_uid']
+    # Nothing is decoded until a field is accessed
+    assert not new_holder.loaded and not a.loaded
+    assert new_holder.name == 'holder'
+    assert new_holder.loaded
+    assert new_holder.foos == [a, loaded[Foo, 'b_uid'], a]
+    assert not a.loaded
+    assert a.bar == 'a'
+    assert tv.dictify(FooHolder, new_holder) == tv.dictify(FooHolder, holder)
+    # Unloaded documents stay unloaded
+    with pytest.raises(UnloadedDocumentException):
+        loaded[Foo, 'unloaded_uid'].bar
+
+def test_snapshot_resave(tmpdir):
+    path = str(tmpdir.join('docs.snap'))
+    holder = mkfoos('holder', 'a', 'b')
+    DocSet([holder] + holder.foos).save_snapshot(path)
+    loaded = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    a = loaded[Foo, 'a_uid']
+    assert a.bar == 'a'
+    a.bar = 'changed'
+    # Untouched docs are saved as they were, even over the file they came from
+    loaded.save_snapshot(path)
+    assert not loaded[Foo, 'b_uid'].loaded
+    reloaded = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    assert reloaded[Foo, 'a_uid'].bar == 'changed'
+    assert reloaded[Foo, 'b_uid'].bar == 'b'
+    assert reloaded[FooHolder, 'holder_uid'].name == 'holder'
+    # Cloning loads lazy docs rather than copying them unloaded
+    lazy = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    clone = tv.clone(FooHolder, lazy[FooHolder, 'holder_uid'])
+    assert clone.name == 'holder'
+    assert [f.bar for f in clone.foos] == ['changed', 'b']
+
+def test_snapshot_pickle(tmpdir):
+    path = str(tmpdir.join('docs.snap'))
+    holder = mkfoos('holder', 'a', 'b')
+    docset = DocSet([holder] + holder.foos)
+    docset.create(Foo, 'unloaded_uid')
+    docset.save_snapshot(path)
+    loaded = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    # Lazy docs are pickled with their data rather than the mapped file
+    copied = pickle.loads(pickle.dumps(loaded))
+    new_holder = copied[FooHolder, 'holder_uid']
+    assert new_holder.loaded and new_holder.name == 'holder'
+    assert new_holder.foos == [copied[Foo, 'a_uid'], copied[Foo, 'b_uid']]
+    assert [f.bar for f in new_holder.foos] == ['a', 'b']
+    assert not copied[Foo, 'unloaded_uid'].loaded
+    a = pickle.loads(pickle.dumps(DocSet.open_snapshot(path)[Foo, 'a_uid']))
+    assert a.loaded and a.bar == 'a'
+
+def test_snapshot_recursive(tmpdir):
+    path = str(tmpdir.join('list.snap'))
+    head = mklist([1, 2, 3], closed=True)
+    DocSet([head, head.next, head.next.next]).save_snapshot(path)
+    # Types are imported by name if not given explicitly
+    loaded = DocSet.open_snapshot(path)
+    new_head = loaded[LinkedList, 'node0']
+    assert new_head.next.next.next is new_head
+    assert flatten_n(new_head, 4) == [1, 2, 3, 1]
+
+def flatten_n(l, n):
+    return [l.value] + flatten_n(l.next, n-1) if n else []
+
+def test_index_snapshot(tmpdir):
+    path = str(tmpdir.join('docs.snap'))
+    holder = mkfoos('holder', 'a', 'b')
+    DocSet([holder] + holder.foos).save_snapshot(path)
+    loaded = DocSet.open_snapshot(path, types=[Foo, FooHolder])
+    loaded.add_index(Foo, 'bar')
+    assert loaded.find(Foo, 'bar', 'b') == {loaded[Foo, 'b_uid']}
+    assert loaded.find_range(Foo, 'bar') == [
+        loaded[Foo, 'a_uid'], loaded[Foo, 'b_uid']]
+
+def test_snapshot_uid_strategies(tmpdir):
+    path = str(tmpdir.join('uids.snap'))
+    holder = SnowflakeHolder(foos=[IntFoo(bar='a'), IntFoo(bar='b')])
+    DocSet([holder] + holder.foos).save_snapshot(path)
+    loaded = DocSet.open_snapshot(path)
+    new_holder = loaded[SnowflakeHolder, holder.uid]
+    assert [f.bar for f in new_holder.foos] == ['a', 'b']
+    assert new_holder.foos[1] is loaded[IntFoo, holder.foos[1].uid]
@@ -0,0 +1,20 @@
+import pickle
+
+from travesty import String, SchemaMapping, Bytes
+from travesty import dictify, validate, clone, binary_dictify, binary_undictify
+
+def test_bytes_buffers():
+    schema = SchemaMapping().of(name=String(), blob=Bytes())
+    buf = bytearray(b'0123456789')
+    view = memoryview(buf)[2:5]
+    value = dict(name=u'x', blob=view)
+    validate(schema, value)
+    assert clone(schema, value)['blob'] is view
+    assert dictify(schema, value) == dict(name=u'x', blob=u'MjM0')
+    # Views are copied, since pickle can't handle them
+    data = pickle.loads(pickle.dumps(binary_dictify(schema, value)))
+    assert data == dict(name=u'x', blob=b'234')
+    value['blob'] = buf
+    data = pickle.loads(pickle.dumps(binary_dictify(schema, value)))
+    assert data == dict(name=u'x', blob=buf)
+    assert binary_undictify(schema, data) == value
@@ -115,3 +115,107 @@ class TestNonEmptyString(unittest.TestCase):
     def test_direct_validation(self):
         with self.assertRaises(tv.Invalid):
             tv.validators.IsNonEmptyString().validate(['not', 'a', 'string'])
+
+class TestValidated(unittest.TestCase):
+    def test_errors(self):
+        vdors = [tv.validators.HasLength(3), tv.validators.MatchesRegex('[a-z]+$')]
+        typegraph = tv.Validated(tv.String(), vdors)
+        tv.validate(typegraph, 'abc')
+        with self.assertRaises(tv.Invalid) as cm:
+            tv.validate(typegraph, 'ABCD')
+        self.assertEqual(cm.exception.id_string(),
+            'value_error/wrong_length, invalid_string')
+        with self.assertRaises(tv.Invalid) as cm:
+            tv.validate(typegraph, 'ABCD', dfy_fail_early=True)
+        self.assertEqual(cm.exception.id_string(), 'value_error/wrong_length')
+
+    def test_custom_handler(self):
+        # Validators with their own validate handlers still go through them
+        class IsShouting(tv.validators.Validator):
+            pass
+        checker = tv.validate.sub()
+        @checker.when(IsShouting)
+        def check_shouting(dispgraph, value, **kwargs):
+            if value != value.upper():
+                raise tv.Invalid('not_shouting')
+        typegraph = tv.Validated(tv.String(), [IsShouting()])
+        checker(typegraph, 'HI')
+        with self.assertRaises(tv.Invalid) as cm:
+            checker(typegraph, 'hi')
+        self.assertEqual(cm.exception.id_string(), 'not_shouting')
+
+    def test_failing_indices(self):
+        v = tv.validators
+        cases = [
+            (v.IsInRange(0, 5), [0, -1, 5, 6, None]),
+            (v.IsInRange(low=0), [0, -1, 5, 6]),
+            (v.HasLength(2), ['ab', 'a', [1, 2], '']),
+            (v.HasLengthInRange(1, 2), ['ab', 'a', 'abc', '']),
+            (v.IsOneOf(['a', 'b']), ['a', 'c', 'b', None]),
+            (v.IsOneOf(['a', ['b']]), ['a', ['b'], 'c']),
+            (v.MatchesRegex('[a-z]+$'), ['abc', 'ABC', 12, 'ab1']),
+            (v.IsNonEmptyString(), ['a', '', '  ', 12]),
+            (v.IsEmail(), ['a@b.com', 'nope', 12]),
+        ]
+        for vdator, values in cases:
+            expected = []
+            for i, value in enumerate(values):
+                try:
+                    vdator.validate(value)
+                except tv.Invalid:
+                    expected.append(i)
+            self.assertEqual(vdator.failing_indices(values), expected)
+            self.assertEqual(vdator.failing_indices(tuple(values)), expected)
+
+    def test_overridden_validate(self):
+        # A subclass that changes validate() isn't checked with its parent's
+        # failing_indices
+        class IsEvenInRange(tv.validators.IsInRange):
+            def validate(self, value, **kwargs):
+                super(IsEvenInRange, self).validate(value, **kwargs)
+                if value % 2:
+                    raise tv.Invalid("odd")
+        typegraph = tv.List().of(IsEvenInRange(0, 10).of(tv.Int()))
+        tv.validate(typegraph, [2, 4])
+        with self.assertRaises(tv.Invalid) as cm:
+            tv.validate(typegraph, [2, 3, 12])
+        self.assertEqual(cm.exception.id_string(),
+            '1: [odd], 2: [range_error/too_high]')
+
+    def test_new_handler(self):
+        # Registering a handler after a validator has been used takes effect
+        class IsSmall(tv.validators.IsInRange):
+            pass
+        typegraph = tv.Validated(tv.Int(), [IsSmall(0, 10)])
+        tv.validate(typegraph, 5)
+        check = tv.validate.sub()
+        @check.when(IsSmall)
+        def check_small(dispgraph, value, **kwargs):
+            if value == 5:
+                raise tv.Invalid("five")
+        with self.assertRaises(tv.Invalid) as cm:
+            check(typegraph, 5)
+        self.assertEqual(cm.exception.id_string(), 'five')
+        tv.validate(typegraph, 5)
+        with self.assertRaises(tv.Invalid) as cm:
+            check(tv.List().of(typegraph), [1, 5])
+        self.assertEqual(cm.exception.id_string(), '1: [five]')
+
+    def test_list_batch(self):
+        # Lists are validated in one go, with the same errors as item by item
+        marker = tv.Validated(tv.String(), [
+            tv.validators.HasLengthInRange(1, 3),
+            tv.validators.MatchesRegex('[a-z]+$'),
+        ])
+        typegraph = tv.List().of(marker)
+        tv.validate(typegraph, ['a', 'bc', 'def'])
+        values = ['a', 'BCDE', 3, 'ok', '']
+        with self.assertRaises(tv.Invalid) as cm:
+            tv.validate(typegraph, values)
+        self.assertEqual(cm.exception.id_string(), '1: [value_error/too_long, '
+            'invalid_string], 2: [type_error], 4: [value_error/too_short, '
+            'invalid_string]')
+        with self.assertRaises(tv.Invalid) as cm:
+            tv.validate(typegraph, values, error_mode=tv.CHECK)
+        self.assertEqual(cm.exception.id_string(),
+            '1: [value_error/too_long, invalid_string]')
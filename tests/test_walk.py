@@ -0,0 +1,58 @@
+import vertigo as vg
+
+from travesty import Int, List, String, SchemaMapping, UniMapping, StrMapping
+from travesty import Optional, Tuple, Polymorph, graphize
+from travesty import walk, lazy_graphize, PRUNE
+
+from helpers import expecting
+
+def test_walk():
+    Point = Tuple.mkgraph((Int(), Int()))
+    Shape = Polymorph.mkgraph(dict(
+        num=(int, Int()),
+        point=(tuple, Point),
+    ))
+    schema = SchemaMapping().of(
+        shapes=List().of(Shape),
+        tags=StrMapping().of(Optional.wrap(String())),
+        counts=UniMapping().of(key=String(), val=Int()),
+    )
+    value = dict(shapes=[1, (2, 3)], tags=dict(a=None), counts={u'x': 4})
+    events = {path: (marker, v) for path, marker, v in walk(schema, value)}
+    assert sorted(events) == [(), ('counts',), ('counts', 'key_0'),
+        ('counts', 'value_0'), ('shapes',), ('shapes', '0'), ('shapes', '1'),
+        ('shapes', '1', '0'), ('shapes', '1', '1'), ('tags',), ('tags', 'a')]
+    # Polymorphs are transparent
+    assert isinstance(events[('shapes', '0')][0], Int)
+    assert isinstance(events[('shapes', '1')][0], Tuple)
+    assert events[('shapes', '1', '1')][1] == 3
+    # Wrappers are kept
+    assert isinstance(events[('tags', 'a')][0], Optional)
+    assert events[('counts', 'key_0')][1] == u'x'
+
+    w = walk(schema, value)
+    paths = []
+    for path, marker, v in w:
+        paths.append(path)
+        if path == ('shapes',):
+            assert w.send(PRUNE) is None
+    assert ('shapes',) in paths
+    assert not [p for p in paths if p[:1] == ('shapes',) and len(p) > 1]
+    assert len(paths) == 7
+
+def test_lazy_graphize():
+    schema = SchemaMapping().of(
+        xs=List().of(Int()),
+        names=StrMapping().of(String()),
+    )
+    value = dict(xs=list(range(10)), names=dict(a=u'x'))
+    zipval = vg.from_flat({'': 'root', 'xs/sub': 'x'})
+    g = lazy_graphize(schema, value, extras_graphs=dict(zipval=zipval))
+    assert g.value == (value, 'root')
+    assert g['xs', '3'].value == (3, 'x')
+    assert g['names', 'a'].value == (u'x', None)
+    assert g['xs', '3'] is g['xs', '3']
+    with expecting(KeyError):
+        g['xs', '10']
+    # Matches the eager graphize
+    assert graphize(schema, value).unordered_equals(lazy_graphize(schema, value))
@@ -2,7 +2,10 @@ from .base import Leaf, unwrap, core_marker, GraphDispatcher, Marker
 from .base import Wrapper, Traversable, to_typegraph, make_dispatcher
 from .base import graphize, validate, dictify, undictify, associate_typegraph
 from .base import clone, mutate, traverse, IGNORE, CHECK, CHECK_ALL
+from .base import stepwise, structural
 from .datetypes import DateTime, Date, Time, TimeDelta
+from .datetypes import epoch_dictify, epoch_undictify
+from .enum_marker import Enum
 from .invalid import Invalid, InvalidAggregator
 from .list import List
 from .mapping import SchemaMapping, StrMapping, UniMapping
@@ -13,9 +16,14 @@ from .polymorph import Polymorph
 from .schema_obj import SchemaObj
 from .tuple import Tuple, NamedTuple
 from .typed_leaf import TypedLeaf, Boolean, String, Bytes, Int, Number, Complex
+from .typed_leaf import binary_dictify, binary_undictify
 from .validated import Validated
 from .validators import Validator, InRange, OneOf, RegexMatch
 from .validators import AsciiString, Email, NonEmptyString, StringOfLength
+from .walk import walk, lazy_graphize, PRUNE
+from .packing import pack, unpack
+from .columnar import to_columns, from_columns
+from .compact import compact_dictify, compact_undictify
 
 from .document import Document, DocSet
 
@@ -35,6 +43,7 @@ __all__ = [
     'DocSet',
     'Document',
     'Email',
+    'Enum',
     'GraphDispatcher',
     'IGNORE',
     'InRange',
@@ -50,6 +59,7 @@ __all__ = [
     'StringOfLength',
     'ObjectMarker',
     'OneOf',
+    'PRUNE',
     'Optional',
     'Passthrough',
     'Polymorph',
@@ -68,17 +78,31 @@ __all__ = [
     'Validator',
     'Wrapper',
     'associate_typegraph',
+    'binary_dictify',
+    'binary_undictify',
     'core_marker',
     'clone',
+    'compact_dictify',
+    'compact_undictify',
     'dictify',
+    'from_columns',
     'document',
+    'epoch_dictify',
+    'epoch_undictify',
     'make_dispatcher',
     'mutate',
+    'pack',
+    'stepwise',
+    'structural',
     'to_typegraph',
+    'to_columns',
     'traverse',
     'graphize',
+    'lazy_graphize',
     'undictify',
+    'unpack',
     'unwrap',
     'validate',
     'validators',
+    'walk',
 ]
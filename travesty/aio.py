@@ -0,0 +1,334 @@
+'''aio.py: run dispatchers without blocking an asyncio event loop.
+
+Dictifying or validating a huge value takes a long time, and since the whole
+traversal normally runs in one go, an event loop that does it can't serve
+anything else in the meantime. run_async(dispatcher, typegraph, value, **kw)
+is a coroutine that does the same work a slice at a time, handing control back
+to the event loop after every `steps` nested calls (1000 by default):
+
+>>> import asyncio
+>>> import travesty as tv
+>>> schema = tv.List().of(tv.SchemaMapping().of(n=tv.Int(), s=tv.String()))
+>>> value = [dict(n=i, s=str(i)) for i in range(5000)]
+>>> ticks = []
+>>> async def ticker():
+...     while True:
+...         ticks.append(None)
+...         await asyncio.sleep(0)
+>>> async def main():
+...     task = asyncio.ensure_future(ticker())
+...     result = await run_async(tv.dictify, schema, value, steps=100)
+...     task.cancel()
+...     return result
+>>> loop = asyncio.new_event_loop()
+>>> loop.run_until_complete(main()) == tv.dictify(schema, value)
+True
+>>> len(ticks) > 10
+True
+
+dictify_async, undictify_async, validate_async and clone_async are shorthand
+for run_async with the corresponding dispatcher, and errors are raised just as
+they would be by the synchronous versions:
+
+>>> loop.run_until_complete(validate_async(schema, [dict(n='one', s='1')]))
+Traceback (most recent call last):
+    ...
+Invalid: 0: [n: [type_error]]
+
+Only stepwise handlers (see travesty.stepwise) can pause, so a handler that
+isn't stepwise runs to completion within a single slice. All of travesty's
+handlers for containers - Lists, mappings, schemas, objects and so on - are
+stepwise, so with the built-in markers each slice does a bounded amount of
+work. Don't modify the value from other tasks while it's being processed.
+
+Alternatively, pass executor= to run the whole call in a
+concurrent.futures executor via loop.run_in_executor, which keeps the loop
+free throughout. Dispatchers can be called from several threads at once, so
+any ThreadPoolExecutor will do; for process pools, see travesty.parallel.
+
+>>> from concurrent.futures import ThreadPoolExecutor
+>>> with ThreadPoolExecutor(1) as pool:
+...     coro = dictify_async(schema, value, executor=pool)
+...     loop.run_until_complete(coro) == tv.dictify(schema, value)
+True
+>>> loop.close()
+
+Validators that need to do I/O - checking a database for duplicates, looking
+something up in a cache, and so on - can subclass AsyncValidator and implement
+`async def validate_async(self, value, **kwargs)` instead of validate().
+validate_async (the module function) collects every such check in the value
+and runs them all concurrently, at most max_concurrency (default 100) at a
+time, before merging their errors into the usual Invalid tree:
+
+>>> taken = {u'root', u'admin'}
+>>> class IsUnusedName(AsyncValidator):
+...     async def validate_async(self, value, **kwargs):
+...         await asyncio.sleep(0.01) # Pretend to query a database
+...         if value in taken:
+...             raise Invalid("name_taken")
+>>> users = tv.List().of(tv.SchemaMapping().of(
+...     name=IsUnusedName().of(tv.String()),
+...     age=tv.InRange(0, 150),
+... ))
+>>> loop = asyncio.new_event_loop()
+>>> loop.run_until_complete(validate_async(users, [
+...     dict(name=u'dan', age=30),
+...     dict(name=u'root', age=-1),
+...     dict(name=u'admin', age=5),
+... ]))
+Traceback (most recent call last):
+    ...
+Invalid: 1: [age: [range_error/too_low], name: [name_taken]], 2: [name: [name_taken]]
+>>> loop.close()
+
+This works by validating the value twice: the first pass collects the async
+checks instead of running them, and once they've all finished, the second pass
+raises their errors where they were found. Error modes and Validated's rules
+about which validators run (e.g. not running extra validators on a value of
+the wrong type) are respected, as if the checks had been run in place.
+
+Called synchronously (e.g. from tv.validate), an AsyncValidator runs its check
+to completion on a private event loop. That can't be done from inside a running
+event loop, so there it raises a RuntimeError; use validate_async instead.
+
+Finally, iter_undictify(typegraph, reader) is an async generator that
+undictifies newline-delimited JSON from an asyncio.StreamReader one line at a
+time. Lines are only read as the consumer asks for values, so memory use
+doesn't grow with the length of the stream, and a slow consumer makes the
+reader (and in turn its transport) stop reading rather than buffering. Errors
+are reported under the (1-based) line number:
+
+>>> async def collect(typegraph, data, **kwargs):
+...     reader = asyncio.StreamReader()
+...     reader.feed_data(data)
+...     reader.feed_eof()
+...     return [obj async for obj in iter_undictify(typegraph, reader, **kwargs)]
+>>> loop = asyncio.new_event_loop()
+>>> data = (b'{"n": 1, "day": "2020-01-01"}\\n\\n{"n": 2, "day": "2020-01-02"}\\n'
+...         b'{"n": 3, "day": "someday"}\\n{"n":\\n')
+>>> event = tv.SchemaMapping().of(n=tv.Int(), day=tv.Date())
+>>> loop.run_until_complete(collect(event, data))
+Traceback (most recent call last):
+    ...
+Invalid: 4: [day: [bad_format]]
+
+Blank lines are skipped. Lines longer than the reader's limit (64 KiB by
+default) are discarded and reported as line_too_long errors. To skip invalid
+lines too, pass on_invalid, which is called with the line number and error
+instead of raising it:
+
+>>> def report(lineno, error):
+...     print('Line {}: {}'.format(lineno, error.id_string()))
+>>> for obj in loop.run_until_complete(collect(event, data, on_invalid=report)):
+...     print('{n} {day}'.format(**obj))
+Line 4: day: [bad_format]
+Line 5: json_error
+1 2020-01-01
+2 2020-01-02
+>>> loop.close()
+
+This module requires Python 3.6+, and isn't imported by `import travesty`.
+'''
+import asyncio
+import functools
+import json
+
+from .base import dictify, undictify, validate, clone
+from .cantrips.trampoline import Trampoline
+from .dispatch_graph import _invoke
+from .invalid import Invalid
+from .validators import Validator
+
+
+async def run_async(dispatcher, typegraph, value, steps=1000, executor=None,
+        **kwargs):
+    '''Call dispatcher(typegraph, value, **kwargs) cooperatively.
+
+    See the module docstring for details.
+    '''
+    if executor is not None:
+        loop = asyncio.get_event_loop()
+        call = functools.partial(dispatcher, typegraph, value, **kwargs)
+        return await loop.run_in_executor(executor, call)
+    # This is dispatcher(typegraph, value, **kwargs), minus the trampoline
+    kwargs = dispatcher.apply_defaults(kwargs)
+    graph = dispatcher._mk_graph(typegraph, kwargs.pop('extras_graphs', {}))
+    gen, result = _invoke(graph, (value,), kwargs)
+    if gen is None:
+        return result
+    trampoline = Trampoline(gen)
+    while not trampoline.resume(steps):
+        await asyncio.sleep(0)
+    return trampoline.result
+
+
+async def dictify_async(typegraph, value, **kwargs):
+    return await run_async(dictify, typegraph, value, **kwargs)
+
+async def undictify_async(typegraph, value, **kwargs):
+    return await run_async(undictify, typegraph, value, **kwargs)
+
+async def validate_async(typegraph, value, max_concurrency=100, **kwargs):
+    '''Validate value, running AsyncValidators concurrently.
+
+    See the module docstring for details; any other keyword arguments are
+    passed on to run_async.
+    '''
+    checks = _AsyncChecks()
+    try:
+        await run_async(validate, typegraph, value, _tv_async_checks=checks,
+            **kwargs)
+    except Invalid:
+        if not checks.pending:
+            raise
+    if not checks.pending:
+        return
+    await checks.run(max_concurrency)
+    await run_async(validate, typegraph, value, _tv_async_checks=checks,
+        **kwargs)
+
+async def clone_async(typegraph, value, **kwargs):
+    return await run_async(clone, typegraph, value, **kwargs)
+
+
+async def iter_undictify(typegraph, reader, on_invalid=None, **kwargs):
+    '''Undictify each line of newline-delimited JSON from reader.
+
+    See the module docstring for details; any other keyword arguments are
+    passed on to run_async.
+    '''
+    lineno = 0
+    while True:
+        line, too_long = await _readline(reader)
+        if not line and too_long is None:
+            return
+        lineno += 1
+        if too_long is None and not line.strip():
+            continue
+        try:
+            if too_long is not None:
+                raise too_long
+            try:
+                data = json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                raise Invalid("json_error", str(e))
+            obj = await run_async(undictify, typegraph, data, **kwargs)
+        except Invalid as e:
+            error = Invalid()
+            error.sub_errors[str(lineno)] = e
+            if on_invalid is None:
+                raise error
+            on_invalid(lineno, e)
+            continue
+        yield obj
+
+async def _readline(reader):
+    '''Read a line from reader, returning (line, error).
+
+    line is b'' at the end of the stream. A line longer than the reader's
+    limit is discarded, and returned as (b'', Invalid) instead.
+    '''
+    try:
+        return await reader.readuntil(b'\n'), None
+    except asyncio.IncompleteReadError as e:
+        # The last line has no newline
+        return e.partial, None
+    except asyncio.LimitOverrunError as e:
+        error = Invalid("line_too_long", str(e))
+        consumed = e.consumed
+    # Unlike readline(), readuntil() leaves the data in the buffer, so skip
+    # everything up to and including the next newline.
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError:
+            pass
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+            continue
+        return b'', error
+
+
+def _running_loop():
+    get_running_loop = getattr(asyncio, 'get_running_loop', None)
+    if get_running_loop is None: # pragma: no cover
+        # Python 3.6
+        return asyncio._get_running_loop()
+    try:
+        return get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncValidator(Validator):
+    '''A Validator whose check is a coroutine.
+
+    Subclasses implement `async def validate_async(self, value, **kwargs)`,
+    which should raise an Invalid if the value is invalid. See the module
+    docstring.
+    '''
+    async def validate_async(self, value, **kwargs): # pragma: no cover
+        raise NotImplementedError()
+
+    def validate(self, value, **kwargs):
+        if _running_loop() is not None:
+            raise RuntimeError("{} can't validate synchronously inside a "
+                "running event loop; use travesty.aio.validate_async".format(
+                    type(self).__name__))
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.validate_async(value, **kwargs))
+        finally:
+            loop.close()
+
+@validate.when(AsyncValidator)
+def validate_async_validator(dispgraph, value, _tv_async_checks=None, **kwargs):
+    if _tv_async_checks is None:
+        dispgraph.marker.validate(value, **kwargs)
+    else:
+        _tv_async_checks.visit(dispgraph.marker, value, kwargs)
+
+
+class _AsyncChecks(object):
+    '''The async checks found while validating a value.
+
+    Until run() is called, visit() just records each check. After that,
+    visit() raises the error, if any, from the check of the same validator on
+    the same value. The second traversal can visit fewer checks than the first
+    (e.g. because a failed check stopped later ones in the same Validated), or
+    visit some more than once (e.g. when a List retries its items one at a
+    time), but never new ones.
+    '''
+    def __init__(self):
+        self.pending = []
+        self.results = None
+
+    def visit(self, vdator, value, kwargs):
+        if self.results is None:
+            self.pending.append((vdator, value, kwargs))
+            return
+        # The values in self.pending are kept alive, so their ids are unique
+        key = (id(vdator), id(value))
+        if key not in self.results:
+            # Maybe an equal value was created afresh, e.g. by a property
+            for (v, val, _), error in zip(self.pending, self.errors):
+                if v is vdator and val == value:
+                    self.results[key] = error
+                    break
+            else:
+                raise RuntimeError("Value changed during async validation")
+        if self.results[key] is not None:
+            raise self.results[key]
+
+    async def run(self, max_concurrency):
+        limit = asyncio.Semaphore(max_concurrency)
+        async def check(vdator, value, kwargs):
+            async with limit:
+                try:
+                    await vdator.validate_async(value, **kwargs)
+                except Invalid as e:
+                    return e
+        self.errors = await asyncio.gather(*[check(*p) for p in self.pending])
+        self.results = dict(((id(vdator), id(value)), error)
+            for (vdator, value, _), error in zip(self.pending, self.errors))
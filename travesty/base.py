@@ -1,10 +1,12 @@
 from contextlib import contextmanager
+import weakref
 
 import vertigo as vg
 
 from .cantrips.dispatcher import Dispatcher
+from .cantrips.trampoline import Return
 from .cantrips.subclass import SubclassMixin
-from .dispatch_graph import DynamicDispatchGraph
+from .dispatch_graph import DynamicDispatchGraph, stepwise, structural
 from .invalid import InvalidAggregator
 
 class Marker(SubclassMixin):
@@ -98,9 +100,77 @@ class GraphDispatcher(Dispatcher):
     Note that make_dispatcher(*parents), defined below, behaves just like
     GraphDispatcher(*parents) except with some common behaviors added to parents
     by default - consider using it when you create your own dispatchers.
+
+    Passing share_unchanged=True to clone, dictify, or their sub-dispatchers
+    lets them return parts of a value as they are, instead of copying them,
+    when the typegraph shows that the copy would be equal to the original -
+    e.g. Lists and StrMappings of Ints and Strings:
+
+    >>> import datetime
+    >>> from travesty import Date, Int, List, SchemaMapping, StrMapping, String
+    >>> Page = SchemaMapping().of(
+    ...     title=String(),
+    ...     counts=StrMapping().of(List().of(Int())),
+    ...     day=Date(),
+    ... )
+    >>> counts = {u'a': [1, 2], u'b': [3]}
+    >>> page = dict(title=u'Home', counts=counts, day=datetime.date(2020, 1, 1))
+    >>> result = dictify(Page, page, share_unchanged=True)
+    >>> result['counts'] is counts
+    True
+    >>> result == dict(title=u'Home', counts=counts, day=u'2020-01-01')
+    True
+
+    The result shares those parts with the value, so don't modify one while
+    the other is still in use. Only calls with error_mode=IGNORE share, and
+    parts whose shape would change - a tuple for a List, a dict missing some of
+    a SchemaMapping's fields, and so on - are still copied:
+
+    >>> result = dictify(Page, dict(page, counts={u'a': (1, 2)}),
+    ...                  share_unchanged=True)
+    >>> result['counts']
+    {'a': [1, 2]}
+
+    Similarly, passing memoize=True to clone, dictify, or their
+    sub-dispatchers makes them reuse their result for any object that appears
+    more than once in a value, instead of processing it again:
+
+    >>> from travesty import SchemaObj
+    >>> class Author(SchemaObj):
+    ...     field_types = dict(name=String())
+    >>> Post = SchemaMapping().of(title=String(), author=Author)
+    >>> dan = Author(name=u'Dan')
+    >>> posts = [dict(title=u'One', author=dan), dict(title=u'Two', author=dan)]
+    >>> result = dictify(List().of(Post), posts, memoize=True)
+    >>> result[0]['author'] == dict(name=u'Dan')
+    True
+    >>> result[0]['author'] is result[1]['author']
+    True
+
+    Again, the result shares those parts, so don't modify them. Objects are
+    matched by identity and by their place in the typegraph, and only results
+    of @stepwise functions (i.e. of containers, not leaves) are remembered.
+    Functions whose results depend on more than that, such as those for
+    Documents (which are dictified in full only the first time they're seen),
+    have .memoizable = False, and values containing them aren't memoized.
     '''
+    # The handler for the parts of a value that are skipped; see prune().
+    pruned_handler = None
+    # Whether memoize=True is supported; sub-dispatchers inherit this.
+    memoizes = False
+
     def __init__(self, parents=None):
         super(GraphDispatcher, self).__init__(parents=parents)
+        for disp in self.dispatch_mro:
+            if getattr(disp, 'pruned_handler', None) is not None:
+                self.pruned_handler = disp.pruned_handler
+                break
+        self.memoizes = any(getattr(disp, 'memoizes', False)
+                            for disp in self.dispatch_mro)
+        self._affected = weakref.WeakKeyDictionary()
+        self._sharing = weakref.WeakKeyDictionary()
+        self._pruning = weakref.WeakKeyDictionary()
+        self._unmemoizable = weakref.WeakKeyDictionary()
 
     def sub(self, parents=()):
         '''Create a new dispatcher with the same keyfn and self as a parent.'''
@@ -114,6 +184,325 @@ class GraphDispatcher(Dispatcher):
     def _mk_graph(self, graph, extras_graphs=None):
         return DynamicDispatchGraph(to_typegraph(graph), self, extras_graphs)
 
+    def prune(self, handler):
+        '''Skip the parts of values that only @structural functions handle.
+
+        Once this is called, this dispatcher and any sub-dispatchers created
+        afterwards call handler instead of walking any part of a value whose
+        typegraph only has @structural functions (see
+        travesty.dispatch_graph.structural), i.e. any part of the value that
+        none of their other handlers would touch. traverse and mutate prune, so
+        a sub-dispatcher that only handles one marker type doesn't walk (or,
+        for mutate, reassemble) everything else:
+
+        >>> import datetime
+        >>> from travesty import Date, Int, List, SchemaMapping, String
+        >>> one_day_more = mutate.sub()
+        >>> @one_day_more.when(Date)
+        ... def tomorrow(dispgraph, value, **kw):
+        ...     return value + datetime.timedelta(days=1)
+        >>> Event = SchemaMapping().of(day=Date(), tags=List().of(String()))
+        >>> tags = [u'a', u'b']
+        >>> event = one_day_more(Event, dict(day=datetime.date(2020, 1, 1),
+        ...                                  tags=tags))
+        >>> event['day']
+        datetime.date(2020, 1, 2)
+        >>> event['tags'] is tags
+        True
+
+        The tags weren't even looked at, so they'd have been passed through
+        even if they weren't a list:
+
+        >>> one_day_more(Event, dict(day=datetime.date(2020, 1, 1),
+        ...                          tags=u'not a list'))['tags']
+        'not a list'
+
+        Functions that walk their value but can also change it, like mutate's
+        for schemas (which fill in missing fields), give a check function as
+        their .structural instead of True; see structural. The parts of a value
+        they'd change aren't skipped:
+
+        >>> Count = SchemaMapping().of(n=Int(), tags=List().of(String()))
+        >>> counts = one_day_more(List().of(Count), [dict(n=1)])
+        >>> counts == [dict(n=1, tags=None)]
+        True
+
+        Only calls with error_mode=IGNORE are pruned, since checking the value
+        means looking at all of it. Which parts of a typegraph can be skipped is
+        worked out the first time it's used, and cached until a handler is
+        registered with any dispatcher; don't add edges to a typegraph after
+        using it.
+        '''
+        self.pruned_handler = handler
+
+    def _skip(self, typegraph, value, kwargs):
+        # The function to call instead of walking value, if any
+        if kwargs.get('error_mode', IGNORE) != IGNORE:
+            return None
+        if self._affects(typegraph):
+            return None
+        if not self._passes(self._pruning, _pruning_nodes, typegraph, value,
+                            kwargs, '_tv_pruned'):
+            return None
+        return self.pruned_handler
+
+    def _affects(self, typegraph):
+        '''Whether any non-structural function handles part of typegraph.'''
+        return self._analysis(self._affected, typegraph, _affected_nodes, True)
+
+    def _shares(self, typegraph, value, kwargs):
+        '''Whether our result for value would be equal to value itself.
+
+        Functions that can return their values unchanged say so with an
+        .unchanged attribute. It's True if the function does so whenever the
+        functions for its children (or for a Wrapper, its inner marker) do.
+        Otherwise it's a function check(node, marker, value, keys), where node
+        is the typegraph node, that returns None if the function's result
+        wouldn't be equal to value, and otherwise the (key, child) pairs that
+        need to be unchanged too, where key is the child's edge in the
+        typegraph, or None for a Wrapper's inner marker. Children whose keys
+        aren't in keys are always unchanged, so check can leave them out.
+        '''
+        if kwargs.get('error_mode', IGNORE) != IGNORE:
+            return False
+        return self._passes(self._sharing, _sharing_nodes, typegraph, value,
+                            kwargs, '_tv_shared')
+
+    def _passes(self, cache, analyze, typegraph, value, kwargs, memo_key):
+        '''Whether value passes the checks that analyze finds (see _shares).
+
+        Each container's function asks about its own part of the value, so the
+        result for every part is kept in kwargs[memo_key] for the rest of the
+        call, and each part is only checked once.
+        '''
+        info = self._analysis(cache, typegraph, analyze, None)
+        if info is None or not info:
+            return info is not None
+        memo = kwargs.setdefault(memo_key, {})
+        frames = []
+        pending = (typegraph, value)
+        while True:
+            if pending is not None:
+                node, value = pending
+                pending = None
+                key = (id(value), node)
+                cached = memo.get(key)
+                if cached is not None:
+                    result = cached[1]
+                else:
+                    children = self._children(cache, analyze, node, value)
+                    result = children is not None
+                    if children:
+                        frames.append((key, value, iter(children)))
+            # A part passes once all its children do, so each result is
+            # carried up to the part waiting on it.
+            while frames:
+                key, value, children = frames[-1]
+                if result:
+                    pending = next(children, None)
+                    if pending is not None:
+                        break
+                frames.pop()
+                # value is kept too, so that its id isn't reused
+                memo[key] = (value, result)
+            else:
+                return result
+
+    def _children(self, cache, analyze, node, value):
+        '''The (node, value) pairs for the parts of value that need checking
+        too, or None if value fails node's own checks.'''
+        info = self._analysis(cache, node, analyze, None)
+        if info is None:
+            return None
+        if not info:
+            return ()
+        checks, keys = info
+        marker = node.value
+        children = []
+        for check in checks:
+            if check is not True:
+                pairs = check(node, marker, value, keys)
+                if pairs is None:
+                    return None
+            elif isinstance(marker, Wrapper):
+                pairs = [(None, value)]
+            else:
+                pairs = ()
+            inner = False
+            for key, child in pairs:
+                if key is None:
+                    inner = True
+                else:
+                    children.append((node[key], child))
+            if not inner:
+                break
+            marker = marker.marker
+        return children
+
+    def _memoized(self, graph, fn, args, kwargs):
+        # _invoke for a stepwise fn when memoize=True
+        memo = kwargs.setdefault('_tv_memo', {})
+        if not isinstance(graph, DynamicDispatchGraph) or graph.extras_graphs:
+            return fn(graph, *args, **kwargs), None
+        node, value = graph.graph, args[0]
+        key = (id(value), node, self)
+        if key in memo:
+            return None, memo[key][1]
+        if self._analysis(self._unmemoizable, node, _unmemoizable_nodes, True):
+            return fn(graph, *args, **kwargs), None
+        return _remember(fn(graph, *args, **kwargs), memo, key, value), None
+
+    def _analysis(self, cache, typegraph, analyze, default):
+        '''Look typegraph up in cache, filling the cache in if need be.
+
+        analyze(self, typegraph) returns a (node, result) pair for each node
+        reachable from typegraph, starting with typegraph itself, or None if
+        there are too many nodes, in which case this returns default.
+        '''
+        changes = Dispatcher.changes
+        try:
+            cached = cache.get(typegraph)
+        except TypeError:
+            # Can't weakref it, so can't cache it
+            cached = None
+        if cached is not None and cached[0] == changes:
+            return cached[1]
+        results = analyze(self, typegraph)
+        if results is None:
+            return default
+        with self._lock:
+            for node, result in results:
+                try:
+                    cache[node] = (changes, result)
+                except TypeError:
+                    pass
+        return results[0][1]
+
+
+# Typegraphs with more nodes than this are never pruned or shared
+_MAX_ANALYZED_NODES = 10000
+
+def _typegraph_nodes(typegraph):
+    '''List the nodes reachable from typegraph, and the edges between them.
+
+    Returns (nodes, edges), where nodes[0] is typegraph and edges[i] has a
+    (key, j) pair for each edge from nodes[i] to nodes[j], or None if there
+    are more than _MAX_ANALYZED_NODES nodes.
+    '''
+    nodes, edges = [typegraph], []
+    index = {id(typegraph): 0}
+    while len(edges) < len(nodes):
+        out = []
+        for key, child in nodes[len(edges)].edge_iter():
+            if id(child) not in index:
+                if len(nodes) == _MAX_ANALYZED_NODES:
+                    return None
+                index[id(child)] = len(nodes)
+                nodes.append(child)
+            out.append((key, index[id(child)]))
+        edges.append(out)
+    return nodes, edges
+
+def _upstream(edges, marked):
+    # Mark the marked nodes, and every node that one of them is reachable from
+    parents = [[] for _ in edges]
+    for i, out in enumerate(edges):
+        for _, j in out:
+            parents[j].append(i)
+    result = [False] * len(edges)
+    todo = [i for i, flag in enumerate(marked) if flag]
+    while todo:
+        i = todo.pop()
+        if not result[i]:
+            result[i] = True
+            todo.extend(parents[i])
+    return result
+
+def _any_layer(disp, marker, test):
+    # Whether test is true of disp's function for any layer of marker
+    while True:
+        if test(disp.dispatch(marker)):
+            return True
+        if not isinstance(marker, Wrapper):
+            return False
+        marker = marker.marker
+
+def _marked_nodes(disp, typegraph, test):
+    '''List (node, marked) for each node reachable from typegraph.
+
+    A node is marked if test is true of disp's function for any node reachable
+    from it.
+    '''
+    graph = _typegraph_nodes(typegraph)
+    if graph is None:
+        return None
+    nodes, edges = graph
+    marked = [_any_layer(disp, node.value, test) for node in nodes]
+    return list(zip(nodes, _upstream(edges, marked)))
+
+def _affected_nodes(disp, typegraph):
+    return _marked_nodes(disp, typegraph,
+        lambda fn: not getattr(fn, 'structural', False))
+
+def _unmemoizable_nodes(disp, typegraph):
+    return _marked_nodes(disp, typegraph,
+        lambda fn: not getattr(fn, 'memoizable', True))
+
+def _remember(gen, memo, key, value):
+    # Run the stepwise gen and store its result in memo. value is stored too,
+    # to keep its id from being reused.
+    result = yield gen
+    memo[key] = (value, result)
+    raise Return(result)
+
+def _layer_checks(disp, marker, attr):
+    # The attr of disp's function for each layer of marker, or None
+    checks = []
+    while True:
+        check = getattr(disp.dispatch(marker), attr, None)
+        if not check:
+            return None
+        checks.append(check)
+        if not isinstance(marker, Wrapper):
+            return tuple(checks)
+        marker = marker.marker
+
+def _checked_nodes(disp, typegraph, attr):
+    '''List (node, info) for each node reachable from typegraph.
+
+    info is None if values of the node never pass the checks given by the attr
+    of disp's functions (see GraphDispatcher._shares), () if they always do,
+    and otherwise (checks, keys), where checks has the attr of disp's function
+    for each layer of the node's marker and keys are the edges to children
+    whose info isn't ().
+    '''
+    graph = _typegraph_nodes(typegraph)
+    if graph is None:
+        return None
+    nodes, edges = graph
+    checks = [_layer_checks(disp, node.value, attr) for node in nodes]
+    never = _upstream(edges, [c is None for c in checks])
+    checked = _upstream(edges,
+        [c is None or any(x is not True for x in c) for c in checks])
+    infos = []
+    for i, node in enumerate(nodes):
+        if never[i]:
+            infos.append(None)
+        elif not checked[i]:
+            infos.append(())
+        else:
+            keys = frozenset(key for key, j in edges[i] if checked[j])
+            infos.append((checks[i], keys))
+    return list(zip(nodes, infos))
+
+def _sharing_nodes(disp, typegraph):
+    # Whether disp's results would equal the value; see GraphDispatcher._shares
+    return _checked_nodes(disp, typegraph, 'unchanged')
+
+def _pruning_nodes(disp, typegraph):
+    # Whether disp's structural functions would leave the value as it is
+    return _checked_nodes(disp, typegraph, 'structural')
+
 class Wrapper(Marker):
     '''A root for all markers that wrap other markers directly.
 
@@ -194,6 +583,8 @@ def core_marker(marker):
 base_dispatcher = GraphDispatcher()
 
 @base_dispatcher.when(Wrapper)
+@structural
+@stepwise
 def pass_through_wrapper(dispgraph, *args, **kwargs):
     '''By default, all travesty dispatchers simple pass through Wrappers.
 
@@ -204,7 +595,9 @@ def pass_through_wrapper(dispgraph, *args, **kwargs):
     graphize, dictify, etc. will ignore these and continue on to the base type,
     but you'd customize validate to run the extra validation functions.
     '''
-    return dispgraph.inner(*args, **kwargs)
+    inner = dispgraph.for_marker(dispgraph.marker.marker)
+    raise Return((yield inner.defer(*args, **kwargs)))
+pass_through_wrapper.unchanged = True
 
 
 def make_dispatcher(parents=()):
@@ -244,8 +637,10 @@ def aggregating_errors(error_mode):
 # traverse simply walks a value.
 traverse = make_dispatcher()
 @traverse.when(Marker)
+@structural
 def traverse_object(dispgraph, value, **kwargs):
     pass
+traverse.prune(traverse_object)
 
 # validate traverses and complains if an object is invalid
 validate = traverse.sub()
@@ -254,6 +649,7 @@ validate.default_value('error_mode', CHECK_ALL)
 
 # clone copies an object
 clone = make_dispatcher()
+clone.memoizes = True
 
 # mutate updates an object in-place, as best as possible
 mutate = clone.sub()
@@ -268,5 +664,8 @@ undictify.default_value('error_mode', CHECK_ALL)
 
 # Leaves are passed through clone et al. by default
 @clone.when(Leaf)
+@structural
 def passthrough_tl(dispgraph, value, **kwargs):
     return value
+passthrough_tl.unchanged = True
+mutate.prune(passthrough_tl)
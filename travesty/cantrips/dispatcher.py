@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 from collections import Counter, namedtuple
 from functools import wraps
+import threading
 
 
 def _merge_one(lists, tails):
@@ -57,6 +58,10 @@ def slice_at(list, value):
     '''
     return list[list.index(value)+1:]
 
+class FrozenDispatcherError(RuntimeError):
+    '''Raised on attempts to modify a frozen Dispatcher.'''
+
+
 # SuperMarker is like super() for dispatch targets.
 # If dispatcher(val) dispatches with the keys [k1, k2, k3], then
 # dispatcher(SuperMarker(k1, val)) will dispatch with the keys [k2, k3].
@@ -300,12 +305,51 @@ class Dispatcher(_BaseDispatcher):
         abc
         foo
         The number 107
+
+
+    Dispatchers are safe to call from several threads at once. Modifying a
+    dispatcher (via register, set_default, default_value, etc.) is also
+    thread-safe, in that concurrent modifications are serialized by a lock, but
+    a call made while another thread modifies the dispatcher may see the state
+    from before or after the change.
+
+    Once all handlers are registered (typically at the end of startup), you can
+    call .freeze() to make a dispatcher immutable:
+
+    >>> handle2.freeze() is handle2
+    True
+    >>> @handle2.when(float)
+    ... def handle_float(handle, f, indent=''):
+    ...     pass
+    Traceback (most recent call last):
+        ...
+    FrozenDispatcherError: Dispatcher is frozen
+
+    Only the dispatcher itself is frozen. Its ancestors (here, handle) are
+    often shared, and modules imported later may still register handlers on
+    them; a frozen dispatcher sees those changes. Sub-dispatchers of a frozen
+    dispatcher start out unfrozen.
+
+    A frozen dispatcher with the default keyfn memoizes dispatch results by
+    type, skipping the search through the MRO on later calls, and precomputes
+    its default arguments. Both are thrown away whenever any dispatcher is
+    modified. Between modifications the memo is only ever added to, with
+    entries that any thread would compute identically, so reads and writes
+    need no lock.
     '''
+    # Incremented whenever any dispatcher's handlers change, so that anything
+    # computed from the results of dispatch can tell when it's out of date.
+    changes = 0
+
     def __init__(self, mapping=None, default=None, keyfn=None, parents=()):
         self.mapping = mapping.copy() if mapping else {}
         self._default = default
         self._default_values = {}
         self._default_factories = {}
+        self._lock = threading.RLock()
+        self._frozen = False
+        # (Dispatcher.changes, memo, defaults) while frozen; see _refreeze
+        self._state = None
         self.keyfn = keyfn
         if parents:
             parents = [_resolve_dispatcher(p) for p in parents]
@@ -321,10 +365,17 @@ class Dispatcher(_BaseDispatcher):
             return self.keyfn(val)
         return type(val).__mro__
 
+    def _check_mutable(self):
+        if self._frozen:
+            raise FrozenDispatcherError("Dispatcher is frozen")
+
     def register(self, keys, fn):
         '''Register fn as the target for each key in keys'''
-        for key in keys:
-            self.mapping[key] = fn
+        with self._lock:
+            self._check_mutable()
+            for key in keys:
+                self.mapping[key] = fn
+            Dispatcher.changes += 1
         return fn
 
     def when(self, *keys):
@@ -339,7 +390,10 @@ class Dispatcher(_BaseDispatcher):
         If None, then invoking a dispatcher on an unrecognized key will raise a
         NotImplementedError.
         '''
-        self._default = fn
+        with self._lock:
+            self._check_mutable()
+            self._default = fn
+            Dispatcher.changes += 1
 
     def default(self):
         '''Decorator version of set_default'''
@@ -357,13 +411,25 @@ class Dispatcher(_BaseDispatcher):
         '''Create a new dispatcher with the same keyfn and self as a parent.'''
         return Dispatcher(parents=[self], keyfn=self.keyfn)
 
-    def apply_defaults(self, kwargs):
+    def _iter_defaults(self):
+        # (key, value, is_factory) for each default, in order of precedence
         for dispatcher in self.dispatch_mro:
-            for key, val in dispatcher._default_values.items():
-                kwargs.setdefault(key, val)
-            for key, val in dispatcher._default_factories.items():
-                if key not in kwargs:
-                    kwargs[key] = val()
+            for key, val in list(dispatcher._default_values.items()):
+                yield key, val, False
+            for key, val in list(dispatcher._default_factories.items()):
+                yield key, val, True
+
+    def apply_defaults(self, kwargs):
+        if self._frozen:
+            state = self._state
+            if state is None or state[0] != Dispatcher.changes:
+                state = self._refreeze()
+            defaults = state[2]
+        else:
+            defaults = self._iter_defaults()
+        for key, val, is_factory in defaults:
+            if key not in kwargs:
+                kwargs[key] = val() if is_factory else val
         return kwargs
 
     def call(self, *args, **kwargs):
@@ -371,12 +437,55 @@ class Dispatcher(_BaseDispatcher):
         return self.raw_call(*args, **kwargs)
 
     def default_value(self, key, value):
-        self._default_values[key] = value
-        self._default_factories.pop(key, None)
+        with self._lock:
+            self._check_mutable()
+            self._default_values[key] = value
+            self._default_factories.pop(key, None)
+            Dispatcher.changes += 1
 
     def default_factory(self, key, value_fn):
-        self._default_factories[key] = value_fn
-        self._default_values.pop(key, None)
+        with self._lock:
+            self._check_mutable()
+            self._default_factories[key] = value_fn
+            self._default_values.pop(key, None)
+            Dispatcher.changes += 1
+
+    def freeze(self):
+        '''Make this dispatcher (but not its ancestors) immutable.
+
+        See the class docstring. Returns the dispatcher itself.
+        '''
+        with self._lock:
+            self._frozen = True
+        return self
+
+    def _refreeze(self):
+        # Read the counter first, so a change made while this runs makes the
+        # new state stale rather than being missed.
+        changes = Dispatcher.changes
+        state = self._state = (changes, {}, tuple(self._iter_defaults()))
+        return state
+
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def dispatch(self, val):
+        if not self._frozen or self.keyfn is not None:
+            return super(Dispatcher, self).dispatch(val)
+        state = self._state
+        if state is None or state[0] != Dispatcher.changes:
+            state = self._refreeze()
+        memo = state[1]
+        cls = type(val)
+        try:
+            return memo[cls]
+        except KeyError:
+            pass
+        fn = super(Dispatcher, self).dispatch(val)
+        if cls is not SuperMarker:
+            memo[cls] = fn
+        return fn
 
 
 class DispatchSuper(_BaseDispatcher):
@@ -543,6 +652,7 @@ def wraps_dispatcher(disp):
         newfn.when = disp.when
         newfn.set_default = disp.set_default
         newfn.default = disp.default
+        newfn.freeze = disp.freeze
         newfn.call = newfn
         def sub(*a, **kw):
             subdisp = disp.sub(*a, **kw)
@@ -168,7 +168,13 @@ class NestedException(Exception):
 
     def add(self, keys, exc):
         '''Add an exception at any depth.'''
-        if keys:
+        if len(keys) == 1 and keys[0] not in self.sub_errors and (
+                type(exc) is type(self)):
+            # Adopt exc instead of copying it, so that building deeply nested
+            # errors one level at a time doesn't copy (and recurse through)
+            # the whole subtree at every level.
+            self.sub_errors[keys[0]] = exc
+        elif keys:
             self.sub_errors.setdefault(keys[0], type(self)()).add(keys[1:], exc)
         else:
             self.add_own(exc)
@@ -1,6 +1,9 @@
-import collections
+try:
+    from collections.abc import Mapping
+except ImportError: # pragma: no cover
+    from collections import Mapping
 
-class ImmutableDict(collections.Mapping):
+class ImmutableDict(Mapping):
     '''An immutable dictionary.
 
     For the most part, it behaves like a normal dictionary, except that you
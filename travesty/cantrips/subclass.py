@@ -1,5 +1,6 @@
 '''subclass.py: mixin for programmatically subclassable classes.'''
 from abc import ABCMeta
+import sys
 
 class SubclassMixin(object):
     '''SubclassMixin adds a subclass(**kwargs) method to a class.
@@ -57,11 +58,17 @@ class SubclassMixin(object):
 
         The generated subclass will be called <name of this class>_sub unless
         the special parameter __class_name is passed in.
+
+        As with namedtuple, the subclass's __module__ is the module this is
+        called from (unless __module__ is passed in), so that module-level
+        subclasses can be pickled.
         '''
         if '__class_name' in kwargs:
             class_name = kwargs.pop('__class_name')
         else:
             class_name = cls.__name__ + "_sub"
+        if '__module__' not in kwargs:
+            kwargs['__module__'] = sys._getframe(1).f_globals.get('__name__', '__main__')
         subcls = type(cls)(class_name, (cls,), kwargs)
         return subcls
 
@@ -116,7 +123,11 @@ class SubclassableMeta(ABCMeta):
     AttributeError: type object 'AutoBar' has no attribute 'bar'
     '''
     def __new__(cls, name, supers, kwargs):
-        t = ABCMeta.__new__(cls, name, supers, {})
+        # Python 3 needs __classcell__ to set up super() and __class__
+        namespace = {}
+        if '__classcell__' in kwargs:
+            namespace['__classcell__'] = kwargs.pop('__classcell__')
+        t = ABCMeta.__new__(cls, name, supers, namespace)
         # Force __subclass__ to be a classmethod
         # if not isinstance(t.__subclass__, classmethod):
         #     t.__subclass__ = classmethod(_im_func(t.__subclass__))
@@ -0,0 +1,134 @@
+'''trampoline.py: run deeply nested generator "calls" in constant stack depth.
+
+A trampolined function is written as a generator. Instead of calling another
+trampolined function directly, it yields the generator for that call, and the
+trampoline sends the result back in:
+
+>>> def depth(n):
+...     if n == 0:
+...         raise Return(0)
+...     result = yield depth(n-1)
+...     raise Return(result + 1)
+>>> run(depth(100000))
+100000
+
+Exceptions raised by a callee are thrown back into the caller at the point
+where it yielded, so they can be caught with try/except or handled by context
+managers just as if the call had been made directly:
+
+>>> def fail():
+...     raise ValueError("Oh no!")
+...     yield
+>>> def catch():
+...     try:
+...         yield fail()
+...     except ValueError as e:
+...         raise Return("Caught: {}".format(e))
+>>> run(catch())
+'Caught: Oh no!'
+
+Besides generators, a trampolined function can yield any object with a
+.start() method. start() should return a pair (gen, value): if gen is not None
+it is run as a nested call, and otherwise value is sent straight back. This is
+how DispatchGraph.defer() is implemented.
+
+A trampolined generator returns a value by raising Return(value), which works
+in both Python 2 and 3; in Python 3 a plain "return value" also works.
+'''
+
+class Return(BaseException):
+    '''Raised by a trampolined generator to return a value.
+
+    Like GeneratorExit, this is not an Exception subclass, so
+    that "except Exception" blocks don't accidentally swallow it. It must not
+    be raised from inside context managers that need to see normal exits (e.g.
+    travesty's aggregating_errors).
+    '''
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+
+def run(gen):
+    '''Run the trampolined generator gen and return its result.'''
+    trampoline = Trampoline(gen)
+    trampoline.resume()
+    return trampoline.result
+
+
+class Trampoline(object):
+    '''A trampolined call that can be run a few steps at a time.
+
+    resume(steps) runs until the call finishes, returning True, or until
+    `steps` more nested calls have been started, returning False; the result
+    is then available as .result. This lets a long-running call share a thread
+    with other work (see travesty.aio):
+
+    >>> def depth(n):
+    ...     result = 0 if n == 0 else (yield depth(n-1)) + 1
+    ...     raise Return(result)
+    >>> t = Trampoline(depth(1000))
+    >>> slices = 1
+    >>> while not t.resume(100):
+    ...     slices += 1
+    >>> slices, t.result
+    (11, 1000)
+
+    With no argument, resume() runs the call to completion.
+    '''
+    def __init__(self, gen):
+        self._state = (gen, [], None, None)
+        self.result = None
+
+    def resume(self, steps=None):
+        if self._state is None:
+            return True
+        gen, stack, send, exc = self._state
+        while True:
+            try:
+                if exc is None:
+                    item = gen.send(send)
+                else:
+                    item, exc = gen.throw(exc), None
+            except StopIteration as e:
+                result = getattr(e, 'value', None)
+            except Return as e:
+                result = e.value
+            except Exception as e:
+                if not stack:
+                    self._state = None
+                    raise
+                gen = stack.pop()
+                exc = e
+                continue
+            else:
+                send = None
+                if hasattr(item, 'start'):
+                    try:
+                        sub, send = item.start()
+                    except Exception as e:
+                        exc = e
+                        continue
+                    if sub is None:
+                        continue
+                elif hasattr(item, 'send'):
+                    sub = item
+                else:
+                    msg = "Trampolined generators must yield calls, not {!r}"
+                    exc = TypeError(msg.format(item))
+                    continue
+                stack.append(gen)
+                gen = sub
+                if steps is not None:
+                    steps -= 1
+                    if steps <= 0:
+                        self._state = (gen, stack, None, None)
+                        return False
+                continue
+            # gen has finished; resume its caller
+            if not stack:
+                self._state = None
+                self.result = result
+                return True
+            gen = stack.pop()
+            send = result
@@ -0,0 +1,310 @@
+'''columnar.py: struct-of-arrays encoding for lists of records.
+
+to_columns(typegraph, values) takes a List of schemas (SchemaMappings,
+SchemaObjs, or other ObjectMarkers) and encodes it one column per field
+instead of one dict per record. Nested schemas are flattened, so each leaf
+field gets its own column, keyed by its '/'-separated path:
+
+>>> import travesty as tv
+>>> class Point(tv.SchemaObj):
+...     field_types = dict(x=tv.Int(), y=tv.Number())
+>>> class Reading(tv.SchemaObj):
+...     field_types = dict(
+...         sensor=tv.String(),
+...         at=Point,
+...         value=tv.Optional.wrap(tv.Number()),
+...         tags=tv.List().of(tv.String()),
+...     )
+>>> Readings = tv.List().of(Reading)
+>>> rows = [
+...     Reading(sensor=u'a', at=Point(x=1, y=0.5), value=2.5, tags=[u'hot']),
+...     Reading(sensor=u'b', at=Point(x=2, y=1.5), value=None, tags=[]),
+...     Reading(sensor=u'a', at=Point(x=3, y=2.5), value=0.25, tags=[]),
+...     Reading(sensor=u'a', at=Point(x=4, y=3.5), value=1.0, tags=[]),
+... ]
+>>> table = to_columns(Readings, rows)
+>>> table['length']
+4
+>>> sorted(table['columns'])
+['at/x', 'at/y', 'sensor', 'tags', 'value']
+
+Integers, floats, booleans, DateTimes, Dates and TimeDeltas go in array.array
+columns (the date types as integers, as with epoch_dictify):
+
+>>> table['columns']['at/x']
+Column(kind='array', data=array('q', [1, 2, 3, 4]), nulls=None, values=None)
+
+Strings with few distinct values are dictionary-encoded, as are Enums (whose
+dictionaries are just their options):
+
+>>> col = table['columns']['sensor']
+>>> col.kind, col.data, col.values
+('dict', array('B', [0, 1, 0, 0]), ['a', 'b'])
+
+Optional fields have a bitmap of which rows are None (bit i of the bitmap is
+set if row i is None), and only the other rows are stored in the data:
+
+>>> col = table['columns']['value']
+>>> col.data, col.nulls
+(array('d', [2.5, 0.25, 1.0]), bytearray(b'\\x02'))
+
+Anything else - lists, mappings, Optional schemas, and so on - is stored as a
+plain list of dictified values:
+
+>>> table['columns']['tags']
+Column(kind='list', data=[['hot'], [], [], []], nulls=None, values=None)
+
+from_columns reverses the process, decoding each column in one go before
+assembling the records:
+
+>>> decoded = from_columns(Readings, table)
+>>> decoded[2].sensor, decoded[2].at.x, decoded[1].value
+('a', 3, None)
+>>> tv.dictify(Readings, decoded) == tv.dictify(Readings, rows)
+True
+'''
+from array import array
+from collections import namedtuple
+import datetime
+import numbers
+
+from .base import Marker, make_dispatcher, unwrap, dictify, undictify
+from .base import to_typegraph
+from .datetypes import DateTime, Date, TimeDelta, _EPOCH, _micros
+from .enum_marker import Enum
+from .invalid import Invalid
+from .list import List
+from .object_marker import ObjectMarker
+from .optional import Optional
+from .schema import Schema
+from .typed_leaf import Boolean, Int, Number, String
+
+
+class Column(namedtuple('Column', ['kind', 'data', 'nulls', 'values'])):
+    '''One column of a table.
+
+    kind is 'array' (data is an array.array), 'dict' (data is an array of
+    indices into the list values) or 'list' (data is a list of dictified
+    values, or of the same numbers an 'array' column would hold when they
+    don't fit in one). If nulls is not None, it's a bitmap of the rows that are None,
+    and data only holds the other rows.
+    '''
+    __slots__ = ()
+    def __new__(cls, kind, data, nulls=None, values=None):
+        return super(Column, cls).__new__(cls, kind, data, nulls, values)
+
+
+def _join(*keys):
+    return '/'.join(key for key in keys if key)
+
+def _code_type(n):
+    for code in 'BHI':
+        if n <= 2 ** (8 * array(code).itemsize):
+            return code
+    return 'Q'
+
+
+#  ============
+#  = Encoding =
+#  ============
+
+# encode_columns(typegraph, values) returns a dict of path:Column for a list
+# of values of the typegraph's type.
+encode_columns = make_dispatcher()
+
+@encode_columns.when(Marker)
+def encode_generic(dispgraph, values, **kw):
+    graph = dispgraph.marker_graph()
+    return {'': Column('list', [dictify(graph, v, **kw) for v in values])}
+
+def _encode_array(code, values):
+    try:
+        return {'': Column('array', array(code, values))}
+    except (TypeError, OverflowError):
+        return {'': Column('list', list(values))}
+
+@encode_columns.when(Int)
+def encode_int(dispgraph, values, **kw):
+    return _encode_array('q', values)
+
+@encode_columns.when(Number)
+def encode_number(dispgraph, values, **kw):
+    if all(isinstance(v, numbers.Integral) for v in values):
+        return _encode_array('q', values)
+    if all(isinstance(v, float) for v in values):
+        return _encode_array('d', values)
+    return encode_generic(dispgraph, values, **kw)
+
+@encode_columns.when(Boolean)
+def encode_bool(dispgraph, values, **kw):
+    return _encode_array('B', values)
+
+@encode_columns.when(String)
+def encode_str(dispgraph, values, **kw):
+    codes = {}
+    for v in values:
+        codes.setdefault(v, len(codes))
+    if len(codes) > len(values) // 2:
+        return {'': Column('list', list(values))}
+    dictionary = sorted(codes, key=codes.get)
+    data = array(_code_type(len(codes)), [codes[v] for v in values])
+    return {'': Column('dict', data, values=dictionary)}
+
+@encode_columns.when(Enum)
+def encode_enum(dispgraph, values, **kw):
+    marker = dispgraph.marker
+    try:
+        codes = [marker.index(v) for v in values]
+    except Invalid:
+        return encode_generic(dispgraph, values, **kw)
+    data = array(_code_type(len(marker.options)), codes)
+    return {'': Column('dict', data, values=list(marker.options))}
+
+@encode_columns.when(DateTime)
+def encode_datetime(dispgraph, values, **kw):
+    def micros(v):
+        offset = v.utcoffset()
+        if offset is not None:
+            v = v.replace(tzinfo=None) - offset
+        return _micros(v - _EPOCH)
+    return _encode_array('q', [micros(v) for v in values])
+
+@encode_columns.when(Date)
+def encode_date(dispgraph, values, **kw):
+    return _encode_array('q', [v.toordinal() for v in values])
+
+@encode_columns.when(TimeDelta)
+def encode_timedelta(dispgraph, values, **kw):
+    return _encode_array('q', [_micros(v) for v in values])
+
+@encode_columns.when(Optional)
+def encode_optional(dispgraph, values, **kw):
+    inner = dispgraph.for_marker(dispgraph.marker.marker)
+    if isinstance(unwrap(inner.marker), Schema):
+        # One bitmap can't cover several columns
+        return encode_generic(dispgraph, values, **kw)
+    nulls = bytearray((len(values) + 7) // 8)
+    present = []
+    for i, v in enumerate(values):
+        if v is None:
+            nulls[i // 8] |= 1 << (i % 8)
+        else:
+            present.append(v)
+    column = inner(present, **kw)['']
+    return {'': column._replace(nulls=nulls)}
+
+def _encode_fields(dispgraph, rows, get, kw):
+    columns = {}
+    for key, sub in dispgraph.edge_iter():
+        for path, column in sub([get(r, key) for r in rows], **kw).items():
+            columns[_join(key, path)] = column
+    return columns
+
+@encode_columns.when(Schema)
+def encode_schema(dispgraph, values, **kw):
+    return _encode_fields(dispgraph, values, lambda r, k: r.get(k), kw)
+
+@encode_columns.when(ObjectMarker)
+def encode_obj(dispgraph, values, **kw):
+    return _encode_fields(dispgraph, values, lambda r, k: getattr(r, k, None), kw)
+
+
+#  ============
+#  = Decoding =
+#  ============
+
+# decode_columns(typegraph, columns, path, n) returns the list of n values
+# encoded in columns at path.
+decode_columns = make_dispatcher()
+
+def _with_nulls(column, values, n):
+    if column.nulls is None:
+        return values
+    nulls, it = column.nulls, iter(values)
+    return [None if nulls[i // 8] & (1 << (i % 8)) else next(it)
+            for i in range(n)]
+
+def _decoded(column):
+    if column.kind == 'array':
+        return column.data.tolist()
+    if column.kind == 'dict':
+        values = column.values
+        return [values[c] for c in column.data]
+    return list(column.data)
+
+@decode_columns.when(Marker)
+def decode_generic(dispgraph, columns, path, n, **kw):
+    column = columns[path]
+    graph = dispgraph.marker_graph()
+    if column.kind == 'list':
+        values = [undictify(graph, v, **kw) for v in column.data]
+    else:
+        values = _decoded(column)
+    return _with_nulls(column, values, n)
+
+def _decode_with(convert):
+    def decode(dispgraph, columns, path, n, **kw):
+        column = columns[path]
+        values = _decoded(column)
+        if column.kind != 'dict':
+            # 'list' columns hold the numbers that overflowed an array
+            values = [convert(v) for v in values]
+        return _with_nulls(column, values, n)
+    return decode
+
+decode_columns.register([DateTime], _decode_with(
+    lambda v: _EPOCH + datetime.timedelta(microseconds=v)))
+decode_columns.register([Date], _decode_with(datetime.date.fromordinal))
+decode_columns.register([TimeDelta], _decode_with(
+    lambda v: datetime.timedelta(microseconds=v)))
+decode_columns.register([Boolean], _decode_with(bool))
+for _leaf in [Int, Number, String]:
+    decode_columns.register([_leaf], _decode_with(lambda v: v))
+
+@decode_columns.when(Optional)
+def decode_optional(dispgraph, columns, path, n, **kw):
+    inner = dispgraph.for_marker(dispgraph.marker.marker)
+    if isinstance(unwrap(inner.marker), Schema):
+        return decode_generic(dispgraph, columns, path, n, **kw)
+    return inner(columns, path, n, **kw)
+
+def _decode_fields(dispgraph, columns, path, n, kw):
+    keys, cols = [], []
+    for key, sub in dispgraph.edge_iter():
+        keys.append(key)
+        cols.append(sub(columns, _join(path, key), n, **kw))
+    if not keys:
+        return [{} for _ in range(n)]
+    return [dict(zip(keys, row)) for row in zip(*cols)]
+
+@decode_columns.when(Schema)
+def decode_schema(dispgraph, columns, path, n, **kw):
+    return _decode_fields(dispgraph, columns, path, n, kw)
+
+@decode_columns.when(ObjectMarker)
+def decode_obj(dispgraph, columns, path, n, **kw):
+    construct = dispgraph.marker.construct
+    return [construct(attrs, **kw)
+            for attrs in _decode_fields(dispgraph, columns, path, n, kw)]
+
+
+def _record_graph(typegraph):
+    typegraph = to_typegraph(typegraph)
+    if not isinstance(typegraph.value, List):
+        raise ValueError("Expected a List typegraph, got {}".format(typegraph.value))
+    return typegraph['sub']
+
+def to_columns(typegraph, values, **kwargs):
+    '''Encode a list of records as a table of columns.
+
+    typegraph must be a List typegraph. Returns a dict with the number of
+    records under 'length' and a dict of path:Column under 'columns'.
+    '''
+    values = list(values)
+    columns = encode_columns(_record_graph(typegraph), values, **kwargs)
+    return dict(length=len(values), columns=columns)
+
+def from_columns(typegraph, table, **kwargs):
+    '''Decode a table created by to_columns back into a list of records.'''
+    return decode_columns(_record_graph(typegraph), table['columns'], '',
+        table['length'], **kwargs)
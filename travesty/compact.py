@@ -0,0 +1,123 @@
+'''compact.py: positional JSON encoding for schemas.
+
+compact_dictify is like dictify, except that Schemas (SchemaMappings,
+SchemaObjs and other ObjectMarkers) become lists of their fields' values
+instead of dicts keyed by field name. Clients that already know the schema
+don't need the names repeated in every record, so this roughly halves the size
+of a typical payload. Everything else is encoded just as with dictify:
+
+>>> import travesty as tv
+>>> class Point(tv.SchemaObj):
+...     field_types = dict(x=tv.Int(), y=tv.Int(), label=tv.String())
+>>> Path = tv.SchemaMapping().of(
+...     name=tv.String(),
+...     points=tv.List().of(Point),
+... )
+>>> value = dict(name=u'route', points=[Point(x=1, y=2, label=u'a'),
+...                                     Point(x=3, y=4, label=u'b')])
+>>> compact_dictify(Path, value)
+['route', [['a', 1, 2], ['b', 3, 4]]]
+
+Fields are always in sorted key order, so the layout doesn't depend on the
+order in which field_types was written (or on dict ordering).
+
+compact_undictify reverses this, with the same error checking as undictify:
+
+>>> result = compact_undictify(Path, [u'route', [[u'a', 1, 2], [u'b', 3, 4]]])
+>>> result['points'][1].label
+'b'
+>>> compact_undictify(Path, [u'route', [[u'a', 1], u'b']])
+Traceback (most recent call last):
+    ...
+Invalid: points: [0: [bad_len], 1: [type_error]]
+
+SchemaMappings with extra_field_policy='save' end with a dict of their extra
+fields, so they survive the round trip:
+
+>>> Tagged = tv.SchemaMapping(extra_field_policy='save').of(name=tv.String())
+>>> compact_dictify(Tagged, dict(name=u'a', color=u'red'))
+['a', {'color': 'red'}]
+>>> compact_undictify(Tagged, [u'a', {u'color': u'red'}]) == dict(
+...     name=u'a', color=u'red')
+True
+
+Documents are encoded as full lists the first time they're encountered, and
+after that (or if they're not being traversed) as just their uid strings.
+'''
+from .base import dictify, undictify, stepwise, IGNORE
+from .cantrips.trampoline import Return
+from .invalid import Invalid
+from .mapping import SchemaMapping
+from .object_marker import ObjectMarker
+from .schema import Schema
+
+
+compact_dictify = dictify.sub()
+compact_undictify = undictify.sub()
+
+
+def field_order(dispgraph):
+    '''The order in which compact_dictify lists dispgraph's fields.'''
+    return sorted(dispgraph.key_iter())
+
+
+def saves_extras(dispgraph):
+    '''Whether dispgraph's lists end with a dict of extra fields.'''
+    marker = dispgraph.marker
+    return (isinstance(marker, SchemaMapping)
+            and marker.extra_field_policy == 'save')
+
+
+def iter_compact(dispgraph, value, kw):
+    '''Dictify value with dictify's handler, then flatten it into a list.
+
+    This is a stepwise function, for use in @stepwise handlers.
+    '''
+    result = yield dispgraph.parent(compact_dictify).defer(value, **kw)
+    keys = field_order(dispgraph)
+    fields = [result.get(key) for key in keys]
+    if saves_extras(dispgraph):
+        keys = set(keys)
+        fields.append(dict((k, v) for k, v in result.items() if k not in keys))
+    raise Return(fields)
+
+
+def iter_expand(dispgraph, value, kw):
+    '''Inverse of iter_compact: undictify a list of field values.
+
+    The list is zipped up with the field names, and the resulting dict is
+    passed on to undictify's handler.
+    '''
+    keys = field_order(dispgraph)
+    extras = saves_extras(dispgraph)
+    if kw.get('error_mode', IGNORE) != IGNORE:
+        if not isinstance(value, (list, tuple)):
+            msg = 'Expected a list, got {} instead'.format(type(value))
+            raise Invalid("type_error", msg, fatal=True)
+        length = len(keys) + extras
+        if len(value) != length:
+            msg = 'Expected {} fields, got {}'.format(length, len(value))
+            raise Invalid("bad_len", msg, fatal=True)
+        if extras and not isinstance(value[-1], dict):
+            msg = 'Expected a dict of extra fields, got {} instead'
+            raise Invalid("type_error", msg.format(type(value[-1])),
+                          fatal=True)
+    fields = {}
+    if extras and len(value) > len(keys) and isinstance(value[-1], dict):
+        fields.update(value[-1])
+    fields.update(zip(keys, value))
+    undisp = dispgraph.parent(compact_undictify)
+    raise Return((yield undisp.defer(fields, **kw)))
+
+
+# SchemaMapping and ObjectMarker have their own handlers in dictify and
+# undictify, so they need to be registered here too, not just Schema.
+@compact_dictify.when(Schema, SchemaMapping, ObjectMarker)
+@stepwise
+def compact_schema(dispgraph, value, **kw):
+    raise Return((yield iter_compact(dispgraph, value, kw)))
+
+@compact_undictify.when(Schema, SchemaMapping, ObjectMarker)
+@stepwise
+def expand_schema(dispgraph, value, **kw):
+    raise Return((yield iter_expand(dispgraph, value, kw)))
@@ -55,6 +55,17 @@ datetime.time(14, 21, 3, 100500)
 >>> undictify(DateTime(), u'1776-12-25T14:21:03')
 datetime.datetime(1776, 12, 25, 14, 21, 3)
 
+Timezone offsets (including 'Z' for UTC) are supported, and produce aware
+datetimes and times:
+
+>>> aware = undictify(DateTime(), u'1776-12-25T14:21:03+05:30')
+>>> aware.utcoffset() == datetime.timedelta(hours=5, minutes=30)
+True
+>>> undictify(DateTime(), dictify(DateTime(), aware)) == aware
+True
+>>> undictify(Time(), u'14:21:03Z').utcoffset()
+datetime.timedelta(0)
+
 Unparseable strings get "bad_format" errors; non-strings get "type_error":
 
 >>> undictify(DateTime(), "20003-1-1")
@@ -126,11 +137,46 @@ True
 >>> td = undictify(TimeDelta(), (1,2,3))
 >>> undictify(TimeDelta(), td) == td
 True
+
+
+For compact payloads, epoch_dictify and epoch_undictify are variants of dictify
+and undictify that encode these types as integers instead: DateTimes as
+microseconds since the unix epoch, Dates as day ordinals (see
+date.toordinal()), and TimeDeltas as total microseconds. Everything else is
+handled just as dictify and undictify would.
+
+>>> epoch_dictify(DateTime(), d)
+-6090975536899500
+>>> epoch_undictify(DateTime(), -6090975536899500) == d
+True
+>>> epoch_dictify(Date(), d.date())
+648665
+>>> epoch_undictify(Date(), 648665) == d.date()
+True
+>>> epoch_dictify(TimeDelta(), datetime.timedelta(days=-1, microseconds=5))
+-86399999995
+>>> epoch_undictify(TimeDelta(), -86399999995) == datetime.timedelta(-1, 0, 5)
+True
+
+Aware datetimes are converted to UTC, and come back as naive UTC datetimes.
+Times aren't affected, and are still ISO strings. Non-integers get type_errors,
+and integers out of range get value_errors:
+
+>>> epoch_undictify(DateTime(), u"1776-12-25")
+Traceback (most recent call last):
+...
+Invalid: type_error
+>>> epoch_undictify(Date(), 0)
+Traceback (most recent call last):
+...
+Invalid: value_error - ordinal must be >= 1
 """
 
 
 
 import datetime
+import numbers
+import re
 
 import sys
 if sys.version >= '3': # pragma: no cover
@@ -158,6 +204,12 @@ def undictify_dt(dispgraph, value, **kwargs):
     marker = dispgraph.marker
     return _parse(value, marker._dt_type)
 
+def undictify_dt_many(dispgraph, values, **kwargs):
+    return parse_many(values, dispgraph.marker._dt_type)
+
+# Lets List undictify whole lists of dates at once; see iter_list.
+undictify_dt.batch = undictify_dt_many
+
 class DateTime(_DateTimeMarker):
     _dt_type = datetime.datetime
 
@@ -192,6 +244,90 @@ def undictify_td(dispgraph, value, **kwargs):
     except TypeError as e:
         raise Invalid("type_error", str(e))
 
+try:
+    _timezone = datetime.timezone
+except AttributeError: # pragma: no cover
+    class _timezone(datetime.tzinfo):
+        '''Fixed-offset timezone, for Pythons without datetime.timezone.'''
+        def __init__(self, offset):
+            self._offset = offset
+
+        def utcoffset(self, dt):
+            return self._offset
+
+        def dst(self, dt):
+            return datetime.timedelta(0)
+
+        def tzname(self, dt):
+            return None
+
+        def __repr__(self):
+            return '_timezone({!r})'.format(self._offset)
+
+_utc = _timezone(datetime.timedelta(0))
+
+_DATE_RE = r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})'
+_TIME_RE = (r'([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})(?:\.([0-9]{1,6}))?'
+            r'(?:(Z)|([+-])([0-9]{2}):?([0-9]{2}))?')
+_PATTERNS = {
+    datetime.datetime: re.compile(_DATE_RE + 'T' + _TIME_RE + r'\Z'),
+    datetime.date: re.compile(_DATE_RE + r'\Z'),
+    datetime.time: re.compile(_TIME_RE + r'\Z'),
+}
+
+def _parse_re(value, cls):
+    '''Parse value with the lenient regex, raising ValueError on failure.'''
+    m = _PATTERNS[cls].match(value)
+    if m is None:
+        raise ValueError("{!r} is not an ISO 8601 {}".format(value, cls.__name__))
+    groups = m.groups()
+    if cls is datetime.date:
+        return datetime.date(*[int(g) for g in groups])
+    date = ()
+    if cls is datetime.datetime:
+        date, groups = tuple(int(g) for g in groups[:3]), groups[3:]
+    h, m, s, frac, z, sign, tz_h, tz_m = groups
+    tz = None
+    if z:
+        tz = _utc
+    elif sign:
+        offset = datetime.timedelta(hours=int(tz_h), minutes=int(tz_m))
+        tz = _timezone(-offset if sign == '-' else offset)
+    us = int(frac.ljust(6, '0')) if frac else 0
+    return cls(*date + (int(h), int(m), int(s), us, tz))
+
+# Python 3.7+ has a very fast C parser for the exact format that isoformat()
+# produces. These match strings in that canonical form (which _parse_re also
+# accepts, so both parsers agree); anything else (unpadded fields, 'Z'
+# suffixes, etc.) goes through _parse_re. Later Pythons' fromisoformat
+# accepts more, e.g. week dates, so the shape has to be checked exactly.
+_ISO_DATE = r'[0-9]{4}-[0-9]{2}-[0-9]{2}'
+_ISO_TIME = r'[0-9]{2}:[0-9]{2}:[0-9]{2}(?:\.[0-9]{6})?(?:[+-][0-9]{2}:[0-9]{2})?'
+_CANONICAL = {
+    datetime.datetime: re.compile(_ISO_DATE + 'T' + _ISO_TIME + r'\Z').match,
+    datetime.date: re.compile(_ISO_DATE + r'\Z').match,
+    datetime.time: re.compile(_ISO_TIME + r'\Z').match,
+}
+
+def _parser(cls):
+    '''Get a function that parses strings to cls, raising ValueError.'''
+    if cls not in _PATTERNS:
+        raise ValueError("Unrecognized date type: {}".format(cls))
+    fromiso = getattr(cls, 'fromisoformat', None)
+    if fromiso is None: # pragma: no cover
+        return lambda v: _parse_re(v, cls)
+    canonical = _CANONICAL[cls]
+    def parse(v):
+        if canonical(v):
+            try:
+                return fromiso(v)
+            except ValueError:
+                pass
+        return _parse_re(v, cls)
+    return parse
+
+_PARSERS = dict((cls, _parser(cls)) for cls in _PATTERNS)
+
 def _parse(value, cls=datetime.datetime):
     '''
     >>> _parse("2001-01-01T5:10:15")
@@ -207,27 +343,99 @@ def _parse(value, cls=datetime.datetime):
         ...
     ValueError: Unrecognized date type: <type 'datetime.timedelta'>
     '''
-    if cls is datetime.datetime:
-        fmt = "%Y-%m-%dT%H:%M:%S"
-    elif cls is datetime.date:
-        fmt = "%Y-%m-%d"
-    elif cls is datetime.time:
-        fmt = "%H:%M:%S"
-    else:
+    parse = _PARSERS.get(cls)
+    if parse is None:
         raise ValueError("Unrecognized date type: {}".format(cls))
     if isinstance(value, cls):
         return value
     if not isinstance(value, basestring):
         raise Invalid("type_error")
-    if '.' in value and cls in [datetime.datetime, datetime.time]:
-        fmt = fmt + ".%f"
     try:
-        val = datetime.datetime.strptime(value, fmt)
+        return parse(value)
     except ValueError as e:
         raise Invalid("bad_format", str(e))
-    if cls is datetime.datetime:
-        return val
-    elif cls is datetime.date:
-        return val.date()
-    else:
-        return val.time()
+
+def parse_many(values, cls=datetime.datetime):
+    '''Parse a list of ISO 8601 strings into a list of cls objects.
+
+    This is equivalent to [_parse(v, cls) for v in values], but faster.
+
+    >>> parse_many(["2001-01-01T05:10:15", "2001-01-01T5:10:15.5"])
+    [datetime.datetime(2001, 1, 1, 5, 10, 15), datetime.datetime(2001, 1, 1, 5, 10, 15, 500000)]
+    >>> parse_many(["5:10:15", 12], datetime.time)
+    Traceback (most recent call last):
+        ...
+    Invalid: type_error
+    '''
+    parse = _PARSERS.get(cls)
+    if parse is None:
+        raise ValueError("Unrecognized date type: {}".format(cls))
+    result = []
+    for value in values:
+        if isinstance(value, basestring):
+            try:
+                value = parse(value)
+            except ValueError as e:
+                raise Invalid("bad_format", str(e))
+        elif not isinstance(value, cls):
+            raise Invalid("type_error")
+        result.append(value)
+    return result
+
+
+epoch_dictify = dictify.sub()
+epoch_undictify = undictify.sub()
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _micros(td):
+    return (td.days * 86400 + td.seconds) * 1000000 + td.microseconds
+
+def _check_int(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Integral):
+        raise Invalid("type_error", "Expected integer, got {}".format(type(value)))
+
+@epoch_dictify.when(DateTime)
+def epoch_dictify_dt(dispgraph, value, **kwargs):
+    offset = value.utcoffset()
+    if offset is not None:
+        value = value.replace(tzinfo=None) - offset
+    return _micros(value - _EPOCH)
+
+@epoch_undictify.when(DateTime)
+def epoch_undictify_dt(dispgraph, value, **kwargs):
+    if isinstance(value, datetime.datetime):
+        return value
+    _check_int(value)
+    try:
+        return _EPOCH + datetime.timedelta(microseconds=value)
+    except OverflowError as e:
+        raise Invalid("value_error", str(e))
+
+@epoch_dictify.when(Date)
+def epoch_dictify_date(dispgraph, value, **kwargs):
+    return value.toordinal()
+
+@epoch_undictify.when(Date)
+def epoch_undictify_date(dispgraph, value, **kwargs):
+    if isinstance(value, datetime.date):
+        return value
+    _check_int(value)
+    try:
+        return datetime.date.fromordinal(value)
+    except (ValueError, OverflowError) as e:
+        raise Invalid("value_error", str(e))
+
+@epoch_dictify.when(TimeDelta)
+def epoch_dictify_td(dispgraph, value, **kwargs):
+    return _micros(value)
+
+@epoch_undictify.when(TimeDelta)
+def epoch_undictify_td(dispgraph, value, **kwargs):
+    if isinstance(value, datetime.timedelta):
+        return value
+    _check_int(value)
+    try:
+        return datetime.timedelta(microseconds=value)
+    except OverflowError as e:
+        raise Invalid("value_error", str(e))
@@ -1,6 +1,7 @@
 import vertigo as vg
 
 from .cantrips.dispatcher import DispatchSuper, SuperMarker
+from .cantrips.trampoline import run
 
 #  =================
 #  = DispatchGraph =
@@ -35,14 +36,29 @@ class DispatchGraph(object):
 
     DispatchGraphs are callable - calling one will use its dispatcher and target
     to choose a function, and then invoke that function.
+
+    If the chosen function is marked @stepwise, it is a generator that yields
+    deferred calls (see .defer()) instead of calling other DispatchGraphs
+    directly, and calling the graph runs it to completion on an explicit
+    stack. This is how travesty's built-in dispatchers handle arbitrarily deep
+    values without recursion.
     '''
     __slots__ = ()
 
     def __call__(self, *args, **kwargs):
-        fn = self._get_fn()
-        if not fn:
-            raise NotImplementedError(self.marker)
-        return fn(self, *args, **kwargs)
+        gen, result = _invoke(self, args, kwargs)
+        if gen is not None:
+            return run(gen)
+        return result
+
+    def defer(self, *args, **kwargs):
+        '''Return a deferred call of this graph, for use in @stepwise functions.
+
+        Yielding the deferred call from a stepwise function calls the graph
+        and sends the result back, so `x = yield dg.defer(value, **kw)` is the
+        stepwise equivalent of `x = dg(value, **kw)`.
+        '''
+        return DeferredCall(self, args, kwargs)
 
     @property
     def target(self):
@@ -133,6 +149,98 @@ class DispatchGraph(object):
         return DispatchRestriction(self, edge_names)
 
 
+def stepwise(fn):
+    '''Mark a dispatch function as a stepwise generator.
+
+    A stepwise function is a generator that yields deferred calls (from
+    DispatchGraph.defer) or other stepwise generators, and gets their results
+    sent back. It returns its own result by raising
+    travesty.cantrips.trampoline.Return(value), or, in Python 3, with a plain
+    return statement.
+
+    For example, this dispatcher sums the leaves of a List:
+
+    >>> from travesty import List, Int, Marker, make_dispatcher
+    >>> from travesty.cantrips.trampoline import Return
+    >>> total = make_dispatcher()
+    >>> @total.when(Int)
+    ... def total_int(dispgraph, value):
+    ...     return value
+    >>> @total.when(List)
+    ... @stepwise
+    ... def total_list(dispgraph, value):
+    ...     result = 0
+    ...     for item in value:
+    ...         result += yield dispgraph['sub'].defer(item)
+    ...     raise Return(result)
+    >>> total(List().of(List().of(Int())), [[1, 2], [3]])
+    6
+    '''
+    fn.stepwise = True
+    return fn
+
+
+def structural(fn):
+    '''Mark a dispatch function as one that only walks its value.
+
+    A structural function does nothing but call the dispatcher on the parts of
+    its value, and for a dispatcher that prunes (see GraphDispatcher.prune), it
+    must give the same result as the dispatcher's pruned handler whenever all
+    of those calls do. Dispatchers that prune skip any part of a value whose
+    typegraph only has structural functions.
+
+    A function that can also change its value, such as mutate's for schemas
+    (which fill in missing fields), instead sets its .structural to a check
+    function, like .unchanged (see GraphDispatcher._shares): it returns None if
+    the function's result for the value would differ from the pruned
+    handler's, and otherwise the parts of the value that need checking too.
+    Parts of a value are only skipped if they pass these checks.
+    '''
+    fn.structural = True
+    return fn
+
+
+def _invoke(graph, args, kwargs):
+    '''Dispatch on graph and call the chosen function.
+
+    Returns a pair (gen, result): gen is the generator to run if the function
+    is stepwise and None otherwise, and result is the result of the call.
+    '''
+    fn = graph._get_fn()
+    if not fn:
+        raise NotImplementedError(graph.marker)
+    walks_only = getattr(fn, 'structural', False)
+    if walks_only and isinstance(graph, DynamicDispatchGraph):
+        disp = graph.disp_target
+        if getattr(disp, 'pruned_handler', None) is not None:
+            fn = disp._skip(graph.graph, args[0], kwargs) or fn
+    if kwargs.get('share_unchanged') and isinstance(graph, DynamicDispatchGraph):
+        check = getattr(fn, 'unchanged', None)
+        shares = getattr(graph.disp_target, '_shares', None)
+        if check not in (None, True) and shares is not None:
+            if shares(graph.graph, args[0], kwargs):
+                return None, args[0]
+    if getattr(fn, 'stepwise', False):
+        disp = graph.disp_target
+        if kwargs.get('memoize') and getattr(disp, 'memoizes', False):
+            return disp._memoized(graph, fn, args, kwargs)
+        return fn(graph, *args, **kwargs), None
+    return None, fn(graph, *args, **kwargs)
+
+
+class DeferredCall(object):
+    '''A call of a DispatchGraph, to be yielded from a stepwise function.'''
+    __slots__ = ('graph', 'args', 'kwargs')
+
+    def __init__(self, graph, args, kwargs):
+        self.graph = graph
+        self.args = args
+        self.kwargs = kwargs
+
+    def start(self):
+        return _invoke(self.graph, self.args, self.kwargs)
+
+
 class Extras(dict):
     def __getattr__(self, attr):
         if attr not in self:
@@ -91,7 +91,10 @@ ValueError: Duplicate uid node1 for type <class 'travesty.document.Node'>
 
 from .document import Document, UnloadedDocumentException, DoubleLoadException
 from .docset import DocSet
+from .uids import UidStrategy, StrUuids, IntUuids, SequentialUids
+from .uids import SnowflakeUids
 
 __all__ = ['Document', 'DocSet', 'UnloadedDocumentException',
-    'DoubleLoadException']
+    'DoubleLoadException', 'UidStrategy', 'StrUuids', 'IntUuids',
+    'SequentialUids', 'SnowflakeUids']
 
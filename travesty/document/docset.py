@@ -1,5 +1,13 @@
+try:
+    from collections.abc import Mapping
+except ImportError: # pragma: no cover
+    from collections import Mapping
+
 from travesty import undictify
 
+from . import snapshot
+from .index import Index, split_path
+
 class DoubleLoadException(Exception):
     '''Raised if a loaded document is loaded again.'''
     pass
@@ -47,29 +55,84 @@ class DocSet(object):
     The helper method docset.load(type, data) is shorthand for
     travesty.undictify(type, data, in_docset=docset)
 
+    A DocSet can be written to disk with docset.save_snapshot(path) and read
+    back with DocSet.open_snapshot(path). Opening a snapshot only reads its
+    index: every document starts out unloaded, and is decoded from the
+    memory-mapped file the first time one of its fields is accessed. See
+    travesty.document.snapshot for details.
+
+    A DocSet can also maintain secondary indexes on the values at field paths
+    like 'author' or 'tags/sub', which can be declared when it is created via
+    indexes=[(type, path), ...] or added later with add_index. Use find and
+    find_range to query them; see travesty.document.index for details.
+
+    Internally, documents are stored in one dict per type, keyed by uid;
+    docset.document_map is a read-only view of these as a single mapping from
+    (type, uid) pairs to documents.
+
     '''
-    def __init__(self, items=()):
+    def __init__(self, items=(), indexes=()):
+        #: schema_cls -> {uid -> document}
+        self.documents = {}
         #: (schema_cls, uid) -> document
-        self.document_map = {}
+        self.document_map = DocumentMap(self.documents)
+        #: (schema_cls, path) -> Index
+        self.indexes = {}
+        self._type_indexes = {}
+        for doctype, path in indexes:
+            self.add_index(doctype, path)
         for item in items:
             self.add(item)
 
     def add(self, doc):
-        key = (type(doc), doc.uid)
-        if key in self.document_map:
-            raise ValueError("Duplicate uid {1} for type {0}".format(*key))
-        self.document_map[key] = doc
+        docs = self.documents.setdefault(type(doc), {})
+        if doc.uid in docs:
+            msg = "Duplicate uid {1} for type {0}"
+            raise ValueError(msg.format(type(doc), doc.uid))
+        docs[doc.uid] = doc
+        self.reindex(doc)
+
+    def of_type(self, type):
+        '''Return a dict mapping uids to the documents of the given type.'''
+        return self.documents.get(type, {})
+
+    def add_index(self, type, path):
+        '''Index documents of the given type by the values at path.
+
+        The index is populated from the documents already in the DocSet, and
+        returned.
+        '''
+        key = (type, split_path(path))
+        if key in self.indexes:
+            return self.indexes[key]
+        index = self.indexes[key] = Index(type, key[1])
+        self._type_indexes.setdefault(type, []).append(index)
+        # Updating may load lazy docs, which can add the docs they refer to
+        for doc in list(self.of_type(type).values()):
+            index.update(doc)
+        return index
+
+    def reindex(self, doc):
+        '''Update all indexes for doc's type to reflect its current values.'''
+        for index in self._type_indexes.get(type(doc), ()):
+            index.update(doc)
+
+    def find(self, type, path, value):
+        '''Return the set of documents of type with value at path.'''
+        return self.indexes[type, split_path(path)].find(value)
+
+    def find_range(self, type, path, low=None, high=None):
+        '''Return documents of type whose values at path are in [low, high).'''
+        return self.indexes[type, split_path(path)].find_range(low, high)
 
     def get(self, type, uid):
-        key = (type, uid)
-        return self.document_map.get(key, None)
+        return self.documents.get(type, {}).get(uid, None)
 
     def create(self, type, uid):
-        key = (type, uid)
-        if key in self.document_map:
-            raise ValueError("Duplicate uid {1} for type {0}".format(*key))
-        doc = type._create_unloaded(uid)
-        self.document_map[key] = doc
+        docs = self.documents.setdefault(type, {})
+        if uid in docs:
+            raise ValueError("Duplicate uid {1} for type {0}".format(type, uid))
+        doc = docs[uid] = type._create_unloaded(uid)
         return doc
 
     def get_or_create(self, type, uid):
@@ -78,8 +141,10 @@ class DocSet(object):
         If this is called multiple times with the same uid, the same document
         will be returned.
         '''
-        key = (type, uid)
-        doc = self.document_map.setdefault(key, type._create_unloaded(uid))
+        docs = self.documents.setdefault(type, {})
+        doc = docs.get(uid)
+        if doc is None:
+            doc = docs[uid] = type._create_unloaded(uid)
         assert isinstance(doc, type)
         return doc
 
@@ -98,17 +163,66 @@ class DocSet(object):
         here - if you need to, just call it directly.
         '''
         if isinstance(data, dict) and 'uid' in data:
-            old = self.get(type, data['uid'])
+            try:
+                uid = type.uid_strategy.from_str(data['uid'])
+            except (TypeError, ValueError):
+                # Let undictify report the bad uid
+                uid = None
+            old = self.get(type, uid)
             if old and old.loaded:
                 if allow_double_load:
                     return old
-                raise DoubleLoadException(type, data['uid'])
+                raise DoubleLoadException(type, uid)
         kwargs = kwargs.copy() if kwargs else {}
         kwargs['in_docset'] = self
         return undictify(type, data, **kwargs)
 
+    def save_snapshot(self, path):
+        '''Write all the documents in this DocSet to a snapshot file.'''
+        snapshot.save_snapshot(self, path)
+
+    @classmethod
+    def open_snapshot(cls, path, types=()):
+        '''Create a DocSet of lazily-loaded documents from a snapshot file.
+
+        Document types are found by importing the names stored in the
+        snapshot; pass the classes as types if they can't be imported.
+        '''
+        return snapshot.open_snapshot(path, cls(), types)
+
+    def __getstate__(self):
+        # Load lazy docs up front: loading one can add the docs it refers to,
+        # which mustn't happen while pickle is walking the documents dict
+        for docs in list(self.documents.values()):
+            for doc in list(docs.values()):
+                if not doc.loaded and '_tv_loader' in doc.__dict__:
+                    doc._tv_loader(doc)
+        return self.__dict__
+
     def __getitem__(self, key):
         return self.document_map[key]
 
     def __contains__(self, key):
         return key in self.document_map
+
+
+class DocumentMap(Mapping):
+    '''Read-only view of a DocSet's documents, keyed by (type, uid).'''
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __getitem__(self, key):
+        type, uid = key
+        return self.documents[type][uid]
+
+    def __contains__(self, key):
+        type, uid = key
+        return uid in self.documents.get(type, ())
+
+    def __iter__(self):
+        for type, docs in self.documents.items():
+            for uid in docs:
+                yield (type, uid)
+
+    def __len__(self):
+        return sum(len(docs) for docs in self.documents.values())
@@ -2,23 +2,31 @@ import sys
 if sys.version >= '3': # pragma: no cover
     unicode = str
 
-from uuid import uuid4
-
 import vertigo as vg
 
-from travesty import SchemaObj, String, Invalid
+from travesty import SchemaObj, Invalid
 from travesty import clone, mutate, traverse, graphize, dictify, undictify
-from travesty.base import aggregating_errors, IGNORE
+from travesty.base import aggregating_errors, IGNORE, stepwise
 from travesty.cantrips import empty_instance
-from travesty.schema import apply_schema
-from travesty.object_marker import extract_obj
+from travesty.cantrips.trampoline import Return
+from travesty.schema import iter_schema
+from travesty.schema_obj import _field_values
+from travesty.object_marker import iter_extract_obj
+from travesty.walk import walk_children
+from travesty.packing import pack_into, unpack_from, write_str
+from travesty.packing import iter_pack_fields, iter_unpack_fields
+from travesty.columnar import encode_columns, decode_columns
+from travesty.columnar import encode_generic, decode_generic
+from travesty.compact import compact_dictify, compact_undictify
+from travesty.compact import field_order, iter_expand
 
 
 from .docset import DocSet, DoubleLoadException
+from .uids import Uid, StrUuids
 
 def make_uid():
-    '''Generate a (probably) unique id.'''
-    return unicode(uuid4())
+    '''Generate a (probably) unique id with Document's default strategy.'''
+    return Document.uid_strategy.new()
 
 class UnloadedDocumentException(Exception):
     '''Raised on attr access of an unloaded document.'''
@@ -29,7 +37,7 @@ class UnloadedDocumentException(Exception):
 class Document(SchemaObj):
     '''Document protocol for non-tree object graphs.
 
-    Every document has a uid, which is a string. Each document is assumed to
+    Every document has a uid, which is a string or an int. Each document is assumed to
     have a tree-like typegraph, but documents can contain references to other
     documents (or even to themselves), and this reference structure not be
 
@@ -50,17 +58,23 @@ class Document(SchemaObj):
 
     If no uid is provided during initialization, then the Document is given a
     generated uid and has new=True.
+
+    The class attribute uid_strategy determines how uids are generated and
+    serialized; the default generates random uuid strings. See
+    travesty.document.uids for other options, e.g. int-backed uuids or
+    sequential ids.
     '''
     field_types = dict(
-        uid = String(),
+        uid = Uid(),
     )
     loaded = False
+    uid_strategy = StrUuids()
 
     def __init__(self, uid=None, **attrs):
         self.loaded = True
         # If uid is not specified, generate one randomly
         if uid is None:
-            uid = make_uid()
+            uid = self.uid_strategy.new()
         self.uid = uid
         self._load(**attrs)
 
@@ -72,6 +86,20 @@ class Document(SchemaObj):
             uid = uid,
         ))
 
+    def __getstate__(self):
+        # Lazily-loaded docs are pickled with their data, not their loader
+        if not self.loaded and '_tv_loader' in self.__dict__:
+            self._tv_loader(self)
+        # Loaded documents don't need their loaded flag pickled.
+        if self.__dict__.get('loaded'):
+            return _field_values(self.__dict__, self._tv_field_order, ['loaded'])
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            self.loaded = True
+        super(Document, self).__setstate__(state)
+
     def load(self, **attrs):
         if self.loaded:
             raise DoubleLoadException(type(self), self.uid)
@@ -93,9 +121,17 @@ class Document(SchemaObj):
         return self
 
     def __getattr__(self, attr):
-        '''Raise UnloadedDocumentException on access to unloaded attributes'''
+        '''Raise UnloadedDocumentException on access to unloaded attributes
+
+        Documents opened from a snapshot have a loader instead, and are loaded
+        on first access.
+        '''
         if not self.loaded and attr != 'uid' and attr in self.field_types:
-            raise UnloadedDocumentException(self)
+            loader = self.__dict__.get('_tv_loader')
+            if loader is None:
+                raise UnloadedDocumentException(self)
+            loader(self)
+            return getattr(self, attr)
         return object.__getattribute__(self, attr)
 
     def _loaded_str(self):
@@ -128,6 +164,7 @@ class Document(SchemaObj):
 clone.default_factory("in_docset", lambda: DocSet())
 
 @clone.when(Document.marker_cls)
+@stepwise
 def clone_document(dispgraph, doc, **kwargs):
     '''Clone a Document.
 
@@ -150,7 +187,7 @@ def clone_document(dispgraph, doc, **kwargs):
     # If traverse_docs says not to continue, stop here
     if 'traverse_docs' in dispgraph.extras:
         if not dispgraph.extras.traverse_docs:
-            return doc
+            raise Return(doc)
     # Check type here if needed
     if kwargs.get('error_mode', IGNORE) != IGNORE:
         marker = dispgraph.marker
@@ -159,22 +196,28 @@ def clone_document(dispgraph, doc, **kwargs):
             expected = marker.target_cls.__name__
             msg = "Expected {}, got {}".format(expected, name)
             raise Invalid("type_error", msg)
-    uid = make_uid() if new_uids else doc.uid
+    uid = type(doc).uid_strategy.new() if new_uids else doc.uid
     key = (type(doc), uid)
     if key in docset:
-        return docset[key]
+        raise Return(docset[key])
     new_doc = docset.create(type(doc), uid)
+    if not doc.loaded and '_tv_loader' in doc.__dict__:
+        # Lazily-loaded docs (e.g. from a snapshot) are cloned with their data
+        doc._tv_loader(doc)
     if not doc.loaded:
         # Nothing else to copy if the doc is unloaded
-        return new_doc
+        raise Return(new_doc)
     # Load a dict of the results of all the child calls
-    attrs = extract_obj(dispgraph, doc, kwargs)
+    attrs = yield iter_extract_obj(dispgraph, doc, kwargs)
     new_doc.load(**attrs)
-    return new_doc
+    docset.reindex(new_doc)
+    raise Return(new_doc)
+clone_document.memoizable = False
 
 
 # Inherits a default in_docset from clone
 @undictify.when(Document.marker_cls)
+@stepwise
 def udf_document(dispgraph, value, **kwargs):
     error_mode = kwargs.get('error_mode', IGNORE)
     # Check type here if needed
@@ -186,29 +229,63 @@ def udf_document(dispgraph, value, **kwargs):
         if 'uid' not in value:
             # TODO standardize the invalid naming pattern
             raise Invalid('missing_key:uid', "Document has no uid.")
-    uid = value['uid']
     doctype = dispgraph.marker.target_cls
+    try:
+        uid = doctype.uid_strategy.from_str(value['uid'])
+    except (TypeError, ValueError) as e:
+        if error_mode == IGNORE:
+            raise
+        raise Invalid('bad_uid', str(e))
     in_docset = kwargs['in_docset']
     doc = in_docset.get_or_create(doctype, uid)
     # If the input has no keys besides 'uid', and the doctype expects more, then
     # this is an unloaded document and we should just return it
     if (len(value) == 1) and len(doctype.field_types) > 1:
-        return doc
+        raise Return(doc)
     # Otherwise, we need to populate it.
     with aggregating_errors(error_mode):
-        attrs = apply_schema(dispgraph, value, kwargs)
+        attrs = yield iter_schema(dispgraph, value, kwargs)
         if error_mode != IGNORE:
             # TODO this duplicates logic in doc.load - should maybe combine?
             extra_keys = set(value.keys()) - set(dispgraph.key_iter())
             if extra_keys:
                 raise Invalid('unexpected_fields', keys=extra_keys)
     doc.load(**attrs)
-    return doc
+    in_docset.reindex(doc)
+    raise Return(doc)
+udf_document.memoizable = False
+
+
+@compact_dictify.when(Document.marker_cls)
+@stepwise
+def compact_dictify_document(dispgraph, doc, **kwargs):
+    '''compact_dictify for Document.
+
+    Where dictify would return a full serialized object, this returns a list of
+    its fields, and where dictify would return a stub, this returns just the
+    uid string.
+    '''
+    result = yield dispgraph.parent(compact_dictify).defer(doc, **kwargs)
+    if len(result) == 1 and len(type(doc).field_types) > 1:
+        raise Return(result['uid'])
+    raise Return([result.get(key) for key in field_order(dispgraph)])
+compact_dictify_document.memoizable = False
+
+
+@compact_undictify.when(Document.marker_cls)
+@stepwise
+def compact_udf_document(dispgraph, value, **kwargs):
+    if isinstance(value, (str, unicode)):
+        undisp = dispgraph.parent(compact_undictify)
+        raise Return((yield undisp.defer(dict(uid=value), **kwargs)))
+    raise Return((yield iter_expand(dispgraph, value, kwargs)))
+compact_udf_document.memoizable = False
 
 
 mutate.default_factory("_tv_docs_processed", lambda: set())
 
 @mutate.when(Document.marker_cls)
+@stepwise
 def mutate_document(dispgraph, doc, **kwargs):
     '''Mutate a Document.
 
@@ -217,23 +294,31 @@ def mutate_document(dispgraph, doc, **kwargs):
 
     As with clone(), you can pass `traverse_docs` to explicitly control when
     this will descend into a given document.
+
+    If in_docset is given, its indexes are updated for each mutated document.
     '''
     docs_processed = kwargs['_tv_docs_processed']
     # If we've already mutated this doc, we're done no matter what.
     if doc in docs_processed:
-        return doc
+        raise Return(doc)
     # If traverse_docs says not to enter this doc, we're also done.
     if 'traverse_docs' in dispgraph.extras:
         if not dispgraph.extras.traverse_docs:
-            return doc
+            raise Return(doc)
     docs_processed.add(doc)
     superdisp = dispgraph.super(Document.marker_cls)
-    return superdisp(doc, **kwargs)
+    result = yield superdisp.defer(doc, **kwargs)
+    in_docset = kwargs['in_docset']
+    if in_docset.get(type(doc), doc.uid) is doc:
+        in_docset.reindex(doc)
+    raise Return(result)
+mutate_document.memoizable = False
 
 
 dictify.default_factory('_tv_docs_processed', lambda: set())
 
 @dictify.when(Document.marker_cls)
+@stepwise
 def dictify_document(dispgraph, doc, **kwargs):
     '''Dictify for Document.
 
@@ -241,28 +326,36 @@ def dictify_document(dispgraph, doc, **kwargs):
     a new object, this instead returns a complete serialized object, and where
     clone would return the original object, this instead returns
     dict(uid=doc.uid)
+
+    Uids are always serialized as strings, via the document's uid_strategy.
     '''
+    to_str = type(doc).uid_strategy.to_str
     docs_processed = kwargs['_tv_docs_processed']
     # If we've already done this doc, just return a stub
     if doc in docs_processed:
-        return dict(uid=doc.uid)
+        raise Return(dict(uid=to_str(doc.uid)))
     # If traverse_docs says not to enter this doc, just return a stub
     if 'traverse_docs' in dispgraph.extras:
         if not dispgraph.extras.traverse_docs:
-            return dict(uid=doc.uid)
+            raise Return(dict(uid=to_str(doc.uid)))
     docs_processed.add(doc)
     superdisp = dispgraph.super(Document.marker_cls)
-    return superdisp(doc, **kwargs)
+    result = yield superdisp.defer(doc, **kwargs)
+    if isinstance(result, dict) and 'uid' in result:
+        result['uid'] = to_str(doc.uid)
+    raise Return(result)
+dictify_document.memoizable = False
 
 
 graphize.default_factory("_tv_docs_cache", lambda: {})
 
 @graphize.when(Document.marker_cls)
+@stepwise
 def graphize_document(dispgraph, doc, **kwargs):
     cache = kwargs['_tv_docs_cache']
     if doc in cache:
         # Already done this one
-        return cache[doc]
+        raise Return(cache[doc])
     # Restrict to uid if the doc isn't loaded OR we're not supposed to traverse.
     superdisp = dispgraph.super(Document.marker_cls)
     if not doc.loaded:
@@ -271,15 +364,16 @@ def graphize_document(dispgraph, doc, **kwargs):
         if not dispgraph.extras.traverse_docs:
             superdisp = superdisp.restrict(['uid'])
     cache[doc] = vg.PlainGraphNode()
-    new = superdisp(doc, **kwargs)
+    new = yield superdisp.defer(doc, **kwargs)
     cache[doc].value = new.value
     cache[doc]._edges = new._edges
-    return cache[doc]
+    raise Return(cache[doc])
 
 
 traverse.default_factory("_tv_docs_processed", lambda: set())
 
 @traverse.when(Document.marker_cls)
+@stepwise
 def traverse_document(dispgraph, doc, **kwargs):
     docs_processed = kwargs['_tv_docs_processed']
     # If we've already done this doc, there's nothing to d
@@ -295,6 +389,83 @@ def traverse_document(dispgraph, doc, **kwargs):
     # superdisp (which should already handle exceptions)
     if not getattr(doc, 'loaded', False):
         # Unloaded doc: only traverse uid
-        return superdisp.restrict(['uid'])(doc, **kwargs)
-    # traverse normally
-    return superdisp(doc, **kwargs)
+        superdisp = superdisp.restrict(['uid'])
+    yield superdisp.defer(doc, **kwargs)
+
+
+walk_children.default_factory("_tv_docs_processed", lambda: set())
+
+@walk_children.when(Document.marker_cls)
+def walk_document(dispgraph, doc, **kwargs):
+    docs_processed = kwargs['_tv_docs_processed']
+    if doc in docs_processed:
+        return dispgraph.marker, ()
+    if 'traverse_docs' in dispgraph.extras:
+        if not dispgraph.extras.traverse_docs:
+            return dispgraph.marker, ()
+    superdisp = dispgraph.super(Document.marker_cls)
+    if not getattr(doc, 'loaded', False):
+        superdisp = superdisp.restrict(['uid'])
+    marker, children = superdisp(doc, **kwargs)
+    def expand():
+        # Only mark the doc as done once its children are actually walked, so
+        # that pruning one reference doesn't hide the doc everywhere else.
+        docs_processed.add(doc)
+        for child in children:
+            yield child
+    return marker, expand()
+
+
+pack_into.default_factory("_tv_docs_processed", lambda: set())
+
+def _packed_fields(dispgraph):
+    # The uid is written up front, so it isn't packed as a field
+    fields = [key for key in dispgraph.key_iter() if key != 'uid']
+    return dispgraph.super(Document.marker_cls).restrict(fields)
+
+@pack_into.when(Document.marker_cls)
+@stepwise
+def pack_document(dispgraph, doc, out, **kwargs):
+    '''Pack a Document as a flag byte, its uid, and (if the flag is set) its fields.
+
+    As with dictify, documents are only packed in full the first time they're
+    encountered, and only if they're loaded and traverse_docs allows it.
+    '''
+    docs_processed = kwargs['_tv_docs_processed']
+    full = doc.loaded and doc not in docs_processed
+    if full and 'traverse_docs' in dispgraph.extras:
+        full = bool(dispgraph.extras.traverse_docs)
+    out.append(1 if full else 0)
+    write_str(out, type(doc).uid_strategy.to_str(doc.uid))
+    if full:
+        docs_processed.add(doc)
+        fields = _packed_fields(dispgraph)
+        yield iter_pack_fields(fields, lambda k: getattr(doc, k, None), out, kwargs)
+
+
+unpack_from.default_factory("in_docset", lambda: DocSet())
+
+@unpack_from.when(Document.marker_cls)
+@stepwise
+def unpack_document(dispgraph, reader, **kwargs):
+    full = reader.byte()
+    doctype = dispgraph.marker.target_cls
+    uid = doctype.uid_strategy.from_str(reader.str())
+    in_docset = kwargs['in_docset']
+    doc = in_docset.get_or_create(doctype, uid)
+    if full:
+        fields = _packed_fields(dispgraph)
+        attrs = yield iter_unpack_fields(fields, reader, kwargs)
+        doc.load(**attrs)
+        in_docset.reindex(doc)
+    raise Return(doc)
+
+
+# Documents aren't flattened into columns, since that would lose track of
+# which rows are the same document; they're stored as dictified values. The
+# rows share one set of processed docs and one DocSet, so a document that
+# appears in several rows is only written once and decodes to one object.
+encode_columns.register([Document.marker_cls], encode_generic)
+decode_columns.register([Document.marker_cls], decode_generic)
+encode_columns.default_factory("_tv_docs_processed", lambda: set())
+decode_columns.default_factory("in_docset", lambda: DocSet())
@@ -0,0 +1,226 @@
+'''Secondary indexes for DocSets.
+
+An Index maps the values found at some path in a Document type's typegraph to
+the documents containing them. Paths are '/'-separated typegraph keys, so for
+
+>>> import travesty as tv
+>>> from travesty.document import Document, DocSet
+>>> class Post(Document):
+...     field_types = dict(
+...         author=tv.String(),
+...         score=tv.Int(),
+...         tags=tv.List().of(tv.String()),
+...     )
+
+the path 'author' indexes each post by its author, and 'tags/sub' indexes
+each post by every one of its tags:
+
+>>> docset = DocSet(indexes=[(Post, 'author'), (Post, 'tags/sub')])
+>>> p1 = Post(uid=u'p1', author=u'dan', score=3, tags=[u'a', u'b'])
+>>> p2 = Post(uid=u'p2', author=u'ann', score=5, tags=[u'b'])
+>>> docset.add(p1)
+>>> docset.add(p2)
+>>> docset.find(Post, 'author', u'dan') == {p1}
+True
+>>> docset.find(Post, 'tags/sub', u'b') == {p1, p2}
+True
+
+Indexes can also be added after the fact, and support range lookups, which
+return documents ordered by the indexed value. Ranges are half-open, and
+either end may be None:
+
+>>> _ = docset.add_index(Post, 'score')
+>>> docset.find_range(Post, 'score', 3, 5)
+[<Post: p1>]
+>>> docset.find_range(Post, 'score', low=3)
+[<Post: p1>, <Post: p2>]
+
+Indexes are updated whenever a document is added to or loaded into the DocSet,
+and by clone and mutate when they're given in_docset=docset. If you change a
+document's attributes directly, call docset.reindex(doc):
+
+>>> p2.author = u'dan'
+>>> docset.find(Post, 'author', u'dan') == {p1}
+True
+>>> docset.reindex(p2)
+>>> docset.find(Post, 'author', u'dan') == {p1, p2}
+True
+
+None values and unloaded documents are never indexed, though lazily-loaded
+ones (e.g. from a snapshot) are loaded so they can be. Paths may descend into
+other documents, but an index only notices changes to the documents it
+indexes, not to the documents they refer to. Paths must end at a hashable
+value, not at a List or mapping; index 'tags/sub', not 'tags'. Wrappers such as
+Optional and Validated are looked through, but paths can't go into Tuples or
+Polymorphs.
+'''
+from bisect import bisect_left, insort
+
+from travesty import Marker, Wrapper, List, StrMapping, UniMapping
+from travesty import SchemaMapping, ObjectMarker, Polymorph, to_typegraph
+from travesty import make_dispatcher, core_marker
+
+# Markers whose values are unhashable containers
+_CONTAINERS = (List, StrMapping, UniMapping, SchemaMapping)
+# Markers that paths can go into
+_DESCENDABLE = _CONTAINERS + (ObjectMarker,)
+
+path_values = make_dispatcher()
+'''path_values(typegraph, value, path) yields the values in value at path.
+
+The path is a tuple of typegraph keys. Lists and mappings yield a value for
+each of their elements.
+'''
+
+@path_values.when(Marker)
+def leaf_path_values(dispgraph, value, path):
+    if path:
+        raise KeyError(path[0])
+    yield value
+
+@path_values.when(Wrapper)
+def wrapper_path_values(dispgraph, value, path):
+    # None (e.g. for an Optional) is never indexed, so there's nothing inside
+    if value is None:
+        return iter(())
+    return dispgraph.for_marker(core_marker(dispgraph.marker))(value, path)
+
+def _descend(dispgraph, values, path):
+    sub, rest = dispgraph[path[0]], path[1:]
+    for v in values:
+        for result in sub(v, rest):
+            yield result
+
+@path_values.when(SchemaMapping)
+def mapping_path_values(dispgraph, value, path):
+    if not path:
+        return iter([value])
+    return _descend(dispgraph, [value.get(path[0])], path)
+
+@path_values.when(ObjectMarker)
+def object_path_values(dispgraph, value, path):
+    if not path:
+        return iter([value])
+    return _descend(dispgraph, [getattr(value, path[0], None)], path)
+
+@path_values.when(List)
+def list_path_values(dispgraph, value, path):
+    if not path:
+        return iter([value])
+    return _descend(dispgraph, value, path)
+
+@path_values.when(StrMapping)
+def strmap_path_values(dispgraph, value, path):
+    if not path:
+        return iter([value])
+    return _descend(dispgraph, value.values(), path)
+
+@path_values.when(UniMapping)
+def unimap_path_values(dispgraph, value, path):
+    if not path:
+        return iter([value])
+    items = value.keys() if path[0] == 'key' else value.values()
+    return _descend(dispgraph, items, path)
+
+
+def split_path(path):
+    '''Convert a '/'-separated path string into a tuple of keys.'''
+    if isinstance(path, tuple):
+        return path
+    return tuple(key for key in path.split('/') if key)
+
+
+class Index(object):
+    '''An index of documents of one type by the values at one path.'''
+    def __init__(self, doctype, path):
+        self.doctype = doctype
+        self.path = split_path(path)
+        # Fail early on bad paths
+        node = to_typegraph(doctype)
+        for key in self.path:
+            marker = core_marker(node.value)
+            if not isinstance(marker, _DESCENDABLE):
+                self._bad_path('it goes into a', marker)
+            node = node[key]
+        marker = core_marker(node.value)
+        if isinstance(marker, _CONTAINERS + (Polymorph,)):
+            self._bad_path('it ends at a', marker)
+        #: value -> set of documents
+        self.entries = {}
+        #: document -> set of values it's indexed under
+        self.doc_values = {}
+        # Sorted list of the keys of self.entries, built on the first range
+        # lookup and maintained after that.
+        self._sorted = None
+
+    def _bad_path(self, problem, marker):
+        msg = "Can't index {} by {!r}: {} {}".format(self.doctype.__name__,
+            '/'.join(self.path), problem, type(marker).__name__)
+        raise ValueError(msg)
+
+    def values_for(self, doc):
+        '''Return the set of values that doc should be indexed under.'''
+        if not doc.loaded:
+            loader = doc.__dict__.get('_tv_loader')
+            if loader is None:
+                return set()
+            loader(doc)
+        values = path_values(self.doctype, doc, self.path)
+        return set(v for v in values if v is not None)
+
+    def update(self, doc):
+        '''Bring the index up to date with the current contents of doc.'''
+        # Lazily loading doc may reindex it, so look up old values afterwards
+        new = self.values_for(doc)
+        old = self.doc_values.pop(doc, set())
+        for value in old - new:
+            self._remove_entry(value, doc)
+        for value in new - old:
+            self._add_entry(value, doc)
+        if new:
+            self.doc_values[doc] = new
+
+    def remove(self, doc):
+        '''Remove doc from the index.'''
+        for value in self.doc_values.pop(doc, ()):
+            self._remove_entry(value, doc)
+
+    def _add_entry(self, value, doc):
+        docs = self.entries.get(value)
+        if docs is None:
+            docs = self.entries[value] = set()
+            if self._sorted is not None:
+                insort(self._sorted, value)
+        docs.add(doc)
+
+    def _remove_entry(self, value, doc):
+        docs = self.entries[value]
+        docs.discard(doc)
+        if not docs:
+            del self.entries[value]
+            if self._sorted is not None:
+                del self._sorted[bisect_left(self._sorted, value)]
+
+    def find(self, value):
+        '''Return the set of documents indexed under value.'''
+        return set(self.entries.get(value, ()))
+
+    def find_range(self, low=None, high=None):
+        '''Return documents with values v where low <= v < high.
+
+        Either bound can be None to leave that end unbounded. The documents are
+        ordered by value; a document appears only once, at its lowest value in
+        the range.
+        '''
+        if self._sorted is None:
+            self._sorted = sorted(self.entries)
+        keys = self._sorted
+        start = 0 if low is None else bisect_left(keys, low)
+        end = len(keys) if high is None else bisect_left(keys, high)
+        result, seen = [], set()
+        for value in keys[start:end]:
+            for doc in sorted(self.entries[value], key=lambda d: d.uid):
+                if doc not in seen:
+                    seen.add(doc)
+                    result.append(doc)
+        return result
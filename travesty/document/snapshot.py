@@ -0,0 +1,188 @@
+'''Binary snapshots of DocSets.
+
+A snapshot is a single file holding every document in a DocSet, written so
+that it can be reopened without decoding anything up front. The layout is:
+
+    magic (8 bytes) | index offset (u64) | records ... | index
+
+Each record is the compact JSON serialization of one document, produced by
+dictify with traverse_docs disabled below the root, so references to other
+documents are stored as {'uid': ...} stubs. The index at the end of the file
+is a per-type table mapping uids to (offset, length) pairs in the records
+region, with uids stored as strings via each type's uid_strategy; unloaded
+documents are stored with length 0.
+
+Opening a snapshot mmaps the file, reads only the index, and creates an
+unloaded document for every entry. Each of those documents carries a loader
+that decodes its record from the mapped buffer the first time one of its
+fields is accessed (see Document.__getattr__).
+
+Note that lazily-loaded documents are unloaded until they are touched, so
+operations that explicitly skip unloaded documents (e.g. traverse, validate)
+will treat them as unloaded. Accessing any field loads the document; clone
+loads them too, and saving a snapshot copies their records as they are.
+'''
+import importlib
+import json
+import mmap
+import os
+import struct
+
+import vertigo as vg
+
+from travesty import dictify
+
+MAGIC = b'TVSNAP\x00\x01'
+_HEADER = struct.Struct('<8sQ')
+_COUNT = struct.Struct('<I')
+_NAME = struct.Struct('<H')
+_ENTRY = struct.Struct('<QI')
+
+# Only expand the root document; every other document becomes a uid stub.
+_ROOT_ONLY = dict(traverse_docs=vg.from_flat({'': True}))
+
+
+def type_name(cls):
+    '''The name under which documents of type cls are stored.'''
+    return '{}:{}'.format(cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+
+
+def _import_type(name):
+    module, _, qualname = name.partition(':')
+    obj = importlib.import_module(module)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _encode_record(doc):
+    data = dictify(type(doc), doc, extras_graphs=_ROOT_ONLY)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _doc_record(doc):
+    if doc.loaded:
+        return _encode_record(doc)
+    loader = doc.__dict__.get('_tv_loader')
+    if isinstance(loader, _LazyRecord):
+        return loader.record()
+    if loader is not None:
+        loader(doc)
+        return _encode_record(doc)
+    return b''
+
+
+def save_snapshot(docset, path):
+    '''Write every document in docset to a snapshot file at path.
+
+    The snapshot is written to a temporary file that then replaces path, so a
+    DocSet can be saved over the snapshot it was opened from.
+    '''
+    by_type = {}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, 0))
+        offset = _HEADER.size
+        for doctype, docs in docset.documents.items():
+            entries = by_type.setdefault(type_name(doctype), [])
+            to_str = doctype.uid_strategy.to_str
+            for uid, doc in docs.items():
+                record = _doc_record(doc)
+                f.write(record)
+                entries.append((to_str(uid), offset, len(record)))
+                offset += len(record)
+        f.write(_COUNT.pack(len(by_type)))
+        for name, entries in by_type.items():
+            name = name.encode('utf-8')
+            f.write(_NAME.pack(len(name)) + name + _COUNT.pack(len(entries)))
+            for uid, start, length in entries:
+                uid = uid.encode('utf-8')
+                f.write(_NAME.pack(len(uid)) + uid + _ENTRY.pack(start, length))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, offset))
+    _replace(tmp_path, path)
+
+
+# os.replace doesn't exist on python 2, where rename overwrites on posix
+_replace = getattr(os, 'replace', os.rename)
+
+
+class SnapshotReader(object):
+    '''Decodes individual records from a memory-mapped snapshot.
+
+    The reader keeps the mapping open for as long as any lazily-loaded document
+    still refers to it.
+    '''
+    def __init__(self, path, docset):
+        with open(path, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.docset = docset
+        magic, self.index_offset = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not a travesty snapshot".format(path))
+
+    def iter_index(self):
+        '''Yield (type_name, uid, offset, length) for every indexed document.'''
+        buf, pos = self.buf, self.index_offset
+        (ntypes,) = _COUNT.unpack_from(buf, pos)
+        pos += _COUNT.size
+        for _ in range(ntypes):
+            (n,) = _NAME.unpack_from(buf, pos)
+            pos += _NAME.size
+            name = buf[pos:pos+n].decode('utf-8')
+            pos += n
+            (count,) = _COUNT.unpack_from(buf, pos)
+            pos += _COUNT.size
+            for _ in range(count):
+                (n,) = _NAME.unpack_from(buf, pos)
+                pos += _NAME.size
+                uid = buf[pos:pos+n].decode('utf-8')
+                pos += n
+                start, length = _ENTRY.unpack_from(buf, pos)
+                pos += _ENTRY.size
+                yield name, uid, start, length
+
+    def record(self, start, length):
+        '''Return the encoded record at start as bytes.'''
+        return self.buf[start:start+length]
+
+    def load(self, start, length, doc):
+        '''Populate the unloaded document doc from its record.'''
+        doc.__dict__.pop('_tv_loader', None)
+        data = json.loads(self.record(start, length).decode('utf-8'))
+        self.docset.load(type(doc), data)
+
+
+class _LazyRecord(object):
+    '''The loader for a document in a snapshot.'''
+    __slots__ = ('reader', 'start', 'length')
+
+    def __init__(self, reader, start, length):
+        self.reader = reader
+        self.start = start
+        self.length = length
+
+    def __call__(self, doc):
+        self.reader.load(self.start, self.length, doc)
+
+    def record(self):
+        return self.reader.record(self.start, self.length)
+
+
+def open_snapshot(path, docset, types=()):
+    '''Add lazily-loaded documents from the snapshot at path to docset.
+
+    Types are resolved by importing their stored module and qualified name;
+    pass the document classes as types to resolve classes that can't be
+    imported that way (e.g. ones defined inside a function).
+    '''
+    reader = SnapshotReader(path, docset)
+    known = {type_name(t): t for t in types}
+    for name, uid, start, length in reader.iter_index():
+        if name not in known:
+            known[name] = _import_type(name)
+        doctype = known[name]
+        doc = docset.create(doctype, doctype.uid_strategy.from_str(uid))
+        if length:
+            doc._tv_loader = _LazyRecord(reader, start, length)
+    return docset
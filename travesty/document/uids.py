@@ -0,0 +1,191 @@
+'''Uid strategies for Documents.
+
+Every Document class has a uid_strategy, which determines how new uids are
+generated and how uids are converted to and from the strings used when
+dictifying. The default, StrUuids, gives every document a random uuid string,
+but a class can choose a more compact representation:
+
+>>> from travesty import String, dictify, undictify
+>>> from travesty.document import Document, DocSet
+>>> class Event(Document):
+...     uid_strategy = SequentialUids(start=100)
+...     field_types = dict(name=String())
+>>> e = Event(name=u'launch')
+>>> e.uid
+100
+>>> Event.uid_strategy.bulk(3)
+[101, 102, 103]
+
+Dictify still emits string uids, and undictify converts them back:
+
+>>> dictify(Event, e) == {'uid': '100', 'name': 'launch'}
+True
+>>> undictify(Event, {'uid': '7', 'name': u'x'}).uid
+7
+
+All strategies pre-generate uids in batches where that's cheaper than
+generating them one at a time; bulk(n) generates n uids at once.
+'''
+import binascii
+import itertools
+import numbers
+import os
+import sys
+import threading
+import time
+import uuid
+
+from travesty import TypedLeaf
+
+if sys.version >= '3': # pragma: no cover
+    unicode = str
+    basestring = str
+
+Uid = TypedLeaf.subclass(types=(basestring, numbers.Integral),
+    __class_name="Uid")
+'''Marker for document uids, which can be strings or integers.'''
+
+
+class UidStrategy(object):
+    '''Base class for uid strategies.
+
+    Subclasses must implement new(); they may override bulk(), to_str() and
+    from_str().
+    '''
+    def new(self):
+        '''Generate a new uid.'''
+        raise NotImplementedError()
+
+    def bulk(self, n):
+        '''Generate a list of n new uids.'''
+        return [self.new() for _ in range(n)]
+
+    def to_str(self, uid):
+        '''Convert a uid to its serialized string.'''
+        return unicode(uid)
+
+    def from_str(self, s):
+        '''Convert a serialized string back to a uid.'''
+        return s
+
+
+class _PooledUids(UidStrategy):
+    '''Strategy that hands out uids from a pre-generated pool.
+
+    Subclasses implement bulk(); new() pops uids from a pool that is refilled
+    pool_size at a time. The pool is discarded in a forked child, so parent
+    and child never hand out the same uids.
+    '''
+    pool_size = 256
+
+    def __init__(self, pool_size=None):
+        if pool_size is not None:
+            self.pool_size = pool_size
+        self._pool = []
+        self._pid = os.getpid()
+
+    def new(self):
+        if self._pid != os.getpid():
+            self._pool = []
+            self._pid = os.getpid()
+        try:
+            return self._pool.pop()
+        except IndexError:
+            self._pool = self.bulk(self.pool_size)
+            return self._pool.pop()
+
+
+def _random_uuid_ints(n):
+    '''Generate n random version 4 uuids as ints, with one call to urandom.'''
+    data = binascii.hexlify(os.urandom(16 * n))
+    result = []
+    for i in range(0, 32 * n, 32):
+        value = int(data[i:i+32], 16)
+        # Set the variant to RFC 4122 and the version to 4, as uuid4() does
+        value &= ~(0xc000 << 48)
+        value |= 0x8000 << 48
+        value &= ~(0xf000 << 64)
+        value |= 4 << 76
+        result.append(value)
+    return result
+
+
+class StrUuids(_PooledUids):
+    '''Random uuid4 strings, e.g. u'0b6d4c8e-...'. This is the default.'''
+    def bulk(self, n):
+        return [unicode(uuid.UUID(int=v)) for v in _random_uuid_ints(n)]
+
+
+class IntUuids(_PooledUids):
+    '''Random uuid4s stored as 128-bit ints, serialized as uuid strings.'''
+    def bulk(self, n):
+        return _random_uuid_ints(n)
+
+    def to_str(self, uid):
+        return unicode(uuid.UUID(int=uid))
+
+    def from_str(self, s):
+        return uuid.UUID(s).int
+
+
+class SequentialUids(UidStrategy):
+    '''Sequential integer uids, starting from start.
+
+    Note that these are only unique within a single process.
+    '''
+    def __init__(self, start=1):
+        self._counter = itertools.count(start)
+
+    def new(self):
+        return next(self._counter)
+
+    def bulk(self, n):
+        return list(itertools.islice(self._counter, n))
+
+    def from_str(self, s):
+        return int(s)
+
+
+class SnowflakeUids(UidStrategy):
+    '''Time-ordered 63-bit integer uids.
+
+    Each uid packs 41 bits of milliseconds since epoch (a unix timestamp), 10
+    bits of worker id and 12 bits of sequence number, so uids are unique across
+    up to 1024 workers as long as each has a distinct worker id.
+    '''
+    def __init__(self, worker=0, epoch=1420070400):
+        if not 0 <= worker < 1024:
+            raise ValueError("worker must be in [0, 1024), got {}".format(worker))
+        self.worker = worker
+        self.epoch_ms = int(epoch * 1000)
+        self._lock = threading.Lock()
+        self._last = -1
+        self._seq = 0
+
+    def _now(self):
+        return int(time.time() * 1000) - self.epoch_ms
+
+    def _next(self):
+        now = self._now()
+        if now <= self._last:
+            now = self._last
+            self._seq = (self._seq + 1) & 0xfff
+            if self._seq == 0:
+                # Sequence exhausted for this millisecond; wait for the next.
+                while now <= self._last:
+                    now = self._now()
+        else:
+            self._seq = 0
+        self._last = now
+        return (now << 22) | (self.worker << 12) | self._seq
+
+    def new(self):
+        with self._lock:
+            return self._next()
+
+    def bulk(self, n):
+        with self._lock:
+            return [self._next() for _ in range(n)]
+
+    def from_str(self, s):
+        return int(s)
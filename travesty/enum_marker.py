@@ -0,0 +1,111 @@
+'''
+Enum: a marker for values from a fixed set of options.
+
+>>> Currency = Enum(['EUR', 'GBP', 'JPY', 'USD'])
+>>> validate(Currency, 'GBP')
+>>> validate(Currency, 'XYZ')
+Traceback (most recent call last):
+...
+Invalid: invalid_choice
+
+Unlike OneOf, which checks options with a linear scan, Enum keeps its options in
+a frozenset, so checking a value takes the same time however many options there
+are. The options must therefore be hashable; unhashable values are never valid:
+
+>>> validate(Currency, ['GBP'])
+Traceback (most recent call last):
+...
+Invalid: invalid_choice
+
+By default, dictify and undictify pass values through, although undictify
+checks that they're valid options:
+
+>>> dictify(Currency, 'USD')
+'USD'
+>>> undictify(Currency, 'USD')
+'USD'
+>>> undictify(Currency, 'usd')
+Traceback (most recent call last):
+...
+Invalid: invalid_choice
+
+With as_index=True, values are instead dictified to their index in the list of
+options, and undictified back through that list:
+
+>>> CurrencyCode = Enum(['EUR', 'GBP', 'JPY', 'USD'], as_index=True)
+>>> dictify(CurrencyCode, 'USD')
+3
+>>> undictify(CurrencyCode, 3)
+'USD'
+>>> undictify(CurrencyCode, 4)
+Traceback (most recent call last):
+...
+Invalid: invalid_choice
+
+The indices change if the options are reordered, so only append new options to
+the end of the list if you've stored dictified data.
+
+to_columns dictionary-encodes Enums by index, and pack writes them as varint
+indices.
+'''
+import numbers
+
+from .base import Leaf, dictify, undictify, validate
+from .invalid import Invalid
+
+
+class Enum(Leaf):
+    '''Marker for values from a fixed list of options.
+
+    See the module docstring.
+    '''
+    def __init__(self, options, as_index=False):
+        self.options = tuple(options)
+        self.option_set = frozenset(self.options)
+        if len(self.option_set) != len(self.options):
+            raise ValueError("Enum options must be distinct")
+        self.indices = dict((o, i) for i, o in enumerate(self.options))
+        self.as_index = as_index
+
+    def __contains__(self, value):
+        try:
+            return value in self.option_set
+        except TypeError:
+            return False
+
+    def index(self, value):
+        '''Get the index of value, raising Invalid if it's not an option.'''
+        try:
+            return self.indices[value]
+        except (KeyError, TypeError):
+            raise Invalid("invalid_choice")
+
+    def option(self, index):
+        '''Get the option at index, raising Invalid if there's none.'''
+        if not isinstance(index, numbers.Integral) or isinstance(index, bool):
+            raise Invalid("type_error", "Expected an int, got {}".format(type(index)))
+        if not 0 <= index < len(self.options):
+            raise Invalid("invalid_choice")
+        return self.options[index]
+
+
+@validate.when(Enum)
+def validate_enum(dispgraph, value, **kwargs):
+    if value not in dispgraph.marker:
+        raise Invalid("invalid_choice")
+
+@dictify.when(Enum)
+def dictify_enum(dispgraph, value, **kwargs):
+    marker = dispgraph.marker
+    if marker.as_index:
+        return marker.index(value)
+    return value
+
+@undictify.when(Enum)
+def undictify_enum(dispgraph, value, **kwargs):
+    marker = dispgraph.marker
+    if marker.as_index:
+        return marker.option(value)
+    if value not in marker:
+        raise Invalid("invalid_choice")
+    return value
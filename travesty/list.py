@@ -1,7 +1,8 @@
 import vertigo as vg
 
-from .base import Marker, graphize, traverse, clone, mutate
-from .base import to_typegraph, aggregating_errors, IGNORE
+from .base import Marker, graphize, traverse, clone, mutate, stepwise
+from .base import to_typegraph, aggregating_errors, IGNORE, structural
+from .cantrips.trampoline import Return, run
 from .invalid import Invalid
 
 class List(Marker):
@@ -54,43 +55,88 @@ def apply_list(dispgraph, value, kw):
     This also handles error checking - if agg is not None, this will typecheck
     value and recurse to each element within agg.checking_sub().
     '''
+    return run(iter_list(dispgraph, value, kw))
+
+
+def iter_list(dispgraph, value, kw):
+    '''Stepwise version of apply_list, for use in @stepwise functions.'''
     error_mode = kw.get('error_mode', IGNORE)
+    sub = dispgraph['sub']
+    # If the function for the items has a .batch, it can handle the whole list
+    # in one call.
+    batch = getattr(sub._get_fn(), 'batch', None)
     if error_mode == IGNORE:
-        return [dispgraph['sub'](v, **kw) for v in value]
+        if batch is not None:
+            raise Return(batch(sub, value, **kw))
+        result = []
+        for v in value:
+            result.append((yield sub.defer(v, **kw)))
+        raise Return(result)
+    result = None
     with aggregating_errors(error_mode) as agg:
         if not isinstance(value, (list, tuple)):
             msg = "Expected list, got {}".format(type(value).__name__)
             raise Invalid("type_error", msg, fatal=True)
-        result = []
-        for i, v in enumerate(value):
-            with agg.checking_sub(str(i)):
-                result.append(dispgraph['sub'](v, **kw))
-        return result
+        if batch is not None:
+            try:
+                result = batch(sub, value, **kw)
+            except Invalid:
+                # Go item by item to find out which items were bad
+                pass
+        if result is None:
+            result = []
+            for i, v in enumerate(value):
+                with agg.checking_sub(str(i)):
+                    result.append((yield sub.defer(v, **kw)))
+    raise Return(result)
 
 
 @graphize.when(List)
+@stepwise
 def graphize_list(dispgraph, value, **kw):
-    edges = apply_list(dispgraph, value, kw)
+    edges = yield iter_list(dispgraph, value, kw)
     edges = ((str(i), v) for (i,v) in enumerate(edges))
     if 'zipval' in dispgraph.extras:
         value = (value, dispgraph.extras.zipval)
-    return vg.PlainGraphNode(value, edges)
+    raise Return(vg.PlainGraphNode(value, edges))
 
 
 @traverse.when(List)
+@structural
+@stepwise
 def traverse_list(dispgraph, value, **kw):
-    apply_list(dispgraph, value, kw)
+    yield iter_list(dispgraph, value, kw)
 
 
 @mutate.when(List)
+@structural
+@stepwise
 def mutate_list(dispgraph, value, **kw):
-    value[:] = apply_list(dispgraph, value, kw)
-    return value
+    value[:] = yield iter_list(dispgraph, value, kw)
+    raise Return(value)
 
 
 @clone.when(List)
+@stepwise
 def clone_list(dispgraph, value, **kw):
-    return apply_list(dispgraph, value, kw)
+    raise Return((yield iter_list(dispgraph, value, kw)))
+
+def _list_unchanged(node, marker, value, keys):
+    if not isinstance(value, list):
+        return None
+    if 'sub' not in keys:
+        return ()
+    return (('sub', v) for v in value)
+clone_list.unchanged = _list_unchanged
+
+def _list_items(node, marker, value, keys):
+    # mutate_list only changes a list if its items change
+    if 'sub' not in keys:
+        return ()
+    if not isinstance(value, list):
+        return None
+    return (('sub', v) for v in value)
+mutate_list.structural = _list_items
 
 
 if __name__ == '__main__': # pragma: no cover
@@ -6,9 +6,11 @@ if sys.version >= '3': # pragma: no cover
 import vertigo as vg
 
 from .invalid import Invalid
-from .base import graphize, traverse, clone, mutate, validate
+from .base import graphize, traverse, clone, mutate, validate, stepwise
 from .base import Marker, IGNORE, to_typegraph, aggregating_errors
-from .schema import Schema
+from .base import structural
+from .cantrips.trampoline import Return, run
+from .schema import Schema, _has_fields
 
 class SchemaMapping(Schema):
     '''Marker for structured dicts.
@@ -96,11 +98,12 @@ class SchemaMapping(Schema):
 
 
 @validate.when(SchemaMapping)
+@stepwise
 def validate_mapping(dispgraph, value, **kw):
     error_mode = kw.get('error_mode', IGNORE)
     marker = dispgraph.marker
     with aggregating_errors(error_mode) as agg:
-        dispgraph.super(SchemaMapping)(value, **kw)
+        yield dispgraph.super(SchemaMapping).defer(value, **kw)
         if agg and marker.extra_field_policy in ['discard', 'error']:
             extra_keys = set(value.keys()) - set(dispgraph.key_iter())
             if extra_keys:
@@ -108,11 +111,12 @@ def validate_mapping(dispgraph, value, **kw):
 
 
 @clone.when(SchemaMapping)
+@stepwise
 def clone_mapping(dispgraph, value, **kw):
     error_mode = kw.get('error_mode', IGNORE)
     marker = dispgraph.marker
     with aggregating_errors(error_mode) as agg:
-        result = dispgraph.super(SchemaMapping)(value, **kw)
+        result = yield dispgraph.super(SchemaMapping).defer(value, **kw)
         extra_keys = set(value.keys()) - set(dispgraph.key_iter())
         if extra_keys:
             if agg and marker.extra_field_policy == 'error':
@@ -120,14 +124,29 @@ def clone_mapping(dispgraph, value, **kw):
             if marker.extra_field_policy == 'save':
                 for key in extra_keys:
                     result[key] = value[key]
-    return result
+    raise Return(result)
+
+
+def _mapping_unchanged(node, marker, value, keys):
+    if not isinstance(value, dict):
+        return None
+    fields = list(node.key_iter())
+    if any(key not in value for key in fields):
+        return None
+    if marker.extra_field_policy != 'save' and len(value) != len(fields):
+        return None
+    return ((key, value[key]) for key in keys)
+clone_mapping.unchanged = _mapping_unchanged
 
 
 @mutate.when(SchemaMapping)
+@structural
+@stepwise
 def mutate_mapping(dispgraph, value, **kw):
-    newval = clone_mapping(dispgraph, value, **kw)
+    newval = yield clone_mapping(dispgraph, value, **kw)
     value.update(newval)
-    return value
+    raise Return(value)
+mutate_mapping.structural = _has_fields
 
 
 class StrMapping(Marker):
@@ -199,10 +218,18 @@ def apply_strmap(dispgraph, value, kw):
     This also handles error checking - if agg is not None, this will typecheck
     value and recurse to each element within agg.checking_sub().
     '''
+    return run(iter_strmap(dispgraph, value, kw))
+
+
+def iter_strmap(dispgraph, value, kw):
+    '''Stepwise version of apply_strmap, for use in @stepwise functions.'''
     error_mode = kw.get('error_mode', IGNORE)
-    vfn = lambda x: dispgraph['sub'](x, **kw)
+    sub = dispgraph['sub']
     if error_mode == IGNORE:
-        return {key:vfn(val) for (key, val) in value.items()}
+        result = {}
+        for (key, val) in value.items():
+            result[key] = yield sub.defer(val, **kw)
+        raise Return(result)
     if not isinstance(value, dict):
         msg = "Expected dict, got {}".format(type(value))
         raise Invalid("type_error", msg, fatal=True)
@@ -214,34 +241,56 @@ def apply_strmap(dispgraph, value, kw):
                 bad_keys.append(key)
                 continue
             with agg.checking_sub(key):
-                result[key] = vfn(val)
+                result[key] = yield sub.defer(val, **kw)
         if bad_keys:
             raise Invalid("value_error/bad_keys", "Bad keys", keys=bad_keys)
-    return result
+    raise Return(result)
 
 
 @graphize.when(StrMapping)
+@stepwise
 def graphize_strmap(dispgraph, value, **kw):
-    edges = apply_strmap(dispgraph, value, kw).items()
+    edges = (yield iter_strmap(dispgraph, value, kw)).items()
     if 'zipval' in dispgraph.extras:
         value = (value, dispgraph.extras.zipval)
-    return vg.PlainGraphNode(value, edges)
+    raise Return(vg.PlainGraphNode(value, edges))
 
 
 @clone.when(StrMapping)
+@stepwise
 def clone_strmap(dispgraph, value, **kw):
-    return apply_strmap(dispgraph, value, kw)
+    raise Return((yield iter_strmap(dispgraph, value, kw)))
+
+def _strmap_unchanged(node, marker, value, keys):
+    if not isinstance(value, dict):
+        return None
+    if 'sub' not in keys:
+        return ()
+    return (('sub', v) for v in value.values())
+clone_strmap.unchanged = _strmap_unchanged
 
 
 @mutate.when(StrMapping)
+@structural
+@stepwise
 def mutate_strmap(dispgraph, value, **kw):
-    value.update(apply_strmap(dispgraph, value, kw))
-    return value
+    value.update((yield iter_strmap(dispgraph, value, kw)))
+    raise Return(value)
+
+def _strmap_items(node, marker, value, keys):
+    if 'sub' not in keys:
+        return ()
+    if not isinstance(value, dict):
+        return None
+    return (('sub', v) for v in value.values())
+mutate_strmap.structural = _strmap_items
 
 
 @traverse.when(StrMapping)
+@structural
+@stepwise
 def traverse_strmap(dispgraph, value, **kw):
-    apply_strmap(dispgraph, value, kw)
+    yield iter_strmap(dispgraph, value, kw)
 
 
 class UniMapping(Marker):
@@ -333,52 +382,77 @@ def apply_unimap(dispgraph, value, kw):
     This also handles error checking - if agg is not None, this will typecheck
     value and recurse to each element within agg.checking_sub().
     '''
+    return run(iter_unimap(dispgraph, value, kw))
+
+
+def iter_unimap(dispgraph, value, kw):
+    '''Stepwise version of apply_unimap, for use in @stepwise functions.'''
     error_mode = kw.get('error_mode', IGNORE)
-    kfn = lambda x: dispgraph['key'](x, **kw)
-    vfn = lambda x: dispgraph['val'](x, **kw)
+    kfn = lambda x: dispgraph['key'].defer(x, **kw)
+    vfn = lambda x: dispgraph['val'].defer(x, **kw)
     result = OrderedDict()
     if error_mode == IGNORE:
         for (key, val) in value.items():
-            result[kfn(key)] = vfn(val)
-        return result
+            key = yield kfn(key)
+            result[key] = yield vfn(val)
+        raise Return(result)
     if not isinstance(value, dict):
         msg = "Expected dict, got {}".format(type(value))
         raise Invalid("type_error", msg, fatal=True)
     with aggregating_errors(error_mode) as agg:
         for i, (key, val) in enumerate(value.items()):
             with agg.checking_sub('key_{}'.format(i)):
-                key = kfn(key)
+                key = yield kfn(key)
             with agg.checking_sub('value_{}'.format(i)):
-                val = vfn(val)
+                val = yield vfn(val)
             result[key] = val
-    return result
+    raise Return(result)
 
 @graphize.when(UniMapping)
+@stepwise
 def graphize_unimap(dispgraph, value, **kw):
-    result = apply_unimap(dispgraph, value, kw)
+    result = yield iter_unimap(dispgraph, value, kw)
     edges = []
     for i, (key, val) in enumerate(result.items()):
         edges.append(('key_{}'.format(i), key))
         edges.append(('value_{}'.format(i), val))
     if 'zipval' in dispgraph.extras:
         value = (value, dispgraph.extras.zipval)
-    return vg.PlainGraphNode(value, edges)
+    raise Return(vg.PlainGraphNode(value, edges))
 
 
 @clone.when(UniMapping)
+@stepwise
 def clone_unimap(dispgraph, value, **kw):
-    return apply_unimap(dispgraph, value, kw)
+    raise Return((yield iter_unimap(dispgraph, value, kw)))
 
 
 @mutate.when(UniMapping)
+@structural
+@stepwise
 def mutate_unimap(dispgraph, value, **kw):
-    new_values = apply_unimap(dispgraph, value, kw)
+    new_values = yield iter_unimap(dispgraph, value, kw)
     # Clear in case the keys were mutated
     value.clear()
     value.update(new_values)
-    return value
+    raise Return(value)
+
+def _unimap_items(node, marker, value, keys):
+    if not keys:
+        return ()
+    if not isinstance(value, dict):
+        return None
+    pairs = []
+    if 'key' in keys:
+        pairs.extend(('key', k) for k in value)
+    if 'val' in keys:
+        pairs.extend(('val', v) for v in value.values())
+    return pairs
+mutate_unimap.structural = _unimap_items
 
 
 @traverse.when(UniMapping)
+@structural
+@stepwise
 def traverse_unimap(dispgraph, value, **kw):
-    apply_unimap(dispgraph, value, kw)
+    yield iter_unimap(dispgraph, value, kw)
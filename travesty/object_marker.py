@@ -1,11 +1,13 @@
 import vertigo as vg
 
-from .cantrips.empty_instance import create_instance
+from .cantrips.empty_instance import create_instance, empty_instance
 
 from .base import graphize, validate, dictify, undictify, to_typegraph, traverse
-from .base import clone, mutate, aggregating_errors, IGNORE
+from .base import clone, mutate, aggregating_errors, IGNORE, stepwise
+from .base import structural
+from .cantrips.trampoline import Return, run
 from .invalid import Invalid
-from .schema import Schema, apply_schema
+from .schema import Schema, iter_schema
 
 class ObjectMarker(Schema):
     '''Marker for objects that can be assembled by field.
@@ -91,6 +93,16 @@ class ObjectMarker(Schema):
         children = {key:to_typegraph(val) for key, val in kw.items()}
         return vg.PlainGraphNode(self, **children)
 
+    def __reduce_ex__(self, protocol):
+        # Marker classes generated by SchemaObj aren't module attributes, so
+        # pickle them via the class they're attached to.
+        if getattr(self.target_cls, 'marker_cls', None) is type(self):
+            return (_attached_marker, (self.target_cls,), self.__dict__)
+        return super(ObjectMarker, self).__reduce_ex__(protocol)
+
+def _attached_marker(target_cls):
+    return empty_instance(target_cls.marker_cls)
+
 def _as_dict(dispgraph, value, default_nones=False):
     result = {}
     for attr in dispgraph.key_iter():
@@ -105,41 +117,60 @@ def _as_dict(dispgraph, value, default_nones=False):
 
 
 def extract_obj(dispgraph, obj, kw, default_nones=False):
+    return run(iter_extract_obj(dispgraph, obj, kw, default_nones))
+
+
+def iter_extract_obj(dispgraph, obj, kw, default_nones=False):
+    '''Stepwise version of extract_obj, for use in @stepwise functions.'''
     d = _as_dict(dispgraph, obj, default_nones)
-    return apply_schema(dispgraph, d, kw, default_nones)
+    return iter_schema(dispgraph, d, kw, default_nones)
 
 
 @graphize.when(ObjectMarker)
+@stepwise
 def graphize_obj(dispgraph, value, **kw):
     d = _as_dict(dispgraph, value)
-    g = dispgraph.super(ObjectMarker)(d, **kw)
+    g = yield dispgraph.super(ObjectMarker).defer(d, **kw)
     g.value = value
     if 'zipval' in dispgraph.extras:
         g.value = (g.value, dispgraph.extras.zipval)
-    return g
+    raise Return(g)
 
 
 
 @mutate.when(ObjectMarker)
+@structural
+@stepwise
 def mutate_obj(dispgraph, value, **kw):
-    newvals = extract_obj(dispgraph, value, kw)
+    newvals = yield iter_extract_obj(dispgraph, value, kw)
     for k, v in newvals.items():
         setattr(value, k, v)
-    return value
+    raise Return(value)
+
+def _has_attrs(node, marker, value, keys):
+    # As for schemas, only objects with all their attributes can be skipped
+    if any(not hasattr(value, key) for key in node.key_iter()):
+        return None
+    return ((key, getattr(value, key)) for key in keys)
+mutate_obj.structural = _has_attrs
 
 
 @clone.when(ObjectMarker)
+@stepwise
 def clone_obj(dispgraph, value, **kw):
-    newvals = extract_obj(dispgraph, value, kw)
-    return dispgraph.marker.construct(newvals, **kw)
+    newvals = yield iter_extract_obj(dispgraph, value, kw)
+    raise Return(dispgraph.marker.construct(newvals, **kw))
 
 
 @traverse.when(ObjectMarker)
+@structural
+@stepwise
 def traverse_obj(dispgraph, value, **kw):
-    extract_obj(dispgraph, value, kw, default_nones=False)
+    yield iter_extract_obj(dispgraph, value, kw, default_nones=False)
 
 
 @validate.when(ObjectMarker)
+@stepwise
 def validate_obj(dispgraph, value, **kw):
     if kw.get('error_mode', IGNORE) != IGNORE:
         marker = dispgraph.marker
@@ -148,22 +179,24 @@ def validate_obj(dispgraph, value, **kw):
             expected = marker.target_cls.__name__
             msg = "Expected {}, got {}".format(expected, name)
             raise Invalid("type_error", msg, fatal=True)
-    return dispgraph.parent(validate)(value, **kw)
+    raise Return((yield dispgraph.parent(validate).defer(value, **kw)))
 
 
 @dictify.when(ObjectMarker)
+@stepwise
 def dictify_obj(dispgraph, value, **kw):
-    return extract_obj(dispgraph, value, kw, default_nones=True)
+    raise Return((yield iter_extract_obj(dispgraph, value, kw, True)))
 
 
 @undictify.when(ObjectMarker)
+@stepwise
 def undictify_obj(dispgraph, value, **kw):
     marker = dispgraph.marker
     with aggregating_errors(kw.get('error_mode', IGNORE)) as agg:
-        result = dispgraph.super(ObjectMarker)(value, **kw)
+        result = yield dispgraph.super(ObjectMarker).defer(value, **kw)
         if agg:
             extra_keys = set(value.keys()) - set(dispgraph.key_iter())
             if extra_keys:
                 raise Invalid('unexpected_fields', keys=extra_keys)
-    return marker.construct(result, **kw)
+    raise Return(marker.construct(result, **kw))
 
@@ -1,6 +1,7 @@
 import vertigo as vg
 
-from . import Wrapper, graphize, clone, traverse
+from . import Wrapper, graphize, clone, traverse, stepwise, structural
+from .cantrips.trampoline import Return
 
 class Optional(Wrapper):
     '''Wrapper that indicates the value could be None.
@@ -28,26 +29,34 @@ class Optional(Wrapper):
     pass
 
 @graphize.when(Optional)
+@stepwise
 def graphize_optional(dispgraph, value, **kw):
     if value is None:
         if 'zipval' in dispgraph.extras:
-            return vg.PlainGraphNode((None, dispgraph.extras.zipval))
-        return vg.PlainGraphNode(None)
+            raise Return(vg.PlainGraphNode((None, dispgraph.extras.zipval)))
+        raise Return(vg.PlainGraphNode(None))
     opt = dispgraph.marker
-    return dispgraph.for_marker(opt.marker)(value, **kw)
+    raise Return((yield dispgraph.for_marker(opt.marker).defer(value, **kw)))
 
 
 @clone.when(Optional)
+@structural
+@stepwise
 def clone_optional(dispgraph, value, **kw):
     if value is None:
-        return None
+        raise Return(None)
     opt = dispgraph.marker
-    return dispgraph.for_marker(opt.marker)(value, **kw)
+    raise Return((yield dispgraph.for_marker(opt.marker).defer(value, **kw)))
+clone_optional.unchanged = lambda node, marker, value, keys: (
+    () if value is None else [(None, value)])
+clone_optional.structural = clone_optional.unchanged
 
 
 @traverse.when(Optional)
+@structural
+@stepwise
 def traverse_optional(dispgraph, value, **kw):
     if value is None:
         return
     opt = dispgraph.marker
-    dispgraph.for_marker(opt.marker)(value, **kw)
+    yield dispgraph.for_marker(opt.marker).defer(value, **kw)
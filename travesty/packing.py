@@ -0,0 +1,667 @@
+'''packing.py: a compact, schema-driven binary encoding.
+
+pack(typegraph, value) encodes value as bytes using its typegraph to decide the
+layout, so unlike dictify's output, the result contains no field names and no
+type information - just the values, positionally:
+
+>>> import travesty as tv
+>>> schema = tv.SchemaMapping().of(
+...     name=tv.String(),
+...     scores=tv.List().of(tv.Int()),
+...     note=tv.Optional.wrap(tv.String()),
+... )
+>>> value = dict(name=u'Ann', scores=[3, -5, 300], note=None)
+>>> data = pack(schema, value)
+>>> len(data)
+22
+>>> unpack(schema, data) == value
+True
+
+The encodings are:
+
+  - Ints are zigzag varints, Booleans a single byte, Numbers a tag byte plus
+    either a varint or an 8-byte double, and Complexes a pair of doubles.
+  - Strings and Bytes are a varint length followed by the (utf-8) bytes.
+  - DateTimes, Dates and TimeDeltas are varints, as with epoch_dictify; Times
+    are ISO strings.
+  - Enums are the uvarint index of their value in the options.
+  - Schema fields are written in sorted key order. Each schema starts with a
+    bitmap of which of its Optional fields are present, and fields that are
+    None take up no further space. Optionals anywhere else get a flag byte.
+    SchemaMappings with extra_field_policy='save' end with a dict of their
+    extra fields, in the self-describing encoding below.
+  - Lists and mappings are a varint count followed by their items.
+  - Polymorph values are prefixed by the index of their type's name.
+  - Any other leaf gets a self-describing encoding that supports the JSON
+    types plus bytes.
+
+Every packed value starts with a 4-byte magic number and an 8-byte fingerprint
+of the typegraph, so data can't be unpacked with the wrong schema:
+
+>>> other = tv.SchemaMapping().of(name=tv.String(), scores=tv.List().of(tv.Number()))
+>>> unpack(other, data)
+Traceback (most recent call last):
+    ...
+Invalid: schema_mismatch
+
+Truncated or corrupt data gives a bad_data error:
+
+>>> unpack(schema, data[:-3])
+Traceback (most recent call last):
+    ...
+Invalid: bad_data
+
+and values that can't be packed give a type_error (pack doesn't validate, so
+this only covers values it can't encode at all):
+
+>>> pack(schema, dict(value, name=None))
+Traceback (most recent call last):
+    ...
+Invalid: type_error
+
+Documents are packed in full the first time they're encountered, and as
+references by uid after that (or if they're unloaded). As with undictify,
+unpack takes an in_docset argument for the DocSet to load documents into.
+'''
+import hashlib
+import json
+import numbers
+import struct
+import sys
+import weakref
+
+from .base import Leaf, Wrapper, make_dispatcher, stepwise
+from .base import to_typegraph
+from .cantrips.trampoline import Return
+from .datetypes import DateTime, Date, Time, TimeDelta, _EPOCH, _micros, _parse
+from .enum_marker import Enum
+from .invalid import Invalid
+from .list import List
+from .mapping import SchemaMapping, StrMapping, UniMapping
+from .object_marker import ObjectMarker
+from .optional import Optional
+from .polymorph import Polymorph
+from .schema import Schema
+from .tuple import Tuple, NamedTuple
+from .typed_leaf import Boolean, String, Bytes, Int, Number, Complex
+
+import datetime
+
+if sys.version >= '3': # pragma: no cover
+    unicode = str
+    basestring = str
+    bytes_type = bytes
+else: # pragma: no cover
+    bytes_type = str
+
+MAGIC = b'TVPK'
+_DOUBLE = struct.Struct('<d')
+_COMPLEX = struct.Struct('<dd')
+
+
+#  ============
+#  = Encoding =
+#  ============
+
+def write_uvarint(out, n):
+    '''Append the unsigned varint encoding of n to the bytearray out.'''
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def write_varint(out, n):
+    '''Append the zigzag varint encoding of the integer n to out.'''
+    write_uvarint(out, n << 1 if n >= 0 else ((-n) << 1) - 1)
+
+def write_bytes(out, b):
+    write_uvarint(out, len(b))
+    out += b
+
+def write_str(out, s):
+    write_bytes(out, s.encode('utf-8'))
+
+
+class Reader(object):
+    '''Reads the encodings above from a buffer, without copying it.'''
+    def __init__(self, data, pos=0):
+        if sys.version >= '3': # pragma: no cover
+            self.buf = memoryview(data)
+        else: # pragma: no cover
+            self.buf = bytearray(data)
+        self.pos = pos
+
+    def byte(self):
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+    def read(self, n):
+        start, self.pos = self.pos, self.pos + n
+        if self.pos > len(self.buf):
+            raise IndexError("read past the end of the data")
+        return self.buf[start:self.pos]
+
+    def uvarint(self):
+        result, shift = 0, 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7f) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def varint(self):
+        z = self.uvarint()
+        return -((z + 1) >> 1) if z & 1 else z >> 1
+
+    def bytes(self):
+        return bytes_type(self.read(self.uvarint()))
+
+    def str(self):
+        return self.bytes().decode('utf-8')
+
+    def double(self):
+        return _DOUBLE.unpack(self.read(_DOUBLE.size))[0]
+
+
+# Self-describing encoding for leaves of unknown type
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT = b'NTFIDSBLM'
+if sys.version < '3': # pragma: no cover
+    _NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _BYTES, _LIST, _DICT = [
+        ord(c) for c in b'NTFIDSBLM']
+
+def write_any(out, value):
+    '''Write value with the self-describing encoding.'''
+    if value is None:
+        out.append(_NONE)
+    elif value is True or value is False:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, numbers.Integral):
+        out.append(_INT)
+        write_varint(out, value)
+    elif isinstance(value, numbers.Real):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, basestring):
+        out.append(_STR)
+        write_str(out, value)
+    elif isinstance(value, (bytes_type, bytearray, memoryview)):
+        out.append(_BYTES)
+        write_bytes(out, value)
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        write_uvarint(out, len(value))
+        for item in value:
+            write_any(out, item)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        write_uvarint(out, len(value))
+        for k, v in value.items():
+            write_any(out, k)
+            write_any(out, v)
+    else:
+        msg = "Can't pack a value of type {}".format(type(value).__name__)
+        raise Invalid("type_error", msg)
+
+def read_any(reader):
+    '''Read a value written by write_any.'''
+    tag = reader.byte()
+    if tag == _NONE:
+        return None
+    if tag == _TRUE or tag == _FALSE:
+        return tag == _TRUE
+    if tag == _INT:
+        return reader.varint()
+    if tag == _FLOAT:
+        return reader.double()
+    if tag == _STR:
+        return reader.str()
+    if tag == _BYTES:
+        return reader.bytes()
+    if tag == _LIST:
+        return [read_any(reader) for _ in range(reader.uvarint())]
+    if tag == _DICT:
+        result = {}
+        for _ in range(reader.uvarint()):
+            k = read_any(reader)
+            result[k] = read_any(reader)
+        return result
+    raise ValueError("Unknown tag {!r}".format(tag))
+
+
+#  ===============
+#  = Fingerprint =
+#  ===============
+
+def _describe_option(option):
+    '''Describe an Enum option the same way on python 2 and 3.'''
+    if option is None or isinstance(option, (bool, float)):
+        return repr(option)
+    if isinstance(option, numbers.Integral):
+        # str, since python 2's repr adds an L to longs
+        return str(option)
+    if isinstance(option, (unicode, str)):
+        return json.dumps(option)
+    if isinstance(option, bytes_type):
+        return 'b' + json.dumps(option.decode('latin-1'))
+    if isinstance(option, tuple):
+        return '({})'.format(','.join(_describe_option(o) for o in option))
+    return repr(option)
+
+def _describe(node, seen, parts):
+    marker = node.value
+    # Wrappers don't change the encoding, except for Optional
+    while isinstance(marker, Wrapper):
+        if isinstance(marker, Optional):
+            parts.append('?')
+        marker = marker.marker
+    parts.append(type(marker).__name__)
+    if isinstance(marker, Enum):
+        # The options determine the indices
+        parts.append('[{}]'.format(
+            ','.join(_describe_option(o) for o in marker.options)))
+    if (isinstance(marker, SchemaMapping)
+            and marker.extra_field_policy == 'save'):
+        parts.append('+')
+    keys = list(node.key_iter())
+    if not keys:
+        return
+    # Only nodes with children can be part of a cycle
+    if id(marker) in seen:
+        parts.append('@{}'.format(seen[id(marker)]))
+        return
+    seen[id(marker)] = len(seen)
+    if not isinstance(marker, Tuple):
+        keys.sort()
+    parts.append('(')
+    for key in keys:
+        parts.append(key + ':')
+        _describe(node[key], seen, parts)
+        parts.append(',')
+    parts.append(')')
+
+# typegraph -> fingerprint
+_fingerprints = weakref.WeakKeyDictionary()
+
+def fingerprint(typegraph):
+    '''Get an 8-byte fingerprint of the encoding that typegraph describes.
+
+    Any change that affects the packed layout changes the fingerprint. The
+    result is cached for each typegraph.
+    '''
+    typegraph = to_typegraph(typegraph)
+    try:
+        return _fingerprints[typegraph]
+    except (KeyError, TypeError):
+        pass
+    parts = []
+    _describe(typegraph, {}, parts)
+    result = hashlib.sha1(''.join(parts).encode('utf-8')).digest()[:8]
+    try:
+        _fingerprints[typegraph] = result
+    except TypeError:
+        # Can't weakref it, so can't cache it
+        pass
+    return result
+
+
+#  ===========
+#  = Packing =
+#  ===========
+
+# pack_into(typegraph, value, out) appends the encoding of value to out
+pack_into = make_dispatcher()
+# unpack_from(typegraph, reader) reads a value from reader
+unpack_from = make_dispatcher()
+
+
+@pack_into.when(Leaf)
+def pack_leaf(dispgraph, value, out, **kw):
+    write_any(out, value)
+
+@unpack_from.when(Leaf)
+def unpack_leaf(dispgraph, reader, **kw):
+    return read_any(reader)
+
+
+@pack_into.when(Boolean)
+def pack_bool(dispgraph, value, out, **kw):
+    out.append(1 if value else 0)
+
+@unpack_from.when(Boolean)
+def unpack_bool(dispgraph, reader, **kw):
+    return bool(reader.byte())
+
+
+@pack_into.when(Int)
+def pack_int(dispgraph, value, out, **kw):
+    write_varint(out, value)
+
+@unpack_from.when(Int)
+def unpack_int(dispgraph, reader, **kw):
+    return reader.varint()
+
+
+@pack_into.when(Number)
+def pack_number(dispgraph, value, out, **kw):
+    if isinstance(value, numbers.Integral):
+        out.append(0)
+        write_varint(out, value)
+    else:
+        out.append(1)
+        out += _DOUBLE.pack(value)
+
+@unpack_from.when(Number)
+def unpack_number(dispgraph, reader, **kw):
+    if reader.byte():
+        return reader.double()
+    return reader.varint()
+
+
+@pack_into.when(Complex)
+def pack_complex(dispgraph, value, out, **kw):
+    out += _COMPLEX.pack(value.real, value.imag)
+
+@unpack_from.when(Complex)
+def unpack_complex(dispgraph, reader, **kw):
+    return complex(*_COMPLEX.unpack(reader.read(_COMPLEX.size)))
+
+
+@pack_into.when(String)
+def pack_str(dispgraph, value, out, **kw):
+    write_str(out, value)
+
+@unpack_from.when(String)
+def unpack_str(dispgraph, reader, **kw):
+    return reader.str()
+
+
+@pack_into.when(Bytes)
+def pack_bytes(dispgraph, value, out, **kw):
+    write_bytes(out, value)
+
+@unpack_from.when(Bytes)
+def unpack_bytes(dispgraph, reader, **kw):
+    return reader.bytes()
+
+
+@pack_into.when(Enum)
+def pack_enum(dispgraph, value, out, **kw):
+    write_uvarint(out, dispgraph.marker.index(value))
+
+@unpack_from.when(Enum)
+def unpack_enum(dispgraph, reader, **kw):
+    return dispgraph.marker.option(reader.uvarint())
+
+
+@pack_into.when(DateTime)
+def pack_datetime(dispgraph, value, out, **kw):
+    offset = value.utcoffset()
+    if offset is not None:
+        value = value.replace(tzinfo=None) - offset
+    write_varint(out, _micros(value - _EPOCH))
+
+@unpack_from.when(DateTime)
+def unpack_datetime(dispgraph, reader, **kw):
+    return _EPOCH + datetime.timedelta(microseconds=reader.varint())
+
+
+@pack_into.when(Date)
+def pack_date(dispgraph, value, out, **kw):
+    write_varint(out, value.toordinal())
+
+@unpack_from.when(Date)
+def unpack_date(dispgraph, reader, **kw):
+    return datetime.date.fromordinal(reader.varint())
+
+
+@pack_into.when(Time)
+def pack_time(dispgraph, value, out, **kw):
+    write_str(out, value.isoformat())
+
+@unpack_from.when(Time)
+def unpack_time(dispgraph, reader, **kw):
+    return _parse(reader.str(), datetime.time)
+
+
+@pack_into.when(TimeDelta)
+def pack_timedelta(dispgraph, value, out, **kw):
+    write_varint(out, _micros(value))
+
+@unpack_from.when(TimeDelta)
+def unpack_timedelta(dispgraph, reader, **kw):
+    return datetime.timedelta(microseconds=reader.varint())
+
+
+@pack_into.when(Optional)
+@stepwise
+def pack_optional(dispgraph, value, out, **kw):
+    if value is None:
+        out.append(0)
+    else:
+        out.append(1)
+        yield dispgraph.for_marker(dispgraph.marker.marker).defer(value, out, **kw)
+
+@unpack_from.when(Optional)
+@stepwise
+def unpack_optional(dispgraph, reader, **kw):
+    if not reader.byte():
+        raise Return(None)
+    inner = dispgraph.for_marker(dispgraph.marker.marker)
+    raise Return((yield inner.defer(reader, **kw)))
+
+
+def _schema_fields(dispgraph):
+    '''Get [(key, subgraph, is_optional)] for a schema node, in packed order.'''
+    fields = []
+    for key in sorted(dispgraph.key_iter()):
+        sub = dispgraph[key]
+        fields.append((key, sub, isinstance(sub.marker, Optional)))
+    return fields
+
+def iter_pack_fields(dispgraph, get, out, kw):
+    '''Stepwise: pack the fields of a schema, getting values with get(key).'''
+    fields = _schema_fields(dispgraph)
+    values = [get(key) for key, _, _ in fields]
+    bitmap = 0
+    nopt = 0
+    for (key, sub, opt), val in zip(fields, values):
+        if opt:
+            if val is not None:
+                bitmap |= 1 << nopt
+            nopt += 1
+    if nopt:
+        out += bytearray((bitmap >> i) & 0xff for i in range(0, nopt, 8))
+    for (key, sub, opt), val in zip(fields, values):
+        if opt:
+            if val is None:
+                continue
+            sub = sub.for_marker(sub.marker.marker)
+        yield sub.defer(val, out, **kw)
+
+def iter_unpack_fields(dispgraph, reader, kw):
+    '''Stepwise: unpack the fields of a schema into a dict.'''
+    fields = _schema_fields(dispgraph)
+    nopt = sum(1 for _, _, opt in fields if opt)
+    bitmap = 0
+    for i, b in enumerate(reader.read((nopt + 7) // 8)):
+        bitmap |= b << (8 * i)
+    result = {}
+    i = 0
+    for key, sub, opt in fields:
+        if opt:
+            present = bitmap & (1 << i)
+            i += 1
+            if not present:
+                result[key] = None
+                continue
+            sub = sub.for_marker(sub.marker.marker)
+        result[key] = yield sub.defer(reader, **kw)
+    raise Return(result)
+
+
+@pack_into.when(Schema)
+@stepwise
+def pack_schema(dispgraph, value, out, **kw):
+    yield iter_pack_fields(dispgraph, value.get, out, kw)
+
+@unpack_from.when(Schema)
+@stepwise
+def unpack_schema(dispgraph, reader, **kw):
+    raise Return((yield iter_unpack_fields(dispgraph, reader, kw)))
+
+
+@pack_into.when(SchemaMapping)
+@stepwise
+def pack_mapping(dispgraph, value, out, **kw):
+    yield iter_pack_fields(dispgraph, value.get, out, kw)
+    if dispgraph.marker.extra_field_policy == 'save':
+        fields = set(dispgraph.key_iter())
+        write_any(out, dict((k, v) for k, v in value.items() if k not in fields))
+
+@unpack_from.when(SchemaMapping)
+@stepwise
+def unpack_mapping(dispgraph, reader, **kw):
+    result = yield iter_unpack_fields(dispgraph, reader, kw)
+    if dispgraph.marker.extra_field_policy == 'save':
+        result.update(read_any(reader))
+    raise Return(result)
+
+
+@pack_into.when(ObjectMarker)
+@stepwise
+def pack_obj(dispgraph, value, out, **kw):
+    yield iter_pack_fields(dispgraph, lambda k: getattr(value, k, None), out, kw)
+
+@unpack_from.when(ObjectMarker)
+@stepwise
+def unpack_obj(dispgraph, reader, **kw):
+    attrs = yield iter_unpack_fields(dispgraph, reader, kw)
+    raise Return(dispgraph.marker.construct(attrs, **kw))
+
+
+@pack_into.when(List)
+@stepwise
+def pack_list(dispgraph, value, out, **kw):
+    sub = dispgraph['sub']
+    write_uvarint(out, len(value))
+    for item in value:
+        yield sub.defer(item, out, **kw)
+
+@unpack_from.when(List)
+@stepwise
+def unpack_list(dispgraph, reader, **kw):
+    sub = dispgraph['sub']
+    result = []
+    for _ in range(reader.uvarint()):
+        result.append((yield sub.defer(reader, **kw)))
+    raise Return(result)
+
+
+@pack_into.when(StrMapping)
+@stepwise
+def pack_strmap(dispgraph, value, out, **kw):
+    sub = dispgraph['sub']
+    write_uvarint(out, len(value))
+    for key, item in value.items():
+        write_str(out, key)
+        yield sub.defer(item, out, **kw)
+
+@unpack_from.when(StrMapping)
+@stepwise
+def unpack_strmap(dispgraph, reader, **kw):
+    sub = dispgraph['sub']
+    result = {}
+    for _ in range(reader.uvarint()):
+        key = reader.str()
+        result[key] = yield sub.defer(reader, **kw)
+    raise Return(result)
+
+
+@pack_into.when(UniMapping)
+@stepwise
+def pack_unimap(dispgraph, value, out, **kw):
+    kgraph, vgraph = dispgraph['key'], dispgraph['val']
+    write_uvarint(out, len(value))
+    for key, item in value.items():
+        yield kgraph.defer(key, out, **kw)
+        yield vgraph.defer(item, out, **kw)
+
+@unpack_from.when(UniMapping)
+@stepwise
+def unpack_unimap(dispgraph, reader, **kw):
+    kgraph, vgraph = dispgraph['key'], dispgraph['val']
+    result = {}
+    for _ in range(reader.uvarint()):
+        key = yield kgraph.defer(reader, **kw)
+        result[key] = yield vgraph.defer(reader, **kw)
+    raise Return(result)
+
+
+@pack_into.when(Tuple)
+@stepwise
+def pack_tuple(dispgraph, value, out, **kw):
+    names = dispgraph.marker.field_names
+    if len(value) != len(names):
+        # Unpacking reads exactly one item per field
+        msg = "Expected iterable of length {}, not {}"
+        raise Invalid('bad_len', msg.format(len(names), len(value)))
+    for name, item in zip(names, value):
+        yield dispgraph[name].defer(item, out, **kw)
+
+@unpack_from.when(Tuple)
+@stepwise
+def unpack_tuple(dispgraph, reader, **kw):
+    result = []
+    for name in dispgraph.marker.field_names:
+        result.append((yield dispgraph[name].defer(reader, **kw)))
+    raise Return(tuple(result))
+
+@unpack_from.when(NamedTuple)
+@stepwise
+def unpack_namedtuple(dispgraph, reader, **kw):
+    t = yield dispgraph.super(NamedTuple).defer(reader, **kw)
+    raise Return(dispgraph.marker.tuple_type._make(t))
+
+
+@pack_into.when(Polymorph)
+@stepwise
+def pack_pmorph(dispgraph, value, out, **kw):
+    name = dispgraph.marker.name_for_val(value)
+    write_uvarint(out, sorted(dispgraph.key_iter()).index(name))
+    yield dispgraph[name].defer(value, out, **kw)
+
+@unpack_from.when(Polymorph)
+@stepwise
+def unpack_pmorph(dispgraph, reader, **kw):
+    name = sorted(dispgraph.key_iter())[reader.uvarint()]
+    raise Return((yield dispgraph[name].defer(reader, **kw)))
+
+
+def pack(typegraph, value, **kwargs):
+    '''Encode value as bytes, using typegraph. See the module docstring.'''
+    out = bytearray(MAGIC)
+    out += fingerprint(typegraph)
+    try:
+        pack_into(typegraph, value, out, **kwargs)
+    except (AttributeError, TypeError, ValueError, OverflowError,
+            struct.error) as e:
+        raise Invalid("type_error", "Can't pack value: {}".format(e))
+    return bytes_type(out)
+
+def unpack(typegraph, data, **kwargs):
+    '''Decode bytes written by pack(typegraph, value) back into a value.'''
+    reader = Reader(data)
+    try:
+        if bytes_type(reader.read(len(MAGIC))) != MAGIC:
+            raise Invalid("bad_data", "Not packed data")
+        if bytes_type(reader.read(8)) != fingerprint(typegraph):
+            raise Invalid("schema_mismatch",
+                "The data was packed with a different typegraph")
+        value = unpack_from(typegraph, reader, **kwargs)
+    except (IndexError, ValueError, OverflowError, struct.error) as e:
+        raise Invalid("bad_data", str(e))
+    if reader.pos != len(reader.buf):
+        raise Invalid("bad_data", "Unexpected data after the packed value")
+    return value
@@ -0,0 +1,407 @@
+'''parallel.py: run dispatchers over large lists in a process pool.
+
+parallel_dictify, parallel_undictify and parallel_validate split a list of
+values into chunks and process each chunk in a worker process (by default in a
+concurrent.futures.ProcessPoolExecutor), so that converting or validating
+millions of records can use every core:
+
+>>> import travesty as tv
+>>> from concurrent.futures import ThreadPoolExecutor
+>>> point = tv.SchemaMapping().of(x=tv.Int(), y=tv.Int())
+>>> values = [dict(x=i, y=-i) for i in range(10)]
+>>> pool = ThreadPoolExecutor(2)
+>>> parallel_dictify(point, values, chunksize=3, executor=pool) == values
+True
+
+(Threads are used here just to keep the example cheap; leave out the executor
+to get a process pool.)
+
+Each chunk is processed as a List of the typegraph, so errors have the same
+structure as they would from processing the whole list at once; the chunks'
+errors are merged, with the indices adjusted to be indices into the original
+list:
+
+>>> values[4]['x'] = 'four'
+>>> values[8]['y'] = 'eight'
+>>> parallel_validate(point, values, chunksize=3, executor=pool)
+Traceback (most recent call last):
+    ...
+Invalid: 4: [x: [type_error]], 8: [y: [type_error]]
+
+With error_mode=CHECK, the first error found is raised straight away and the
+remaining chunks are cancelled.
+
+imap is the general form: it takes any dispatcher and yields the results as
+they become available. With ordered=False, results are yielded as each chunk
+finishes, as (index, result) pairs:
+
+>>> import datetime
+>>> days = [datetime.date(2000, 1, i) for i in range(1, 6)]
+>>> for i, s in sorted(imap('travesty:dictify', tv.Date(), days, chunksize=2,
+...                         ordered=False, executor=pool)):
+...     print('{} {}'.format(i, s))
+0 2000-01-01
+1 2000-01-02
+2 2000-01-03
+3 2000-01-04
+4 2000-01-05
+
+Everything sent to the workers has to be picklable. Typegraphs built from
+travesty's markers and from module-level SchemaObj classes are, but dispatchers
+aren't, so they (and anything else that isn't picklable) must be given by name,
+as "module:attribute" (or "module.attribute"), and are imported in the
+worker. Keyword arguments are passed on to the dispatcher and must be picklable
+too.
+
+For large numeric payloads, pickling the results to send them back to the
+parent can cost more than computing them. With transport='shared_memory'
+(Python 3.8+), each worker instead encodes its results with to_columns and
+copies the arrays - numbers, dates, dictionary codes, and strings as utf-8
+data plus offsets - into a multiprocessing.shared_memory block, and the parent
+decodes the results straight from views of that block, with no intermediate
+copy. This requires that fn return values of the typegraph's type (as with
+undictify or clone, but not dictify or its sub-dispatchers, which are
+rejected):
+
+    objs = parallel_undictify(Reading, data, transport='shared_memory')
+
+To skip building objects altogether, use iter_chunks, which yields each
+chunk's results as a SharedTable whose columns are memoryviews of the shared
+memory.
+
+Each chunk is processed independently, so Documents that appear in several
+chunks are serialized (or loaded) once per chunk rather than once overall.
+
+On Python 2, this module requires the futures backport of concurrent.futures.
+'''
+from array import array
+from collections import deque
+from concurrent import futures
+from importlib import import_module
+from itertools import islice
+import multiprocessing
+import pickle
+import sys
+
+from .base import CHECK, dictify
+from .columnar import to_columns, from_columns
+from .invalid import Invalid
+from .list import List
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError: # pragma: no cover
+    # Python < 3.8
+    shared_memory = None
+
+if sys.version >= '3': # pragma: no cover
+    basestring = str
+    unicode = str
+
+
+def resolve(obj):
+    '''Import obj if it's a name, as "module:attribute" or "module.attribute".
+
+    >>> resolve('travesty:Int')
+    <class 'travesty.typed_leaf.Int'>
+    >>> resolve('travesty.list.List')
+    <class 'travesty.list.List'>
+    '''
+    if not isinstance(obj, basestring):
+        return obj
+    if ':' in obj:
+        modname, attr = obj.split(':', 1)
+    else:
+        modname, _, attr = obj.rpartition('.')
+    obj = import_module(modname)
+    for name in attr.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _offset_errors(error, start):
+    '''Renumber the indices in a List's Invalid by start.'''
+    shifted = Invalid()
+    shifted.own_errors.extend(error.own_errors)
+    for key, sub in error.sub_errors.items():
+        shifted.add_sub(str(int(key) + start), sub)
+    return shifted
+
+
+_jobs = {}
+
+def _load_job(job):
+    # Each worker unpickles a given job once, rather than once per chunk.
+    # Chunks of other jobs may run in other threads, which can clear _jobs at
+    # any time, so only ever return the local result.
+    loaded = _jobs.get(job)
+    if loaded is None:
+        fn, typegraph, kwargs = pickle.loads(job)
+        loaded = resolve(fn), List().of(resolve(typegraph)), kwargs
+        _jobs.clear()
+        _jobs[job] = loaded
+    return loaded
+
+def run_chunk(job, start, chunk):
+    '''Apply a job to one chunk of values.
+
+    This is what runs in the worker processes. job is the pickled tuple (fn,
+    typegraph, kwargs). Returns (start, results, error), where error is an
+    Invalid (with indices offset by start) or None.
+    '''
+    fn, graph, kwargs = _load_job(job)
+    try:
+        return start, fn(graph, chunk, **kwargs), None
+    except Invalid as e:
+        return start, None, _offset_errors(e, start)
+
+
+def run_chunk_shared(job, start, chunk):
+    '''Like run_chunk, but returns the results in shared memory.
+
+    See export_table.
+    '''
+    start, results, error = run_chunk(job, start, chunk)
+    if results is None:
+        return start, None, error
+    _, graph, _ = _load_job(job)
+    return start, export_table(to_columns(graph, results)), None
+
+
+#  ========================
+#  = Shared memory tables =
+#  ========================
+
+def _aligned(n):
+    return (n + 7) // 8 * 8
+
+def export_table(table):
+    '''Move the arrays in a to_columns table into a shared memory block.
+
+    Array columns, the codes of dict columns, and list columns of strings
+    (as utf-8 data plus an array of offsets into it) are copied into a single
+    new SharedMemory block. Returns (name, segments, table), where name is the
+    block's name, segments lists the (path, slot, typecode, offset, size) of
+    each array in the block, and table is the rest of the table, with the
+    moved data replaced by None.
+
+    The block is left for the receiving process to unlink; see SharedTable.
+    '''
+    segments, buffers, columns = [], [], {}
+    size = 0
+    def add(path, slot, arr):
+        nbytes = len(arr) * arr.itemsize
+        segments.append((path, slot, arr.typecode, size, nbytes))
+        buffers.append(arr)
+        return _aligned(nbytes)
+    for path, column in table['columns'].items():
+        if column.kind in ('array', 'dict'):
+            size += add(path, 'data', column.data)
+            column = column._replace(data=None)
+        elif all(isinstance(v, unicode) for v in column.data):
+            encoded = [v.encode('utf-8') for v in column.data]
+            offsets = array('q', [0])
+            for data in encoded:
+                offsets.append(offsets[-1] + len(data))
+            size += add(path, 'offsets', offsets)
+            size += add(path, 'blob', array('B', b''.join(encoded)))
+            column = column._replace(kind='strings', data=None)
+        columns[path] = column
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for (_, _, _, offset, nbytes), arr in zip(segments, buffers):
+            shm.buf[offset:offset + nbytes] = memoryview(arr).cast('B')
+        # The receiving process is responsible for unlinking the block.
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    finally:
+        shm.close()
+    return shm.name, segments, dict(table, columns=columns)
+
+
+class SharedTable(object):
+    '''A table exported by export_table, attached in the receiving process.
+
+    .columns has the same form as the columns from to_columns, except that the
+    arrays are memoryviews of the shared memory rather than copies of it.
+    .records(typegraph) decodes the records with from_columns, reading the
+    data straight from those views.
+
+    The table owns the shared memory block: call .close() (or use the table as
+    a context manager) to release it once you're done with the views.
+    '''
+    def __init__(self, exported):
+        name, segments, table = exported
+        self.length = table['length']
+        self._shm = shared_memory.SharedMemory(name)
+        self._views = []
+        slots = {}
+        for path, slot, typecode, offset, nbytes in segments:
+            view = self._shm.buf[offset:offset + nbytes]
+            self._views.append(view)
+            self._views.append(view.cast(typecode))
+            slots[path, slot] = self._views[-1]
+        self.columns = {}
+        for path, column in table['columns'].items():
+            if column.kind == 'strings':
+                offsets, blob = slots[path, 'offsets'], slots[path, 'blob']
+                data = [bytes(blob[offsets[i]:offsets[i+1]]).decode('utf-8')
+                        for i in range(len(offsets) - 1)]
+                column = column._replace(kind='list', data=data)
+            elif (path, 'data') in slots:
+                column = column._replace(data=slots[path, 'data'])
+            self.columns[path] = column
+
+    def records(self, typegraph):
+        '''Decode the records in this table; see from_columns.'''
+        return from_columns(typegraph, dict(length=self.length,
+            columns=self.columns))
+
+    def close(self):
+        '''Release the views and unlink the shared memory block.'''
+        if self._shm is None:
+            return
+        self.columns = {}
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _discard_shared(future):
+    # Unlink the shared memory of a result that will never be received.
+    if not future.cancelled() and future.exception() is None:
+        _, exported, _ = future.result()
+        if exported is not None:
+            SharedTable(exported).close()
+
+
+def _chunks(values, chunksize):
+    it = iter(values)
+    start = 0
+    while True:
+        chunk = list(islice(it, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def iter_chunks(fn, typegraph, values, chunksize=1000, ordered=True,
+        executor=None, max_workers=None, window=None, transport='pickle',
+        **kwargs):
+    '''Yield (start, results) for each chunk of values as it's processed.
+
+    This is the engine behind imap and the parallel_* functions; see the module
+    docstring. At most window chunks (by default twice the number of workers)
+    are in flight at once, so values can be an arbitrarily long iterable.
+
+    If transport is 'shared_memory', the workers send their results back as
+    columnar tables in shared memory instead of pickling them, and each chunk's
+    results are a SharedTable, which the caller must close.
+    '''
+    if transport not in ('pickle', 'shared_memory'):
+        raise ValueError("Unknown transport: {!r}".format(transport))
+    if transport == 'shared_memory':
+        if shared_memory is None:
+            raise ValueError("The shared_memory transport requires Python 3.8+")
+        if dictify in getattr(resolve(fn), 'dispatch_mro', ()):
+            # Its results aren't of typegraph's type, so can't be columnar
+            raise ValueError("The shared_memory transport can't be used with "
+                             "dictify")
+    if executor is None:
+        with futures.ProcessPoolExecutor(max_workers) as executor:
+            for item in iter_chunks(fn, typegraph, values, chunksize, ordered,
+                    executor, max_workers, window, transport, **kwargs):
+                yield item
+        return
+    if window is None:
+        window = 2 * (max_workers or multiprocessing.cpu_count())
+    fail_fast = kwargs.get('error_mode') == CHECK
+    # Pickle the job up front, so that unpicklable arguments fail here and not
+    # in the executor's feeder thread.
+    job = pickle.dumps((fn, typegraph, kwargs), pickle.HIGHEST_PROTOCOL)
+    shared = transport == 'shared_memory'
+    run = run_chunk_shared if shared else run_chunk
+    chunks = _chunks(values, chunksize)
+    pending = deque()
+    errors = Invalid()
+    def submit():
+        for start, chunk in islice(chunks, window - len(pending)):
+            pending.append(executor.submit(run, job, start, chunk))
+    try:
+        submit()
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = futures.wait(pending,
+                    return_when=futures.FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+            start, results, error = future.result()
+            if shared and results is not None:
+                results = SharedTable(results)
+            if error is not None:
+                if fail_fast:
+                    raise error
+                errors.merge(error)
+            elif not (errors and ordered):
+                # Once a chunk has failed, ordered results have a gap, so we
+                # stop yielding but keep going to collect all the errors.
+                yield start, results
+            elif shared and results is not None:
+                results.close()
+            submit()
+    finally:
+        for future in pending:
+            if not future.cancel() and shared:
+                future.add_done_callback(_discard_shared)
+    if errors:
+        raise errors
+
+
+def imap(fn, typegraph, values, chunksize=1000, ordered=True, **kwargs):
+    '''Apply fn to each item in values, in parallel.
+
+    fn is a dispatcher (or the name of one), and is called on chunks of values
+    as a List of typegraph. Yields the results in order, or if ordered is
+    False, yields (index, result) pairs as they become available.
+
+    Accepts the same keyword arguments as iter_chunks; any others are passed on
+    to fn.
+    '''
+    if kwargs.get('transport') == 'shared_memory':
+        graph = List().of(resolve(typegraph))
+    for start, results in iter_chunks(fn, typegraph, values, chunksize,
+            ordered, **kwargs):
+        if isinstance(results, SharedTable):
+            with results:
+                results = results.records(graph)
+        if ordered:
+            for result in results:
+                yield result
+        else:
+            for i, result in enumerate(results, start):
+                yield i, result
+
+
+def parallel_dictify(typegraph, values, **kwargs):
+    '''Dictify a list of values in parallel. See imap.'''
+    return list(imap('travesty:dictify', typegraph, values, **kwargs))
+
+def parallel_undictify(typegraph, values, **kwargs):
+    '''Undictify a list of values in parallel. See imap.'''
+    return list(imap('travesty:undictify', typegraph, values, **kwargs))
+
+def parallel_validate(typegraph, values, **kwargs):
+    '''Validate a list of values in parallel. See imap.'''
+    for _ in iter_chunks('travesty:validate', typegraph, values, **kwargs):
+        pass
@@ -1,7 +1,8 @@
 import vertigo as vg
 
 from .base import Marker, Traversable, to_typegraph, IGNORE
-from .base import graphize, validate, clone, dictify, undictify
+from .base import graphize, validate, clone, dictify, undictify, stepwise
+from .cantrips.trampoline import Return, run
 from .invalid import Invalid
 
 
@@ -165,6 +166,11 @@ class Polymorph(Marker):
 
 def apply_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
     '''Returns (name, dictified_value), where name is the polymorphic id.'''
+    return run(iter_pmorph(dispgraph, value, error_mode, **kw))
+
+
+def iter_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
+    '''Stepwise version of apply_pmorph, for use in @stepwise functions.'''
     kw['error_mode'] = error_mode
     try:
         name = dispgraph.marker.name_for_val(value)
@@ -172,23 +178,26 @@ def apply_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
         if error_mode == IGNORE:
             raise
         raise Invalid("type_error", "Unrecognized type: {}".format(type(value)))
-    value = dispgraph[name](value, **kw)
-    return (name, value)
+    value = yield dispgraph[name].defer(value, **kw)
+    raise Return((name, value))
 
 
 @clone.when(Polymorph)
+@stepwise
 def clone_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
-    name, value = apply_pmorph(dispgraph, value, error_mode, **kw)
-    return value
+    name, value = yield iter_pmorph(dispgraph, value, error_mode, **kw)
+    raise Return(value)
 
 
 @dictify.when(Polymorph)
+@stepwise
 def dictify_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
     '''Returns (name, dictified_value), where name is the polymorphic id.'''
-    return apply_pmorph(dispgraph, value, error_mode, **kw)
+    raise Return((yield iter_pmorph(dispgraph, value, error_mode, **kw)))
 
 
 @undictify.when(Polymorph)
+@stepwise
 def undictify_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
     kw['error_mode'] = error_mode
     if error_mode != IGNORE:
@@ -199,15 +208,17 @@ def undictify_pmorph(dispgraph, value, error_mode=IGNORE, **kw):
     name, value = value
     if error_mode != IGNORE and name not in dispgraph:
         raise Invalid('bad_typename', name)
-    return dispgraph[name](value, **kw)
+    raise Return((yield dispgraph[name].defer(value, **kw)))
 
 
 @validate.when(Polymorph)
+@stepwise
 def validate_pmorph(dispgraph, value, **kw):
-    apply_pmorph(dispgraph, value, **kw)
+    yield iter_pmorph(dispgraph, value, **kw)
 
 
 @graphize.when(Polymorph)
+@stepwise
 def graphize_pmorph(dispgraph, value, **kw):
     name = dispgraph.marker.name_for_val(value)
-    return dispgraph[name](value, **kw)
+    raise Return((yield dispgraph[name].defer(value, **kw)))
@@ -3,8 +3,9 @@ from collections import OrderedDict
 import vertigo as vg
 
 from .invalid import Invalid
-from .base import Marker, graphize, traverse, mutate, clone
-from .base import to_typegraph, aggregating_errors, IGNORE
+from .base import Marker, graphize, traverse, mutate, clone, stepwise
+from .base import to_typegraph, aggregating_errors, IGNORE, structural
+from .cantrips.trampoline import Return, run
 
 
 class Schema(Marker):
@@ -21,6 +22,11 @@ def apply_schema(dispgraph, value, kw, default_nones=True):
     This also handles error checking - if agg is not None, this will typecheck
     value and recurse to each element within agg.checking_sub().
     '''
+    return run(iter_schema(dispgraph, value, kw, default_nones))
+
+
+def iter_schema(dispgraph, value, kw, default_nones=True):
+    '''Stepwise version of apply_schema, for use in @stepwise functions.'''
     error_mode = kw.get('error_mode', IGNORE)
     def get(key):
         if default_nones:
@@ -29,8 +35,8 @@ def apply_schema(dispgraph, value, kw, default_nones=True):
     result = OrderedDict()
     if error_mode == IGNORE:
         for (key, subgraph) in dispgraph.edge_iter():
-            result[key] = subgraph(get(key), **kw)
-        return result
+            result[key] = yield subgraph.defer(get(key), **kw)
+        raise Return(result)
     with aggregating_errors(error_mode) as agg:
         if not isinstance(value, dict):
             msg = 'Expected a dict, got {} instead'.format(type(value))
@@ -40,33 +46,49 @@ def apply_schema(dispgraph, value, kw, default_nones=True):
                 if key not in value and not default_nones:
                     raise Invalid("missing_attr")
                 val = value.get(key, None)
-                result[key] = subgraph(val, **kw)
-        return result
+                result[key] = yield subgraph.defer(val, **kw)
+    raise Return(result)
 
 
 @graphize.when(Schema)
+@stepwise
 def graphize_schema(dispgraph, value, **kw):
-    edges = apply_schema(dispgraph, value, kw).items()
+    edges = (yield iter_schema(dispgraph, value, kw)).items()
     if 'zipval' in dispgraph.extras:
         value = (value, dispgraph.extras.zipval)
-    return vg.PlainGraphNode(value, edges)
+    raise Return(vg.PlainGraphNode(value, edges))
 
 
 @traverse.when(Schema)
+@structural
+@stepwise
 def traverse_schema(dispgraph, value, **kw):
-    apply_schema(dispgraph, value, kw, default_nones=False)
+    yield iter_schema(dispgraph, value, kw, default_nones=False)
 
 
 @clone.when(Schema)
+@stepwise
 def clone_schema(dispgraph, value, **kw):
-    return apply_schema(dispgraph, value, kw)
+    raise Return((yield iter_schema(dispgraph, value, kw)))
 
 
 @mutate.when(Schema)
+@structural
+@stepwise
 def mutate_schema(dispgraph, value, **kw):
     error_mode = kw.get('error_mode', IGNORE)
     if error_mode != IGNORE and not isinstance(value, dict):
         msg = 'Expected a dict, got {} instead'.format(type(value))
         raise Invalid("type_error", msg, fatal=True)
-    value.update(apply_schema(dispgraph, value, kw))
-    return value
+    value.update((yield iter_schema(dispgraph, value, kw)))
+    raise Return(value)
+
+def _has_fields(node, marker, value, keys):
+    # Missing fields are filled in with None, so only complete dicts can be
+    # skipped when pruning
+    if not isinstance(value, dict):
+        return None
+    if any(key not in value for key in node.key_iter()):
+        return None
+    return ((key, value[key]) for key in keys)
+mutate_schema.structural = _has_fields
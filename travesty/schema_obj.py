@@ -1,5 +1,6 @@
 import vertigo as vg
 
+from .cantrips.empty_instance import empty_instance
 from .cantrips.immutable_dict import ImmutableDict
 from .cantrips.subclass import Subclassable
 
@@ -20,6 +21,19 @@ def _marker_for(cls):
         bases = [ObjectMarker]
     return type(cls.__name__+"Marker", tuple(bases), dict(target_cls=cls))
 
+def _field_values(d, fields, ignore=()):
+    '''Get the values of fields in d as a tuple, if possible.
+
+    If d has keys that aren't in fields or ignore, or is missing any fields,
+    this returns d itself instead.
+    '''
+    if len(d) != len(fields) + len(ignore):
+        return d
+    try:
+        return tuple([d[key] for key in fields])
+    except KeyError:
+        return d
+
 class SchemaObj(Traversable, Subclassable):
     '''Type for making python classes with automatically-inferred typegraphs.
 
@@ -37,8 +51,22 @@ class SchemaObj(Traversable, Subclassable):
     with the class. Before this function is called, cls.typegraph will have no
     children; when you call finalize_typegraph, the children will be populated
     and the finalize_typegraph method will be removed.
+
+    SchemaObjs pickle compactly: the pickled state is just a tuple of the
+    field values, in sorted field order, and unpickling bypasses __init__.
+    (If an instance has attributes that aren't fields, its whole __dict__ is
+    pickled instead.) Since the tuple doesn't record field names, unpickling
+    one with the wrong number of values, e.g. after fields were added or
+    removed, raises a ValueError.
+
+    >>> from travesty import Int
+    >>> class Point(SchemaObj):
+    ...     field_types = dict(y=Int(), x=Int())
+    >>> Point(x=1, y=2).__getstate__()
+    (1, 2)
     '''
     field_types = ImmutableDict()
+    _tv_field_order = ()
 
     def __init__(self, **kwargs):
         for key in self.field_types:
@@ -47,6 +75,22 @@ class SchemaObj(Traversable, Subclassable):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    def __reduce__(self):
+        return (empty_instance, (type(self),), self.__getstate__())
+
+    def __getstate__(self):
+        return _field_values(self.__dict__, self._tv_field_order)
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            fields = self._tv_field_order
+            if len(state) != len(fields):
+                msg = "Can't unpickle {} from {} values; expected {}".format(
+                    type(self).__name__, len(state), len(fields))
+                raise ValueError(msg)
+            state = zip(fields, state)
+        self.__dict__.update(state)
+
     @classmethod
     def __subclass__(cls, field_types=None, **kwargs):
         super(SchemaObj, cls).__subclass__(**kwargs)
@@ -69,6 +113,7 @@ class SchemaObj(Traversable, Subclassable):
             field_types = {}
         cls._field_types = field_types
         cls.field_types = cls.field_types.overlay(field_types, strip_none=True)
+        cls._tv_field_order = tuple(sorted(cls.field_types))
         for key, value in cls.field_types.items():
             cls.typegraph[key] = to_typegraph(value)
 
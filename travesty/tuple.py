@@ -1,7 +1,9 @@
 import vertigo as vg
 
 from .base import Marker, to_typegraph, IGNORE, aggregating_errors
-from .base import graphize, validate, dictify, clone, traverse
+from .base import graphize, validate, dictify, clone, traverse, stepwise
+from .base import structural
+from .cantrips.trampoline import Return, run
 from .invalid import Invalid
 
 class Tuple(Marker):
@@ -80,10 +82,17 @@ class Tuple(Marker):
         return cls(nfields=len(type_tuple)).of(**children)
 
 def apply_tuple(dispgraph, value, kw):
+    return run(iter_tuple(dispgraph, value, kw))
+
+def iter_tuple(dispgraph, value, kw):
+    '''Stepwise version of apply_tuple, for use in @stepwise functions.'''
     error_mode = kw.get("error_mode", IGNORE)
     names = dispgraph.marker.field_names
+    l = []
     if error_mode == IGNORE:
-        return tuple(dispgraph[n](v, **kw) for n,v in zip(names, value))
+        for n, v in zip(names, value):
+            l.append((yield dispgraph[n].defer(v, **kw)))
+        raise Return(tuple(l))
     try:
         if len(value) != len(names):
             msg = "Expected iterable of length {}, not {}"
@@ -93,29 +102,32 @@ def apply_tuple(dispgraph, value, kw):
         msg = "Expected iterable, not {}".format(type(value))
         raise Invalid('not_iterable', msg, fatal=True)
     with aggregating_errors(error_mode) as agg:
-        l = []
         for (n, val) in zip(names, value):
             with agg.checking_sub(n):
-                l.append(dispgraph[n](val, **kw))
-        return tuple(l)
+                l.append((yield dispgraph[n].defer(val, **kw)))
+    raise Return(tuple(l))
 
 
 @clone.when(Tuple)
+@stepwise
 def clone_tuple(dispgraph, value, **kw):
-    return apply_tuple(dispgraph, value, kw)
+    raise Return((yield iter_tuple(dispgraph, value, kw)))
 
 @traverse.when(Tuple)
+@structural
+@stepwise
 def traverse_tuple(dispgraph, value, **kw):
-    apply_tuple(dispgraph, value, kw)
+    yield iter_tuple(dispgraph, value, kw)
 
 @graphize.when(Tuple)
+@stepwise
 def graphize_tuple(dispgraph, value, **kw):
-    items = apply_tuple(dispgraph, value, kw)
+    items = yield iter_tuple(dispgraph, value, kw)
     names = dispgraph.marker.field_names
     edges = zip(names, items)
     if 'zipval' in dispgraph.extras:
         value = (value, dispgraph.extras.zipval)
-    return vg.PlainGraphNode(value, edges)
+    raise Return(vg.PlainGraphNode(value, edges))
 
 
 class NamedTuple(Tuple):
@@ -153,21 +165,24 @@ class NamedTuple(Tuple):
 
 
 @validate.when(NamedTuple)
+@stepwise
 def validate_namedtuple(dispgraph, value, **kw):
     tuple_type = dispgraph.marker.tuple_type
     if not isinstance(value, tuple_type):
         msg = "Expected {}, got {}".format(tuple_type, type(value))
         raise Invalid('type_error', msg=msg, fatal=True)
-    dispgraph.super(NamedTuple)(value, **kw)
+    yield dispgraph.super(NamedTuple).defer(value, **kw)
 
 
 @clone.when(NamedTuple)
+@stepwise
 def clone_namedtuple(dispgraph, value, **kw):
-    t = dispgraph.super(NamedTuple)(value, **kw)
-    return dispgraph.marker.tuple_type._make(t)
+    t = yield dispgraph.super(NamedTuple).defer(value, **kw)
+    raise Return(dispgraph.marker.tuple_type._make(t))
 
 
 @dictify.when(NamedTuple)
+@stepwise
 def df_namedtuple(dispgraph, value, **kw):
     '''Explicit dictify to provide a plain tuple.
 
@@ -177,4 +192,4 @@ def df_namedtuple(dispgraph, value, **kw):
     It's ok that undictify falls back on clone, because cloning a plain tuple
     actually will create an appropriate namedtuple.
     '''
-    return dispgraph.super(NamedTuple)(value, **kw)
+    raise Return((yield dispgraph.super(NamedTuple).defer(value, **kw)))
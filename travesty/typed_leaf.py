@@ -63,6 +63,15 @@ Traceback (most recent call last):
 ...
 Invalid: type_error
 
+>>> byt = Bytes()
+>>> validate(byt, b'bytes')
+>>> validate(byt, bytearray(b'buffer'))
+>>> validate(byt, memoryview(b'view'))
+>>> validate(byt, u'text')
+Traceback (most recent call last):
+...
+Invalid: type_error
+
 >>> com = Complex()
 >>> validate(com, 1)
 >>> validate(com, 1.1)
@@ -132,9 +141,20 @@ def validate_tl(dispgraph, value, **kwargs):
     if not isinstance(value, dispgraph.marker.types):
         raise Invalid('type_error', dispgraph.marker.error_msg_for(value))
 
+def validate_tl_many(dispgraph, values, **kwargs):
+    for value in values:
+        validate_tl(dispgraph, value, **kwargs)
+    return [None] * len(values)
+
+# Lets List validate whole lists at once; see iter_list.
+validate_tl.batch = validate_tl_many
+
 Boolean = TypedLeaf.subclass(types=(bool,), __class_name="Boolean")
 String = TypedLeaf.subclass(types=(basestring,), __class_name="String")
-Bytes = TypedLeaf.subclass(types=(bytes_type,), __class_name="Bytes")
+# Any of the common buffer types is accepted, so that e.g. a memoryview of a
+# larger buffer never needs to be copied into a new bytes object.
+Bytes = TypedLeaf.subclass(types=(bytes_type, bytearray, memoryview),
+    __class_name="Bytes")
 Int = TypedLeaf.subclass(types=(numbers.Integral,), __class_name="Int")
 Number = TypedLeaf.subclass(types=(numbers.Real,), __class_name="Number")
 Complex = TypedLeaf.subclass(types=(numbers.Complex,), __class_name="Complex")
@@ -169,3 +189,38 @@ def udf_bytes(dispgraph, value, **kwargs):
         return base64.b64decode(value)
     except Exception as e:
         raise Invalid("bad_value", str(e))
+
+
+# binary_dictify and binary_undictify are for formats that can store raw bytes
+# (msgpack, pickle, custom codecs, etc.), so Bytes values are passed through
+# as-is instead of being base64 encoded. Memoryviews are the exception: most of
+# those formats (pickle included) can't store them, so they're copied to bytes.
+binary_dictify = dictify.sub()
+binary_undictify = undictify.sub()
+
+@binary_dictify.when(Bytes)
+def binary_df_bytes(dispgraph, value, **kwargs):
+    '''
+    >>> buf = bytearray(b'abcdef')
+    >>> binary_dictify(Bytes(), buf) is buf
+    True
+    >>> binary_dictify(Bytes(), memoryview(buf)[2:4]) == b'cd'
+    True
+    '''
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return value
+
+@binary_undictify.when(Bytes)
+def binary_udf_bytes(dispgraph, value, **kwargs):
+    '''
+    >>> binary_undictify(Bytes(), b'\\xc3\\xbf') == b'\\xc3\\xbf'
+    True
+    >>> binary_undictify(Bytes(), u'w78=')
+    Traceback (most recent call last):
+        ...
+    Invalid: type_error
+    '''
+    if not isinstance(value, dispgraph.marker.types):
+        raise Invalid('type_error', dispgraph.marker.error_msg_for(value))
+    return value
@@ -1,4 +1,7 @@
-from . import Wrapper, validate, InvalidAggregator
+import weakref
+
+from . import Wrapper, validate, Invalid, InvalidAggregator, stepwise
+from .cantrips.dispatcher import Dispatcher
 
 class Validated(Wrapper):
     '''Wrapper that specifies additional validators for a marker.
@@ -29,15 +32,67 @@ class Validated(Wrapper):
     def wrap(cls, marker, vdators=()):
         return super(Validated, cls).wrap(marker, vdators=vdators)
 
+# Validated -> (dispatcher, Dispatcher.changes, calls_validate flags)
+_direct = weakref.WeakKeyDictionary()
+
+def _calls_validate(disp, validated):
+    '''Whether disp's handler for each of validated's validators calls its
+    .validate(), cached until a dispatcher changes.'''
+    changes = Dispatcher.changes
+    cached = _direct.get(validated)
+    if cached is not None and cached[0] is disp and cached[1] == changes:
+        return cached[2]
+    flags = tuple(getattr(disp.dispatch(vdator), 'calls_validate', False)
+                  for vdator in validated.vdators)
+    _direct[validated] = (disp, changes, flags)
+    return flags
+
 @validate.when(Validated)
+@stepwise
 def validate_validated(dispgraph, value, **kwargs):
     validated = dispgraph.marker
     # If core validation fails, don't bother with higher-level validation
-    dispgraph.for_marker(validated.marker)(value, **kwargs)
-    # Now run each extra validator in turn
+    yield dispgraph.for_marker(validated.marker).defer(value, **kwargs)
+    # Now run each extra validator in turn. Most validators' handlers just call
+    # their .validate(), so we do that directly, and only build an overlay for
+    # the others. Errors are only aggregated once one has been raised.
     fail_early = kwargs.get("dfy_fail_early", False)
-    error_agg = InvalidAggregator(autoraise = fail_early)
-    for vdator in validated.vdators:
-        with error_agg.checking():
-            dispgraph.for_marker(vdator)(value, **kwargs)
-    error_agg.raise_if_any()
+    direct = _calls_validate(dispgraph.disp_target, validated)
+    error_agg = None
+    for vdator, calls_validate in zip(validated.vdators, direct):
+        try:
+            if calls_validate:
+                vdator.validate(value, **kwargs)
+            else:
+                yield dispgraph.for_marker(vdator).defer(value, **kwargs)
+        except Invalid as e:
+            if error_agg is None:
+                error_agg = InvalidAggregator(autoraise = fail_early)
+            error_agg.put_error([], e)
+    if error_agg is not None:
+        error_agg.raise_if_any()
+
+def validate_validated_many(dispgraph, values, **kwargs):
+    validated = dispgraph.marker
+    inner = dispgraph.for_marker(validated.marker)
+    batch = getattr(inner._get_fn(), 'batch', None)
+    if batch is not None:
+        batch(inner, values, **kwargs)
+    else:
+        for value in values:
+            inner(value, **kwargs)
+    direct = _calls_validate(dispgraph.disp_target, validated)
+    for vdator, calls_validate in zip(validated.vdators, direct):
+        if calls_validate:
+            # Raise the first failure's actual error
+            for i in vdator._batch_failures(values, **kwargs):
+                vdator.validate(values[i], **kwargs)
+        else:
+            overlay = dispgraph.for_marker(vdator)
+            for value in values:
+                overlay(value, **kwargs)
+    return [None] * len(values)
+
+# Lets List validate whole lists at once (see iter_list); if any value fails,
+# List goes back and validates them one at a time to gather all the errors.
+validate_validated.batch = validate_validated_many
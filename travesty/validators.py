@@ -24,16 +24,46 @@ class Validator(Marker):
     Validator is actually a Marker subclass, so you can use it directly in a
     typegraph, but in general there should be no reason to do so - prefer to
     use it in conjunction with Validated.
+
+    Validators also have a .failing_indices(values, **kwargs) function, which
+    returns the indices of the values in a sequence that .validate() would
+    reject. Validated uses this to check whole Lists at once. The default just
+    calls .validate() on each value, but the built-in validators override it
+    with faster versions.
+    Validated only uses an override if it's defined on the same class as
+    .validate() (or a subclass of it), so a subclass that only changes
+    .validate() is still checked one value at a time.
     '''
     def validate(self, value, **kwargs): # pragma: no cover
         raise NotImplementedError()
 
+    def failing_indices(self, values, **kwargs):
+        bad = []
+        for i, value in enumerate(values):
+            try:
+                self.validate(value, **kwargs)
+            except Invalid:
+                bad.append(i)
+        return bad
+
+    def _batch_failures(self, values, **kwargs):
+        # failing_indices, unless it might not match validate
+        def defining(name):
+            return next(c for c in type(self).__mro__ if name in vars(c))
+        batch_cls = defining('failing_indices')
+        if (batch_cls is Validator
+                or issubclass(batch_cls, defining('validate'))):
+            return self.failing_indices(values, **kwargs)
+        return Validator.failing_indices(self, values, **kwargs)
+
     def of(self, marker):
         return Validated(marker, [self])
 
 @validate.when(Validator)
 def validate_validator(dispgraph, value, **kwargs):
     dispgraph.marker.validate(value, **kwargs)
+# Tells validate_validated it can skip dispatch and call .validate() itself
+validate_validator.calls_validate = True
 
 class IsInRange(Validator):
     '''Require values to be between two endpoints.
@@ -63,6 +93,11 @@ class IsInRange(Validator):
     Traceback (most recent call last):
         ...
     Invalid: range_error/too_high
+
+    failing_indices checks a whole sequence at once:
+
+    >>> IsInRange(0, 5).failing_indices([3, -1, None, 5, 8])
+    [1, 4]
     '''
     def __init__(self, low=None, high=None):
         self.low = low
@@ -75,6 +110,11 @@ class IsInRange(Validator):
         if self.high is not None and value > self.high:
             raise Invalid("range_error/too_high")
 
+    def failing_indices(self, values, **kwargs):
+        low, high = self.low, self.high
+        return [i for i, v in enumerate(values) if v is not None and (
+            (low is not None and v < low) or (high is not None and v > high))]
+
 def InRange(low=None, high=None, marker=None):
     '''Require values to be between two endpoints.
 
@@ -137,6 +177,10 @@ class HasLength(Validator):
             msg = "Expected length {}, not length {}.".format(self.length, l)
             raise Invalid("value_error/wrong_length", msg)
 
+    def failing_indices(self, values, **kwargs):
+        n = self.length
+        return [i for i, v in enumerate(values) if len(v) != n]
+
 class HasLengthInRange(Validator):
     '''Require values to have a fixed length.
 
@@ -166,6 +210,12 @@ class HasLengthInRange(Validator):
             msg = "Length {} is higher than maximum {}".format(l, self.high)
             raise Invalid("value_error/too_long", msg)
 
+    def failing_indices(self, values, **kwargs):
+        low, high = self.low, self.high
+        lengths = [len(v) for v in values]
+        return [i for i, l in enumerate(lengths) if
+            (low is not None and l < low) or (high is not None and l > high)]
+
 def StringOfLength(length=None, low=None, high=None, marker=String()):
     '''Requires strings with a fixed length or a length in a range.
 
@@ -222,14 +272,37 @@ class IsOneOf(Validator):
     Traceback (most recent call last):
         ...
     Invalid: invalid_choice
+
+    If the options are all hashable, they're also stored in a frozenset, so
+    that checking a hashable value doesn't need to scan the whole list. (For
+    large lists of options, consider the Enum marker instead.)
     '''
     def __init__(self, options):
         self.options = options
+        self.option_set = None
+        if isinstance(options, (list, tuple, set, frozenset)):
+            try:
+                self.option_set = frozenset(options)
+            except TypeError:
+                pass
 
     def validate(self, value, **kwargs):
-        if value not in self.options:
+        try:
+            found = value in self.option_set
+        except TypeError: # No option_set, or value isn't hashable
+            found = value in self.options
+        if not found:
             raise Invalid("invalid_choice")
 
+    def failing_indices(self, values, **kwargs):
+        if self.option_set is not None:
+            options = self.option_set
+            try:
+                return [i for i, v in enumerate(values) if v not in options]
+            except TypeError:
+                pass
+        return super(IsOneOf, self).failing_indices(values, **kwargs)
+
 # This would take (*options, marker=None) but python2 doesn't allow that
 def OneOf(*options, **kwargs):
     '''Require values to come from a fixed list of options.
@@ -387,6 +460,10 @@ class IsNonEmptyString(Validator):
         if len(value.strip()) == 0:
             raise Invalid("empty")
 
+    def failing_indices(self, values, **kwargs):
+        return [i for i, v in enumerate(values)
+            if not isinstance(v, basestring) or not v.strip()]
+
 def NonEmptyString(marker=String()):
     return IsNonEmptyString().of(marker)
 
@@ -0,0 +1,235 @@
+'''walk.py: lazily iterate over every node of a value.
+
+walk(typegraph, value) is a generator that yields a (path, marker, value)
+triple for every node in value, parents before children and siblings in
+typegraph order. Paths are tuples of keys, named as in graphize:
+
+>>> import travesty as tv
+>>> schema = tv.SchemaMapping().of(
+...     name=tv.String(),
+...     scores=tv.List().of(tv.Int()),
+... )
+>>> value = dict(name=u'Ann', scores=[3, 5])
+>>> for path, marker, v in walk(schema, value):
+...     print('{} {} {}'.format('/'.join(path), type(marker).__name__, v == value or v))
+ SchemaMapping True
+name String Ann
+scores List [3, 5]
+scores/0 Int 3
+scores/1 Int 5
+
+Nothing is built up front, so walk can stream over very large values, and it
+keeps an explicit stack, so it handles arbitrarily deep ones.
+
+To skip the children of the node you've just been given, send PRUNE back into
+the generator. send() returns None in that case, and iteration continues with
+the node's next sibling:
+
+>>> w = walk(schema, value)
+>>> events = []
+>>> for path, marker, v in w:
+...     if path == ('scores',):
+...         w.send(PRUNE)
+...     events.append(path)
+>>> events
+[(), ('name',), ('scores',)]
+
+The marker in each event is the marker at that node of the typegraph, with any
+Wrappers intact. Polymorph nodes are transparent: the event carries the marker
+of the type that was chosen for the value, and its children are that type's
+children. Documents are only expanded the first time they're encountered, and
+unloaded documents only have their uids walked, just as with traverse.
+
+Missing keys in SchemaMappings and missing attributes of objects are skipped,
+and Optional values that are None have no children.
+
+To walk custom markers, register a handler on walk_children. A handler returns
+the pair (marker, children), where children is an iterable of (key, subgraph,
+subvalue) triples - preferably a lazy one, since it won't be consumed at all if
+the node is pruned.
+
+lazy_graphize(typegraph, value) uses the same machinery to build a vertigo
+graph like graphize's, except that each node's children are only computed when
+they're first looked up. Looking up one path in a huge value therefore only
+does work along that path:
+
+>>> import vertigo as vg
+>>> big = dict(name=u'Big', scores=list(range(100000)))
+>>> g = lazy_graphize(schema, big)
+>>> g['scores', '70000'].value
+70000
+>>> print(vg.ascii_tree(lazy_graphize(schema, value), sort=True))
+root: {'name': 'Ann', 'scores': [3, 5]}
+  +--name: 'Ann'
+  +--scores: [3, 5]
+     +--0: 3
+     +--1: 5
+
+Nodes are cached once created, and a node is shared wherever the same object
+appears with the same (unwrapped) marker, so recursive documents produce finite (cyclic)
+graphs just as with graphize.
+'''
+from collections import OrderedDict
+
+import vertigo as vg
+
+from .base import Marker, Wrapper, make_dispatcher, core_marker
+from .list import List
+from .mapping import StrMapping, UniMapping
+from .object_marker import ObjectMarker, _as_dict
+from .optional import Optional
+from .polymorph import Polymorph
+from .schema import Schema
+from .tuple import Tuple
+
+
+class _Prune(object):
+    def __repr__(self):
+        return 'PRUNE'
+
+PRUNE = _Prune()
+'''Send this into a walk() generator to skip the current node's children.'''
+
+
+walk_children = make_dispatcher()
+
+@walk_children.when(Marker)
+def leaf_children(dispgraph, value, **kw):
+    return dispgraph.marker, ()
+
+@walk_children.when(Wrapper)
+def wrapper_children(dispgraph, value, **kw):
+    children = dispgraph.inner(value, **kw)[1]
+    return dispgraph.marker, children
+
+@walk_children.when(Optional)
+def optional_children(dispgraph, value, **kw):
+    if value is None:
+        return dispgraph.marker, ()
+    return wrapper_children(dispgraph, value, **kw)
+
+@walk_children.when(Polymorph)
+def pmorph_children(dispgraph, value, **kw):
+    name = dispgraph.marker.name_for_val(value)
+    return dispgraph[name](value, **kw)
+
+def _schema_items(dispgraph, value):
+    for key, subgraph in dispgraph.edge_iter():
+        if key in value:
+            yield key, subgraph, value[key]
+
+@walk_children.when(Schema)
+def schema_children(dispgraph, value, **kw):
+    return dispgraph.marker, _schema_items(dispgraph, value)
+
+@walk_children.when(ObjectMarker)
+def obj_children(dispgraph, value, **kw):
+    return dispgraph.marker, _schema_items(dispgraph, _as_dict(dispgraph, value))
+
+@walk_children.when(List)
+def list_children(dispgraph, value, **kw):
+    sub = dispgraph['sub']
+    return dispgraph.marker, ((str(i), sub, v) for i, v in enumerate(value))
+
+@walk_children.when(StrMapping)
+def strmap_children(dispgraph, value, **kw):
+    sub = dispgraph['sub']
+    return dispgraph.marker, ((k, sub, v) for k, v in value.items())
+
+def _unimap_items(dispgraph, value):
+    kgraph, vgraph = dispgraph['key'], dispgraph['val']
+    for i, (k, v) in enumerate(value.items()):
+        yield 'key_{}'.format(i), kgraph, k
+        yield 'value_{}'.format(i), vgraph, v
+
+@walk_children.when(UniMapping)
+def unimap_children(dispgraph, value, **kw):
+    return dispgraph.marker, _unimap_items(dispgraph, value)
+
+@walk_children.when(Tuple)
+def tuple_children(dispgraph, value, **kw):
+    names = dispgraph.marker.field_names
+    return dispgraph.marker, ((n, dispgraph[n], v) for n, v in zip(names, value))
+
+
+def walk(typegraph, value, extras_graphs=None, **kwargs):
+    '''Lazily yield (path, marker, value) for every node in value.
+
+    See the module docstring for details. Any keyword arguments are passed on
+    to the walk_children handlers.
+    '''
+    root = walk_children._mk_graph(typegraph, extras_graphs or {})
+    kwargs = walk_children.apply_defaults(kwargs)
+    stack = [((), iter([(None, root, value)]))]
+    while stack:
+        prefix, children = stack[-1]
+        for key, dispgraph, value in children:
+            break
+        else:
+            stack.pop()
+            continue
+        path = prefix if key is None else prefix + (key,)
+        marker, subchildren = dispgraph(value, **kwargs)
+        if (yield (path, marker, value)) is PRUNE:
+            # Acknowledge the prune, so that send() returns None
+            yield None
+        else:
+            stack.append((path, iter(subchildren)))
+
+
+class LazyGraphNode(vg.GraphNode):
+    '''A vertigo graph node that zips a value to its typegraph on access.
+
+    See lazy_graphize.
+    '''
+    __slots__ = ('dispgraph', 'raw_value', 'kwargs', 'cache', '_children', '_kids')
+
+    def __init__(self, dispgraph, value, kwargs, cache):
+        self.dispgraph = dispgraph
+        self.raw_value = value
+        self.kwargs = kwargs
+        self.cache = cache
+        self._children = None
+        self._kids = {}
+
+    @property
+    def value(self):
+        if 'zipval' in self.dispgraph.extras:
+            return (self.raw_value, self.dispgraph.extras.zipval)
+        return self.raw_value
+
+    def _load(self):
+        if self._children is None:
+            # Every node sees each document afresh, since the cache takes care
+            # of sharing repeated documents.
+            kw = dict(self.kwargs, _tv_docs_processed=set())
+            _, children = self.dispgraph(self.raw_value, **kw)
+            self._children = OrderedDict((k, (g, v)) for k, g, v in children)
+        return self._children
+
+    def key_iter(self):
+        return iter(self._load())
+
+    def _get_child(self, key):
+        if key not in self._kids:
+            subgraph, value = self._load()[key]
+            self._kids[key] = _lazy_node(subgraph, value, self.kwargs, self.cache)
+        return self._kids[key]
+
+
+def _lazy_node(dispgraph, value, kwargs, cache):
+    extras = tuple(id(g) for g in dispgraph.extras_graphs.values())
+    key = (id(value), id(core_marker(dispgraph.marker)), extras)
+    if key not in cache:
+        cache[key] = LazyGraphNode(dispgraph, value, kwargs, cache)
+    return cache[key]
+
+
+def lazy_graphize(typegraph, value, extras_graphs=None, **kwargs):
+    '''Like graphize, but computes each node's children on first access.
+
+    See the module docstring for details.
+    '''
+    root = walk_children._mk_graph(typegraph, extras_graphs or {})
+    kwargs = walk_children.apply_defaults(kwargs)
+    return _lazy_node(root, value, kwargs, {})